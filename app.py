@@ -1,15 +1,38 @@
 import os
-from flask import Flask, render_template, redirect, url_for, request, flash, session, send_file
-from models import db, User, Team, Player
+from flask import Flask, render_template, redirect, url_for, request, flash, session, send_file, Response, jsonify
+from models import db, User, Team, Player, Job
+from rosters import get_team_rosters, invalidate_rosters
+from auction_stats import get_status_summary, invalidate_summary, record_sold, record_unsold, record_round_started
+import auction_state
+import auction_queue
+import journal
+import leagues
+import db_engines
+from db_engines import read_only
+from leagues import current_league_id
+from team_stats import reset_auction_players, recalculate_team_stats
+from sales import sell_player, pass_player, SaleRejected, LOT_CLOSED_MESSAGE
+from bidding import bid_book, bid_increment, BidRejected, DEFAULT_BID_INCREMENT
+from migrations import run_migrations
+from exports import export_players_file, export_team_file, export_auction_file
+from image_pipeline import image_variant
+import assets
+from jinja2 import FileSystemBytecodeCache
+from player_listing import list_players_from_args, player_json, SORT_LABELS
+from live_feed import live_feed, publish
+from metrics import metrics
+from page_cache import conditional_page, DEFAULT_PAGE_CACHE_SIZE
+import jobs
+from jobs import job_runner
+from provisioning import ROLES, DEFAULT_PROVISION_PROCESSES
 from dotenv import load_dotenv
 import datetime
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from functools import wraps
-import random
-import pandas as pd
-import io
 from sqlalchemy import inspect, or_ # Import or_ for auction count
+from sqlalchemy import update
 import math
+import click
 
 # Load environment variables
 load_dotenv()
@@ -20,7 +43,47 @@ app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///project.db')
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'a_very_secret_key_to_change_later_98765')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['AUCTION_STATE_CACHE_SECONDS'] = float(os.environ.get('AUCTION_STATE_CACHE_SECONDS', '1.0'))
+app.config['BID_INCREMENT'] = int(os.environ.get('BID_INCREMENT', DEFAULT_BID_INCREMENT)) # Minimum raise (and opening bid) for captain bids
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes') # Per-route latency/SQL metrics at /metrics
+app.config['PAGE_CACHE_SIZE'] = int(os.environ.get('PAGE_CACHE_SIZE', DEFAULT_PAGE_CACHE_SIZE)) # Rendered public pages kept per worker (0 = off)
+app.config['JOB_THREADS'] = int(os.environ.get('JOB_THREADS', jobs.DEFAULT_JOB_THREADS)) # Background export/import threads per worker
+app.config['JINJA_BYTECODE_CACHE'] = os.environ.get('JINJA_BYTECODE_CACHE', os.path.join(app.instance_path, 'jinja_cache')) # Compiled templates shared by workers ('' = off)
+app.config['PROVISION_PROCESSES'] = int(os.environ.get('PROVISION_PROCESSES', DEFAULT_PROVISION_PROCESSES)) # Password hashing processes for bulk user uploads
+app.config['SIMULATION_PROCESSES'] = int(os.environ.get('SIMULATION_PROCESSES', 0)) # Outlook simulation pool processes (0 = up to 4, one per CPU)
+app.config['SLOW_REQUEST_MS'] = float(os.environ['SLOW_REQUEST_MS']) if os.environ.get('SLOW_REQUEST_MS') else None # Log requests slower than this
+app.config['DB_PROFILE'] = os.environ.get('DB_PROFILE', 'auto').lower() # Engine tuning: auto (from the URL), sqlite, postgres or default
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', db_engines.DEFAULT_SQLITE_BUSY_TIMEOUT_MS)) # How long a SQLite write waits for the lock
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', db_engines.DEFAULT_POOL_SIZE)) # Postgres connections kept per worker
+app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', db_engines.DEFAULT_MAX_OVERFLOW)) # Extra Postgres connections under load
+app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', db_engines.DEFAULT_POOL_RECYCLE)) # Seconds before a Postgres connection is replaced
+app.config['DB_POOL_TIMEOUT'] = int(os.environ.get('DB_POOL_TIMEOUT', db_engines.DEFAULT_POOL_TIMEOUT)) # Seconds to wait for a free pooled connection
+app.config['DATABASE_READ_URL'] = os.environ.get('DATABASE_READ_URL') or None # Read replica for the @read_only public pages
+app.config['SQLITE_READ_POOL'] = os.environ.get('SQLITE_READ_POOL', '').lower() in ('1', 'true', 'yes') # SQLite: separate query_only pool for those pages
+db_engines.configure(app) # Engine options and the read bind; must come before db.init_app
 db.init_app(app)
+db_engines.init_app(app, db) # SQLite WAL/busy_timeout/synchronous pragmas on every new connection
+metrics.init_app(app) # Registers its hooks first so request timings include the other before_request work
+live_feed.init_app(app)
+job_runner.init_app(app)
+
+# --- TEMPLATES (bytecode cached on disk, so new workers skip parsing and compiling them) ---
+if app.config['JINJA_BYTECODE_CACHE']:
+    os.makedirs(app.config['JINJA_BYTECODE_CACHE'], exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_BYTECODE_CACHE'])
+
+# --- STATIC ASSETS (minified, fingerprinted and precompressed by assets.py) ---
+assets.init_app(app) # url_for('static', filename='style.css') -> the built file; /static/dist/ serves its .br/.gz variant
+
+# --- PLAYER PHOTOS (content-hashed derivatives from image_pipeline.py) ---
+app.jinja_env.globals['image_variant'] = image_variant
+
+@app.after_request
+def cache_derived_images(response):
+    # Derived photos and built assets change name whenever their content does, so browsers may keep them forever
+    if request.path.startswith(('/static/images/derived/', '/static/dist/')) and response.status_code == 200 and not request.path.endswith('.json'):
+        response.cache_control.no_cache = None; response.cache_control.public = True; response.cache_control.max_age = 31536000; response.cache_control.immutable = True
+    return response
 
 # --- LOGIN MANAGER SETUP ---
 login_manager = LoginManager()
@@ -34,24 +97,28 @@ def load_user(user_id):
     return User.query.get(int(user_id))
 
 # --- DATABASE CREATION & SEEDING ---
-@app.before_request
-def create_tables():
-    if not hasattr(app, 'tables_created'):
-        with app.app_context():
-            inspector = db.inspect(db.engine)
-            tables_exist = inspector.has_table("user")
-            if not tables_exist:
-                db.create_all(); print("Database tables created.")
-                if User.query.count() == 0:
-                    print("Creating Super Admin..."); super_admin = User( full_name="Super Admin", username="superadmin", role="Super Admin"); super_admin.set_password("admin123"); db.session.add(super_admin); db.session.commit(); print("Super Admin created...")
-                if Team.query.count() == 0:
-                     teams = [ Team(team_name="APJ TAMIZHAN", captain_name="SILAMBARASAN R"), Team(team_name="SPARTEN ROCKERZ", captain_name="BARATHI K"), Team(team_name="CRAZY 11", captain_name="NITHYARAJ"), Team(team_name="JOLLY PLAYERS", captain_name="VINOTH"), Team(team_name="DADA WARRIORS", captain_name="PRAVEEN PRABHAKARAN"), Team(team_name="THUNDER STRIKERS", captain_name="GURUNATHAN S"), Team(team_name="SPARK 11", captain_name="VELMANI P") ]
-                     db.session.bulk_save_objects(teams); db.session.commit(); print(f"{len(teams)} teams seeded.")
-                if Player.query.count() == 0:
-                     print("Player table is empty. Run 'python import_players.py' to populate.")
-            else:
-                print("Database tables already exist.")
-        app.tables_created = True
+# Runs once per deploy (`flask --app app init-db`), before the workers start: requests never inspect or migrate the schema
+def init_db(seed=True):
+    """Creates missing tables, applies pending migrations, seeds an empty database and makes sure the auction state row exists."""
+    tables_exist = db.inspect(db.engine).has_table("user")
+    run_migrations() # Creates missing tables and applies pending schema changes (indexes, columns)
+    print("Database tables already exist." if tables_exist else "Database tables created.")
+    if seed and User.query.count() == 0:
+        print("Creating Super Admin..."); super_admin = User( full_name="Super Admin", username="superadmin", role="Super Admin"); super_admin.set_password("admin123"); db.session.add(super_admin); db.session.commit(); print("Super Admin created...")
+    if seed and Team.query.count() == 0:
+         teams = [ Team(team_name="APJ TAMIZHAN", captain_name="SILAMBARASAN R"), Team(team_name="SPARTEN ROCKERZ", captain_name="BARATHI K"), Team(team_name="CRAZY 11", captain_name="NITHYARAJ"), Team(team_name="JOLLY PLAYERS", captain_name="VINOTH"), Team(team_name="DADA WARRIORS", captain_name="PRAVEEN PRABHAKARAN"), Team(team_name="THUNDER STRIKERS", captain_name="GURUNATHAN S"), Team(team_name="SPARK 11", captain_name="VELMANI P") ]
+         db.session.bulk_save_objects(teams); db.session.commit(); print(f"{len(teams)} teams seeded.")
+    if Player.query.count() == 0:
+         print("Player table is empty. Run 'python import_players.py' to populate.")
+    auction_state.ensure_state_row()
+
+@app.cli.command('init-db')
+@click.option('--no-seed', is_flag=True, help='Only create and migrate the schema; do not add the super admin and default teams.')
+def init_db_command(no_seed):
+    """Create or upgrade the database schema and seed an empty database."""
+    init_db(seed=not no_seed)
+
+leagues.init_app(app) # Picks the request's league (captain's team, ?league=, session)
 
 
 # --- CUSTOM DECORATORS for security ---
@@ -66,6 +133,12 @@ def role_required(role_names):
             return f(*args, **kwargs)
         return decorated_function
     return decorator
+def league_team_id(value, teams):
+    """The posted team id if it is one of ``teams`` (the current league's), None when blank; ValueError for any other team."""
+    if not value: return None
+    team_id = int(value)
+    if team_id not in {team.id for team in teams}: raise ValueError('Choose a team of this league.')
+    return team_id
 def check_admin_password(username, password):
     user = User.query.filter_by(username=username).first()
     if user and (user.role == 'Admin' or user.role == 'Super Admin') and user.check_password(password):
@@ -74,9 +147,12 @@ def check_admin_password(username, password):
 
 # --- PUBLIC ROUTES ---
 @app.route('/')
+@read_only
+@conditional_page('home', extra=lambda: [datetime.date.today()]) # The countdown changes daily
 def home():
     app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
-    total_players = Player.query.count(); retained_players_count = Player.query.filter_by(is_retained=True).count(); auction_pool_count = total_players - retained_players_count; team_count = Team.query.count(); max_total_slots = team_count * 15; total_auction_slots_available = max_total_slots - retained_players_count
+    auction_state.get_auction_state() # Picks up changes made by other workers before reading the cached summary
+    summary = get_status_summary(); auction_pool_count = summary.total_auction_players; team_count = summary.team_count; total_auction_slots_available = summary.auction_slots_available
     try:
         auction_date_str = "2025-11-02"; auction_date = datetime.datetime.strptime(auction_date_str, "%Y-%m-%d").date(); today = datetime.date.today(); days_to_go = (auction_date - today).days
         if days_to_go < 0: days_to_go = 0
@@ -102,7 +178,7 @@ def login():
 @login_required
 def logout():
     app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
-    logout_user(); session.pop('auction_started', None); session.pop('current_player_id', None); session.pop('auction_round', None); session.pop('round_complete', None); session.pop('auction_complete', None); session.pop('auction_paused', None)
+    logout_user()
     flash('You have been logged out.', 'success'); return redirect(url_for('home'))
 
 # --- PROTECTED ROUTES ---
@@ -114,49 +190,115 @@ def dashboard():
     all_users = []
     if current_user.role == 'Super Admin':
         all_users = User.query.filter(User.id != current_user.id).order_by(User.role, User.full_name).all()
-    return render_template('dashboard.html', active_page='dashboard', all_users=all_users)
+    recent_jobs = [jobs.job_json(job) for job in jobs.recent_jobs()] # Background exports/imports, polled by the page while they run
+    return render_template('dashboard.html', active_page='dashboard', all_users=all_users, recent_jobs=recent_jobs, teams=get_team_rosters())
 
 @app.route('/players')
 @login_required
+@read_only
 def players():
     app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
-    all_players = Player.query.order_by(Player.is_retained.desc(), Player.player_name).all()
-    return render_template('players.html', active_page='players', players=all_players)
+    try: page = list_players_from_args(request.args) # First page only; the rest load as the list scrolls
+    except ValueError: page = list_players_from_args({})
+    return render_template('players.html', active_page='players', page=page, sort_labels=SORT_LABELS)
+
+@app.route('/players/page')
+@login_required
+@read_only
+def players_page():
+    """Next page of the player list: HTML rows for the players page, or JSON with format=json. Cursor in X-Next-Cursor/next_cursor."""
+    app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
+    try: page = list_players_from_args(request.args)
+    except ValueError as e: return jsonify(ok=False, error=str(e)), 400
+    if request.args.get('format') == 'json':
+        return jsonify(ok=True, players=[player_json(player, team_name) for player, team_name in page.rows], next_cursor=page.next_cursor, **page.params)
+    response = app.make_response(render_template('player_rows.html', rows=page.rows))
+    if page.next_cursor: response.headers['X-Next-Cursor'] = page.next_cursor
+    return response
+
+# --- LEADERBOARD ROUTE ---
+@app.route('/leaderboard')
+@login_required
+def leaderboard():
+    """Top players by rating (kind=batting|bowling|all_rounder, pool=all|available) and team strength; JSON with format=json."""
+    app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
+    from ratings import get_player_ratings, get_team_strength, available_player_ids, RATING_KINDS, LEADERBOARD_SIZE # NumPy loads on the first leaderboard view, not at worker boot
+    kind = request.args.get('kind', 'all_rounder'); pool = request.args.get('pool', 'all')
+    if kind not in RATING_KINDS: return jsonify(ok=False, error=f'Unknown rating: {kind}'), 400
+    try: limit = int(request.args.get('limit', LEADERBOARD_SIZE))
+    except ValueError: limit = LEADERBOARD_SIZE
+    ratings = get_player_ratings() # Cached until an import changes stats
+    entries = ratings.leaderboard(kind, limit, player_ids=available_player_ids() if pool == 'available' else None)
+    team_strength = get_team_strength()
+    if request.args.get('format') == 'json':
+        return jsonify(ok=True, kind=kind, pool=pool, stats_version=ratings.stats_version,
+                       leaderboard=[entry.__dict__ for entry in entries], teams=[team.__dict__ for team in team_strength])
+    return render_template('leaderboard.html', active_page='leaderboard', entries=entries, team_strength=team_strength,
+                           kind=kind, pool=pool, rating_kinds=RATING_KINDS)
+
+# --- OUTLOOK (SIMULATION) ROUTE ---
+@app.route('/simulation')
+@login_required
+def simulation():
+    """Monte Carlo outlook for the rest of the auction (runs=N); JSON with format=json."""
+    app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
+    from simulator import get_simulation, DEFAULT_RUNS # NumPy loads on the first outlook view, not at worker boot
+    try: runs = int(request.args.get('runs', DEFAULT_RUNS))
+    except ValueError: runs = DEFAULT_RUNS
+    result = get_simulation(runs) # Cached until the next sale
+    if request.args.get('format') == 'json':
+        return jsonify(ok=True, **{key: value for key, value in result.__dict__.items() if key != 'teams'}, teams=[team.__dict__ for team in result.teams])
+    return render_template('simulation.html', active_page='simulation', result=result)
 
 # --- TEAMS ROUTE (PUBLIC) ---
 @app.route('/teams')
+@read_only
+@conditional_page('teams')
 def teams():
     app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
-    all_teams = Team.query.order_by(Team.team_name).all()
-    return render_template('teams.html', active_page='teams', teams=all_teams, current_user=current_user, Player=Player)
+    auction_state.get_auction_state() # Picks up changes made by other workers before reading the cached rosters
+    team_rosters = get_team_rosters() # Cached; rebuilt from two queries after a sale/unsold/reset
+    return render_template('teams.html', active_page='teams', teams=team_rosters, current_user=current_user)
 
 # --- AUCTION ROUTES (PUBLIC, content conditional) ---
+@app.errorhandler(auction_state.AuctionStateConflict)
+def auction_state_conflict(error):
+    flash(str(error), 'error'); return redirect(url_for('auctions'))
+
 @app.route('/auctions')
+@read_only
+@conditional_page('auctions')
 def auctions():
     app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
-    all_teams = Team.query.all()
-    auction_started = session.get('auction_started', False); auction_round = session.get('auction_round', 1); round_complete = session.get('round_complete', False); auction_complete = session.get('auction_complete', False); auction_paused = session.get('auction_paused', False); current_player = None; next_round_players_count = 0
+    state = auction_state.get_auction_state() # Shared across workers; cached for a second between reads
+    all_teams = get_team_rosters()
+    auction_started = state.started; auction_round = state.auction_round; round_complete = state.round_complete; auction_complete = state.auction_complete; auction_paused = state.paused; current_player = None; next_round_players_count = 0
     
-    # --- CALCULATE COUNTS ---
-    total_auction_players = Player.query.filter_by(is_retained=False).count()
-    sold_players_count = Player.query.filter_by(is_retained=False, status='Sold').count()
-    currently_unsold_count = Player.query.filter_by(is_retained=False, status='Unsold').count()
-    marked_unsold_count = Player.query.filter(Player.is_retained==False, (Player.status.like('Round % Unsold') | (Player.status == 'Unsold Final'))).count()
+    # --- CALCULATE COUNTS (from the in-process status summary, no COUNT queries) ---
+    summary = get_status_summary()
+    total_auction_players = summary.total_auction_players
+    sold_players_count = summary.sold_count
+    currently_unsold_count = summary.currently_unsold_count
+    marked_unsold_count = summary.marked_unsold_count
     total_remaining_count = currently_unsold_count + marked_unsold_count
 
     if auction_started and not round_complete and not auction_complete and not auction_paused:
-        player_id = session.get('current_player_id')
+        player_id = state.current_player_id
         if player_id:
             current_player = Player.query.get(player_id)
             if current_player and current_player.status != 'Unsold':
-                 session.pop('current_player_id', None); current_player = None
+                 current_player = None
                  if current_user.is_authenticated and current_user.role in ['Admin', 'Super Admin']: return redirect(url_for('next_player'))
     if round_complete:
-        next_round_status = f'Round {auction_round} Unsold'
-        next_round_players_count = Player.query.filter(Player.is_retained==False, Player.status==next_round_status).count()
+        next_round_players_count = summary.round_unsold_count(auction_round)
         if next_round_players_count == 0:
-             still_unsold = Player.query.filter_by(is_retained=False, status='Unsold').count()
-             if still_unsold == 0: auction_complete = True; auction_started = False; session['auction_complete'] = True; session['auction_started'] = False
+             if currently_unsold_count == 0: auction_complete = True; auction_started = False
+    # --- CAPTAIN BIDDING (leading bid from this worker's ladder or the shared state, whichever is ahead) ---
+    high_bid = high_bid_team_name = None; next_minimum_bid = bid_increment()
+    if current_player:
+        high_bid, high_bid_team_id, next_minimum_bid = bid_book.leading_bid(state, current_player.id)
+        high_bid_team_name = next((team.team_name for team in all_teams if team.id == high_bid_team_id), None)
+    can_bid = current_user.is_authenticated and current_user.role == 'Captain' and current_user.team_id is not None
     return render_template('auctions.html',
                            active_page='auctions', all_teams=all_teams,
                            auction_started=auction_started, round_complete=round_complete,
@@ -167,21 +309,34 @@ def auctions():
                            total_auction_players=total_auction_players, sold_players_count=sold_players_count,
                            remaining_players_count=total_remaining_count, currently_unsold_count=currently_unsold_count,
                            marked_unsold_count=marked_unsold_count,
+                           high_bid=high_bid, high_bid_team_name=high_bid_team_name, next_minimum_bid=next_minimum_bid,
+                           bid_increment=bid_increment(), can_bid=can_bid,
                            Player=Player) # Pass Player model
 
+@app.route('/auctions/stream')
+def auction_stream():
+    # Server-Sent Events: one message per auction event instead of spectators re-polling /auctions
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+    try: last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError: last_event_id = None
+    return Response(live_feed.stream(current_league_id(), last_event_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/next_player')
 @login_required
 @role_required(['Admin'])
 def next_player():
     app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
-    if session.get('auction_paused'): flash('Auction is paused. Resume before proceeding.', 'warning'); return redirect(url_for('auctions'))
-    auction_round = session.get('auction_round', 1); current_round_status = 'Unsold'; next_round_status_check = f'Round {auction_round} Unsold'; unsold_players = Player.query.filter_by(status=current_round_status, is_retained=False).all()
-    if not unsold_players:
-        players_for_next_round_count = Player.query.filter_by(status=next_round_status_check, is_retained=False).count()
-        if players_for_next_round_count > 0: flash(f'Round {auction_round} complete. Ready for Round {auction_round + 1}.', 'info'); session['round_complete'] = True; session['auction_started'] = False; session.pop('current_player_id', None)
-        else: flash(f'Auction complete after Round {auction_round}! All non-retained players processed.', 'success'); session['auction_started'] = False; session['auction_complete'] = True; session.pop('current_player_id', None)
+    state = auction_state.get_auction_state(fresh=True)
+    if state.paused: flash('Auction is paused. Resume before proceeding.', 'warning'); return redirect(url_for('auctions'))
+    auction_round = state.auction_round
+    queued_player = auction_queue.next_queued_player(auction_round) # One indexed lookup at the round's cursor
+    if queued_player is None:
+        players_for_next_round_count = get_status_summary().round_unsold_count(auction_round)
+        if players_for_next_round_count > 0: flash(f'Round {auction_round} complete. Ready for Round {auction_round + 1}.', 'info'); publish('round_complete', round=auction_round, next_round_players=players_for_next_round_count); auction_state.complete_round(state)
+        else: flash(f'Auction complete after Round {auction_round}! All non-retained players processed.', 'success'); publish('auction_complete', round=auction_round); auction_state.complete_auction(state)
         return redirect(url_for('auctions'))
-    random_player = random.choice(unsold_players); session['auction_started'] = True; session['current_player_id'] = random_player.id; session['round_complete'] = False; session['auction_complete'] = False
+    publish('player_up', player_id=queued_player.id, player_name=queued_player.player_name, round=auction_round); auction_state.present_player(state, queued_player.id)
     return redirect(url_for('auctions'))
 
 @app.route('/start_next_round')
@@ -189,12 +344,16 @@ def next_player():
 @role_required(['Admin'])
 def start_next_round():
     app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
-    auction_round = session.get('auction_round', 1); round_complete = session.get('round_complete', False)
-    if not round_complete: flash('Cannot start next round until the current one is complete.', 'warning'); return redirect(url_for('auctions'))
-    completed_round_status = f'Round {auction_round} Unsold'; players_for_next_round = Player.query.filter_by(status=completed_round_status, is_retained=False).all()
-    if not players_for_next_round: flash('No players available for the next round.', 'info'); session['auction_complete'] = True; session['auction_started'] = False; session['round_complete'] = False; return redirect(url_for('auctions'))
-    for player in players_for_next_round: player.status = 'Unsold'
-    db.session.commit(); next_round_number = auction_round + 1; session['auction_round'] = next_round_number; session['round_complete'] = False; session['auction_started'] = True; session['auction_paused'] = False
+    state = auction_state.get_auction_state(fresh=True); auction_round = state.auction_round
+    if not state.round_complete: flash('Cannot start next round until the current one is complete.', 'warning'); return redirect(url_for('auctions'))
+    # Players passed in the completed round go back into the live pool (one indexed UPDATE)
+    moved_count = db.session.execute(update(Player).where(Player.league_id == current_league_id(), Player.is_retained == False, Player.status == 'Passed', Player.unsold_round == auction_round)
+                                     .values(status='Unsold', unsold_round=None).execution_options(synchronize_session=False)).rowcount
+    if not moved_count: db.session.rollback(); flash('No players available for the next round.', 'info'); publish('auction_complete', round=auction_round); auction_state.complete_auction(state); return redirect(url_for('auctions'))
+    next_round_number = auction_round + 1; auction_queue.build_round_queue(next_round_number) # Shuffled once per round
+    publish('round_started', round=next_round_number, players=moved_count)
+    auction_state.start_round(state, next_round_number) # Commits the status changes with the new round
+    record_round_started(auction_round, moved_count)
     flash(f'Starting Round {next_round_number}!', 'success'); return redirect(url_for('next_player'))
 
 
@@ -203,17 +362,51 @@ def start_next_round():
 @role_required(['Admin'])
 def mark_sold(player_id):
     app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
-    if session.get('auction_paused'): flash('Auction is paused. Resume before marking player sold.', 'warning'); return redirect(url_for('auctions'))
-    player = Player.query.get_or_404(player_id);
-    if player.is_retained or player.status != 'Unsold' or not session.get('auction_started') or session.get('current_player_id') != player_id: flash('This player is not currently up for auction or action already taken.', 'error'); return redirect(url_for('auctions'))
+    state = auction_state.get_auction_state(fresh=True)
+    if state.paused: flash('Auction is paused. Resume before marking player sold.', 'warning'); return redirect(url_for('auctions'))
+    if not state.started or state.current_player_id != player_id: flash(LOT_CLOSED_MESSAGE, 'error'); return redirect(url_for('auctions'))
     try: team_id = int(request.form.get('team_id')); sold_price = int(request.form.get('sold_price'))
     except (ValueError, TypeError): flash('Invalid team or price.', 'error'); return redirect(url_for('auctions'))
-    team = Team.query.get_or_404(team_id)
-    if team.slots_remaining <= 0: flash(f'{team.team_name} has no remaining slots!', 'error'); return redirect(url_for('auctions'))
-    if team.purse < sold_price: flash(f'{team.team_name} does not have enough purse (Remaining: {team.purse})!', 'error'); return redirect(url_for('auctions'))
-    player.status = 'Sold'; player.sold_price = sold_price; player.team_id = team.id; team.purse -= sold_price; team.purse_spent += sold_price; team.players_taken_count += 1; team.slots_remaining -= 1
-    db.session.commit(); flash(f'{player.player_name} sold to {team.team_name} for {sold_price} points!', 'success')
-    session.pop('current_player_id', None); return redirect(url_for('next_player'))
+    if sold_price < 0: flash('Invalid team or price.', 'error'); return redirect(url_for('auctions'))
+    return complete_sale(state, player_id, team_id, sold_price, auction_state.mark_sold)
+
+
+@app.route('/close_lot/<int:player_id>', methods=['POST'])
+@login_required
+@role_required(['Admin'])
+def close_lot(player_id):
+    app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
+    state = auction_state.get_auction_state(fresh=True)
+    if state.paused: flash('Auction is paused. Resume before closing the lot.', 'warning'); return redirect(url_for('auctions'))
+    if not state.started or state.current_player_id != player_id: flash(LOT_CLOSED_MESSAGE, 'error'); return redirect(url_for('auctions'))
+    if state.high_bid is None: flash('No captain has bid on this player yet.', 'warning'); return redirect(url_for('auctions'))
+    bid_book.flush() # This worker's buffered bid history for the lot
+    # Only sells if no higher bid arrived after `state` was read (otherwise AuctionStateConflict, nothing written)
+    return complete_sale(state, player_id, state.high_bid_team_id, state.high_bid, auction_state.sell_to_high_bidder)
+
+
+def complete_sale(state, player_id, team_id, sold_price, close_transition):
+    # Conditional UPDATEs: the lot must still be open and the team able to pay, checked in the same statement that writes
+    try: sale = sell_player(player_id, team_id, sold_price)
+    except SaleRejected as e: flash(str(e), 'error'); return redirect(url_for('auctions'))
+    publish('sold', player_id=player_id, player_name=sale.player_name, team_id=team_id, team_name=sale.team_name, price=sold_price, purse=sale.purse, slots_remaining=sale.slots_remaining)
+    close_transition(state); invalidate_rosters(); record_sold(); journal.checkpoint(); flash(f'{sale.player_name} sold to {sale.team_name} for {sold_price} points!', 'success')
+    return redirect(url_for('next_player'))
+
+
+@app.route('/bid', methods=['POST'])
+@login_required
+@role_required(['Captain'])
+def place_bid():
+    app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
+    data = request.get_json(silent=True) or request.form
+    try: player_id = int(data.get('player_id')); amount = int(data.get('amount'))
+    except (ValueError, TypeError): return jsonify(ok=False, error='Invalid bid.'), 400
+    if current_user.team_id is None: return jsonify(ok=False, error='Only team captains can bid.'), 403
+    # Most rejections are decided from this worker's in-memory ladder; an accepted bid is one conditional UPDATE
+    try: bid = bid_book.place(auction_state.get_auction_state(), current_user.team_id, current_user.id, player_id, amount)
+    except BidRejected as e: return jsonify(ok=False, error=str(e), next_minimum=e.next_minimum), 409
+    return jsonify(ok=True, amount=bid.amount, team_name=bid.team_name, next_minimum=bid.next_minimum)
 
 
 @app.route('/unsold/<int:player_id>', methods=['POST'])
@@ -221,14 +414,31 @@ def mark_sold(player_id):
 @role_required(['Admin'])
 def mark_unsold(player_id):
     app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
-    if session.get('auction_paused'): flash('Auction is paused. Resume before marking player unsold.', 'warning'); return redirect(url_for('auctions'))
-    player = Player.query.get_or_404(player_id);
-    if player.is_retained or player.status != 'Unsold' or not session.get('auction_started') or session.get('current_player_id') != player_id: flash('This player is not currently up for auction or action already taken.', 'error'); return redirect(url_for('auctions'))
-    auction_round = session.get('auction_round', 1); player.status = f'Round {auction_round} Unsold'; flash_msg = f'{player.player_name} marked as unsold for Round {auction_round}. Available in next round.'
-    db.session.commit(); flash(flash_msg, 'info'); session.pop('current_player_id', None)
+    state = auction_state.get_auction_state(fresh=True)
+    if state.paused: flash('Auction is paused. Resume before marking player unsold.', 'warning'); return redirect(url_for('auctions'))
+    if not state.started or state.current_player_id != player_id: flash(LOT_CLOSED_MESSAGE, 'error'); return redirect(url_for('auctions'))
+    auction_round = state.auction_round
+    try: player_name = pass_player(player_id, auction_round)
+    except SaleRejected as e: flash(str(e), 'error'); return redirect(url_for('auctions'))
+    flash_msg = f'{player_name} marked as unsold for Round {auction_round}. Available in next round.'
+    publish('unsold', player_id=player_id, player_name=player_name, round=auction_round)
+    auction_state.mark_unsold(state); invalidate_rosters(); record_unsold(auction_round); journal.checkpoint(); flash(flash_msg, 'info')
     return redirect(url_for('next_player'))
 
 
+@app.route('/undo_auction', methods=['POST'])
+@login_required
+@role_required(['Admin'])
+def undo_auction():
+    app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
+    # Replays the journal from the latest snapshot; without a count, reopens the last sold/unsold lot
+    try: count = int(request.form['count']) if request.form.get('count') else None
+    except ValueError: flash('Invalid number of actions to undo.', 'error'); return redirect(url_for('auctions'))
+    try: result = journal.undo(count)
+    except journal.JournalError as e: flash(str(e), 'warning'); return redirect(url_for('auctions'))
+    flash(f'Undone: {result.describe()}', 'success'); return redirect(url_for('auctions'))
+
+
 @app.route('/restart_auction', methods=['GET', 'POST'])
 @login_required
 @role_required(['Admin'])
@@ -239,16 +449,12 @@ def restart_auction():
         password = request.form.get('password')
         if not password or not current_user.check_password(password): flash('Invalid admin password. Auction not reset.', 'error'); return render_template('restart_confirm.html', active_page='auctions')
         try:
-            players_to_reset = Player.query.filter_by(is_retained=False).all()
-            for player in players_to_reset: player.status = 'Unsold'; player.sold_price = 0; player.team_id = None
-            teams_to_reset = Team.query.all(); max_slots = 15
-            for team in teams_to_reset:
-                retained_players = Player.query.filter_by(team_id=team.id, is_retained=True).all()
-                retained_count = len(retained_players); retained_cost = sum(p.sold_price for p in retained_players if p.sold_price is not None)
-                team.players_taken_count = retained_count; team.slots_remaining = max_slots - retained_count; team.purse_spent = retained_cost; team.purse = 10000 - retained_cost
-            db.session.commit()
-            session.pop('auction_started', None); session.pop('current_player_id', None); session.pop('auction_round', None); session.pop('round_complete', None); session.pop('auction_complete', None); session.pop('auction_paused', None)
+            state = auction_state.get_auction_state(fresh=True)
+            reset_auction_players(); recalculate_team_stats() # Two set-based UPDATEs, committed with the state transition
+            auction_queue.clear_queues(); publish('reset'); journal.take_baseline(journal.INITIAL_PROGRESS) # Undo stops at the reset
+            auction_state.restart(state); invalidate_rosters(); invalidate_summary()
             flash('Auction has been reset! (Retained players kept)', 'success'); return redirect(url_for('auctions'))
+        except auction_state.AuctionStateConflict: raise
         except Exception as e: db.session.rollback(); flash(f'An error occurred while resetting the auction: {e}', 'error'); return redirect(url_for('auctions'))
     return render_template('restart_confirm.html', active_page='auctions')
 
@@ -258,21 +464,23 @@ def restart_auction():
 @role_required(['Admin'])
 def pause_auction():
     app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
-    if not session.get('auction_started', False) or session.get('auction_complete', False): flash('Auction is not currently running or is already complete.', 'warning'); return redirect(url_for('auctions'))
-    session['auction_paused'] = True; flash('Auction paused.', 'info'); return redirect(url_for('auctions'))
+    state = auction_state.get_auction_state(fresh=True)
+    if not state.started or state.auction_complete: flash('Auction is not currently running or is already complete.', 'warning'); return redirect(url_for('auctions'))
+    publish('paused', round=state.auction_round); auction_state.pause(state); flash('Auction paused.', 'info'); return redirect(url_for('auctions'))
 
 @app.route('/resume_auction', methods=['GET', 'POST'])
 @login_required
 @role_required(['Admin'])
 def resume_auction():
     app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
-    if not session.get('auction_paused', False): flash('Auction is not paused.', 'warning'); return redirect(url_for('auctions'))
+    state = auction_state.get_auction_state(fresh=True)
+    if not state.paused: flash('Auction is not paused.', 'warning'); return redirect(url_for('auctions'))
     if request.method == 'POST':
         if not current_user.is_authenticated: flash('Authentication error. Please log in again.', 'error'); return redirect(url_for('login'))
         password = request.form.get('password')
         if not password or not current_user.check_password(password): flash('Invalid admin credentials. Auction not resumed.', 'error'); return render_template('resume_confirm.html', active_page='auctions')
-        session['auction_paused'] = False; flash('Auction resumed.', 'success')
-        if session.get('current_player_id'): return redirect(url_for('auctions'))
+        publish('resumed', round=state.auction_round); state = auction_state.resume(state); flash('Auction resumed.', 'success')
+        if state.current_player_id: return redirect(url_for('auctions'))
         else: return redirect(url_for('next_player'))
     return render_template('resume_confirm.html', active_page='auctions')
 
@@ -283,14 +491,16 @@ def resume_auction():
 @role_required(['Admin'])
 def create_user():
     app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
-    teams = Team.query.all()
+    teams = Team.query.filter_by(league_id=current_league_id()).all() # Captains are linked to a team of the league being managed
     if request.method == 'POST':
         full_name = request.form.get('full_name'); username = request.form.get('username'); password = request.form.get('password'); role = request.form.get('role'); team_id = request.form.get('team_id')
         if current_user.role == 'Admin' and role in ['Super Admin', 'Admin']:
              flash('Admins can only create Captains.', 'error'); return redirect(url_for('create_user'))
+        try: team_id = league_team_id(team_id, teams) if role == 'Captain' else None
+        except ValueError: flash('Choose a team of this league.', 'error'); return redirect(url_for('create_user'))
         existing_user = User.query.filter_by(username=username).first()
         if existing_user: flash(f'Username "{username}" already exists.', 'error'); return redirect(url_for('create_user'))
-        new_user = User(full_name=full_name, username=username, role=role, team_id=int(team_id) if team_id and role == 'Captain' else None)
+        new_user = User(full_name=full_name, username=username, role=role, team_id=team_id)
         new_user.set_password(password); db.session.add(new_user); db.session.commit()
         flash(f'Login created for {full_name}!', 'success'); return redirect(url_for('dashboard'))
     return render_template('create_user.html', active_page='create_user', teams=teams)
@@ -301,14 +511,18 @@ def create_user():
 def edit_user(user_id):
     app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
     user_to_edit = User.query.get_or_404(user_id)
-    teams = Team.query.all()
+    teams = Team.query.filter_by(league_id=current_league_id()).all()
     if request.method == 'POST':
         new_full_name = request.form.get('full_name'); new_username = request.form.get('username'); new_role = request.form.get('role'); new_team_id = request.form.get('team_id'); new_password = request.form.get('password')
         if new_username != user_to_edit.username and User.query.filter(User.username == new_username, User.id != user_id).first():
             flash(f'Username "{new_username}" is already taken.', 'error')
             return render_template('edit_user.html', active_page='dashboard', user=user_to_edit, teams=teams)
+        try: new_team_id = league_team_id(new_team_id, teams) if new_role == 'Captain' else None
+        except ValueError:
+            flash('Choose a team of this league.', 'error')
+            return render_template('edit_user.html', active_page='dashboard', user=user_to_edit, teams=teams)
         user_to_edit.full_name = new_full_name; user_to_edit.username = new_username; user_to_edit.role = new_role
-        user_to_edit.team_id = int(new_team_id) if new_team_id and new_role == 'Captain' else None
+        user_to_edit.team_id = new_team_id
         if new_password: user_to_edit.set_password(new_password); flash('Password updated successfully.', 'info')
         try:
             db.session.commit(); flash(f'User "{user_to_edit.full_name}" updated successfully!', 'success'); return redirect(url_for('dashboard'))
@@ -332,126 +546,108 @@ def delete_user(user_id):
 @login_required
 def export_team_excel(team_id):
     app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
-    team = Team.query.get_or_404(team_id)
-    # Get all players for the team, ordered by retention status then name
-    team_players = team.players.order_by(Player.is_retained.desc(), Player.player_name).all()
-
-    players_data = []
-    for player in team_players:
-        price_label = player.sold_price if player.sold_price is not None else 0
-        status_label = "Retained" if player.is_retained else ("Sold" if player.status == 'Sold' else "Unsold/Other")
-
-        players_data.append({
-            'Player Name': player.player_name,
-            'Status': status_label,
-            'Price (Points)': price_label,
-            'Role': player.role,
-            'Overall Matches': player.overall_matches,
-            'Overall Runs': player.overall_runs,
-            'Overall Wickets': player.overall_wickets,
-            'Batting Avg': player.batting_avg,
-            'Batting SR': player.overall_sr,
-            'Highest Score': player.overall_hs,
-            'Bowling Avg': player.bowling_avg,
-            'Economy': player.econ,
-            'Best Bowling': player.bbi
-        })
-
-    if not players_data:
+    team = Team.query.filter_by(id=team_id, league_id=current_league_id()).first_or_404()
+    state = auction_state.get_auction_state(fresh=True) # Its version keys the export cache
+    roster = next((r for r in get_team_rosters() if r.id == team.id), None)
+    if roster is None or not roster.has_players:
         flash(f"{team.team_name} has no players to export.", "info")
         return redirect(url_for('teams'))
 
-    # Create a Pandas DataFrame
-    df = pd.DataFrame(players_data)
-
-    # Create an in-memory Excel file (BytesIO buffer)
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name=team.team_name)
-    output.seek(0) # Go to the beginning of the buffer
-
-    # Send the in-memory file to the user's browser as a download
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', # Standard Excel MIME type
-        download_name=f'{team.team_name}_players.xlsx', # Filename for the download
-        as_attachment=True # Tell the browser to download the file
-    )
+    # Built row by row on a cache miss; repeat downloads are served from disk until the data changes
+    path, download_name, mimetype = export_team_file(team, state.version)
+    return send_file(path, mimetype=mimetype, download_name=download_name, as_attachment=True)
 
 # --- NEW EXPORT ROUTE FOR PLAYERS ---
 @app.route('/export_players')
 @login_required
 def export_players():
     app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
-    # Get the filter value from the URL (e.g., ?filter=sold)
+    # Get the filter value from the URL (e.g., ?filter=sold) and the format (?format=csv for large pools)
     filter_by = request.args.get('filter', 'all')
-    
-    query = Player.query # Start with all players
-    
-    if filter_by == 'retained':
-        query = query.filter_by(is_retained=True)
-        filename = "retained_players.xlsx"
-    elif filter_by == 'auction':
-        query = query.filter_by(is_retained=False)
-        filename = "auction_pool_players.xlsx"
-    elif filter_by == 'sold':
-        query = query.filter_by(is_retained=False, status='Sold')
-        filename = "sold_players.xlsx"
-    elif filter_by == 'unsold':
-        # Includes players 'Unsold' (in pool) and those marked for next rounds
-        query = query.filter(
-            Player.is_retained==False,
-            (Player.status.like('Round % Unsold') | (Player.status == 'Unsold Final') | (Player.status == 'Unsold'))
-        )
-        filename = "unsold_players.xlsx"
-    else: # 'all'
-        filename = "all_players.xlsx"
-        
-    # Get the list of players based on the filter
-    players_list = query.order_by(Player.player_name).all()
-
-    if not players_list:
+    file_format = 'csv' if request.args.get('format') == 'csv' else 'xlsx'
+    state = auction_state.get_auction_state(fresh=True)
+    summary = get_status_summary()
+
+    # Empty filters are answered from the status summary without touching the player table
+    if summary.count_for_filter(filter_by) == 0:
         flash(f"No players found for the filter '{filter_by}'.", "info")
         return redirect(url_for('players'))
 
-    # Prepare data for Excel
-    players_data = []
-    for player in players_list:
-        players_data.append({
-            'Player Name': player.player_name,
-            'Status': 'Retained' if player.is_retained else player.status,
-            'Price (Points)': player.sold_price if (player.is_retained or player.status == 'Sold') else 0,
-            # 'Role': player.role, # <-- REMOVED
-            # 'Last Team': player.last_team, # <-- REMOVED
-            'Matches': player.overall_matches,
-            'Bat Inn': player.batting_inn,
-            'Bat Runs': player.overall_runs,
-            'Bat Avg': player.batting_avg,
-            'Bat SR': player.overall_sr,
-            'Bat HS': player.overall_hs,
-            'Bowl Inn': player.bowling_inn,
-            'Bowl Wkts': player.overall_wickets,
-            'Bowl Avg': player.bowling_avg,
-            'Bowl Econ': player.econ,
-            'Bowl BBI': player.bbi,
-        })
-    
-    # Create Excel file in memory
-    df = pd.DataFrame(players_data)
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Players')
-    output.seek(0)
-    
-    # Send the file to the user
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        download_name=filename,
-        as_attachment=True
-    )
+    path, download_name, mimetype = export_players_file(filter_by, state.version, file_format)
+    return send_file(path, mimetype=mimetype, download_name=download_name, as_attachment=True)
+
+# --- FULL AUCTION EXPORT (one sheet per team) ---
+@app.route('/export_auction_excel')
+@login_required
+def export_auction_excel():
+    app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
+    state = auction_state.get_auction_state(fresh=True)
+    path, download_name, mimetype = export_auction_file(state.version)
+    return send_file(path, mimetype=mimetype, download_name=download_name, as_attachment=True)
+
+# --- BACKGROUND JOBS (exports and imports run by jobs.py off the request thread) ---
+def job_started(job):
+    if request.args.get('format') == 'json' or request.is_json: return jsonify(jobs.job_json(job)), 202
+    flash(f'Job #{job.id} started.', 'info'); return redirect(url_for('dashboard'))
+
+@app.route('/jobs/export', methods=['POST'])
+@login_required
+@role_required(['Admin'])
+def start_export_job():
+    app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
+    data = request.get_json(silent=True) or request.form
+    kind = data.get('kind', 'players')
+    if kind == 'players': params = {'filter': data.get('filter', 'all'), 'format': data.get('file_format', 'xlsx')}
+    elif kind == 'team':
+        try: params = {'team_id': int(data.get('team_id'))}
+        except (ValueError, TypeError): flash('Choose a team to export.', 'error'); return redirect(url_for('dashboard'))
+    elif kind == 'auction': params = {}
+    else: flash('Unknown export.', 'error'); return redirect(url_for('dashboard'))
+    return job_started(jobs.submit(f'export_{kind}', params, current_user.id))
+
+@app.route('/jobs/import', methods=['POST'])
+@login_required
+@role_required(['Admin'])
+def start_import_job():
+    app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
+    upload = request.files.get('csv_file')
+    if upload is None or not upload.filename.lower().endswith('.csv'): flash('Choose a CSV file to import.', 'error'); return redirect(url_for('dashboard'))
+    params = {'upload': jobs.save_upload(upload), 'filename': upload.filename, 'dry_run': bool(request.form.get('dry_run'))}
+    return job_started(jobs.submit('import_players', params, current_user.id))
+
+@app.route('/jobs/users', methods=['POST'])
+@login_required
+@role_required(['Admin'])
+def start_provision_job():
+    """Bulk logins from a CSV (provisioning.py); Admins may only create Captains, as with create_user."""
+    app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
+    upload = request.files.get('csv_file')
+    if upload is None or not upload.filename.lower().endswith('.csv'): flash('Choose a CSV file of users.', 'error'); return redirect(url_for('dashboard'))
+    roles = list(ROLES) if current_user.role == 'Super Admin' else ['Captain']
+    params = {'upload': jobs.save_upload(upload), 'filename': upload.filename, 'roles': roles, 'dry_run': bool(request.form.get('dry_run'))}
+    return job_started(jobs.submit('provision_users', params, current_user.id))
+
+@app.route('/jobs/<int:job_id>')
+@login_required
+@role_required(['Admin'])
+def job_status(job_id):
+    app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
+    job = Job.query.filter_by(id=job_id, league_id=current_league_id()).first_or_404()
+    if job.status == 'queued': job_runner.wake() # Queued by a worker that has gone away: run it here
+    return jsonify(jobs.job_json(job))
+
+@app.route('/jobs/<int:job_id>/download')
+@login_required
+@role_required(['Admin'])
+def download_job(job_id):
+    app_version = "1.0.5" # <-- ADD THIS. Change to 1.0.6 next time
+    job = Job.query.filter_by(id=job_id, league_id=current_league_id()).first_or_404()
+    path = jobs.artifact_path(job)
+    if job.status != 'done' or path is None or not os.path.exists(path): flash('That job has no file to download.', 'warning'); return redirect(url_for('dashboard'))
+    return send_file(path, mimetype=job.mimetype, download_name=job.download_name, as_attachment=True)
 
 # --- RUN THE APP ---
 if __name__ == '__main__':
+    with app.app_context(): init_db() # Development convenience; deployments run `flask --app app init-db` once
 
     app.run(debug=True)
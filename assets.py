@@ -0,0 +1,175 @@
+"""Static asset build: minified, content-hashed, precompressed CSS/JS.
+
+``python assets.py`` (run at build/deploy time, like ``image_pipeline.py``)
+minifies ``static/style.css`` and the page scripts in ``static/js``, writes
+each to ``static/dist`` under a name with a hash of its content
+(``style.<hash>.css``) plus ``.gz`` and ``.br`` variants (Brotli only if the
+``brotli`` package is installed), and records the names in
+``static/dist/manifest.json``. It then compiles every template into the
+Jinja bytecode cache (``JINJA_BYTECODE_CACHE``), so new workers load
+templates without parsing them.
+
+At runtime ``url_for('static', filename='style.css')`` resolves to the
+fingerprinted file when it has been built (and to the plain file
+otherwise); ``/static/dist/`` answers with the Brotli or gzip variant the
+browser accepts and far-future immutable cache headers, since a changed
+file gets a new name.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from threading import Lock
+
+from flask import abort, request, send_from_directory
+from werkzeug.security import safe_join
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+ASSET_SOURCES = ('style.css', 'js/players.js', 'js/auctions.js')
+ENCODINGS = (('br', '.br'), ('gzip', '.gz')) # Preferred first
+BUILD_VERSION = 1 # Bump when the minifiers change so every hash changes
+
+
+# --- Minifiers (conservative: strings are kept verbatim, only comments and whitespace go) ---
+CSS_TOKENS = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|(/\*.*?\*/)|(\s+)''', re.S)
+JS_TOKENS = re.compile(r'''("(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`)|(/\*.*?\*/|//[^\n]*)|(\s+)''', re.S)
+CSS_TIGHT = set('{};,:')
+JS_TIGHT = set('{}();,:=')
+
+
+def minify_css(text):
+    def token(match):
+        if match.group(1): return match.group(1)
+        if match.group(2): return ''
+        before, after = text[match.start() - 1:match.start()], text[match.end():match.end() + 1]
+        return '' if not before or not after or before in CSS_TIGHT or after in '{};,' else ' '
+    return CSS_TOKENS.sub(token, text).strip()
+
+
+def minify_js(text):
+    """Drops comments and indentation; line breaks are kept (automatic semicolon insertion relies on them)."""
+    def token(match):
+        if match.group(1): return match.group(1)
+        if match.group(2): return ''
+        if '\n' in match.group(3): return '\n'
+        before, after = text[match.start() - 1:match.start()], text[match.end():match.end() + 1]
+        return '' if before in JS_TIGHT or after in JS_TIGHT else ' '
+    return re.sub(r'\n[ \t\n]*', '\n', JS_TOKENS.sub(token, text)).strip()
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+# --- Build ---
+def build_asset(source, brotli=None):
+    """Writes the minified, fingerprinted file of ``source`` and its compressed variants; returns the built name."""
+    with open(os.path.join(STATIC_DIR, source), encoding='utf-8') as handle: text = handle.read()
+    stem, extension = os.path.splitext(source)
+    content = MINIFIERS[extension](text).encode('utf-8')
+    digest = hashlib.sha256(content + f':{BUILD_VERSION}'.encode()).hexdigest()[:12]
+    name = f"{stem}.{digest}{extension}"
+    path = os.path.join(DIST_DIR, name)
+    if os.path.exists(path): return name # Same content already built
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    variants = {'': content, '.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli: variants['.br'] = brotli.compress(content, quality=11)
+    for suffix, data in variants.items():
+        with open(path + suffix + '.tmp', 'wb') as handle: handle.write(data)
+        os.replace(path + suffix + '.tmp', path + suffix)
+    return name
+
+
+def build_all(verbose=True):
+    """Builds every asset, writes the manifest and removes files no longer referenced."""
+    os.makedirs(DIST_DIR, exist_ok=True)
+    try: import brotli # Build-time dependency only
+    except ImportError: brotli = None; print("brotli is not installed; writing gzip variants only.")
+    manifest = {source: build_asset(source, brotli) for source in ASSET_SOURCES}
+    tmp_path = MANIFEST_PATH + '.tmp'
+    with open(tmp_path, 'w') as handle: json.dump(manifest, handle, indent=1, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+    keep = {os.path.normpath(name + suffix) for name in manifest.values() for suffix in ('', '.gz', '.br')}
+    for root, _, files in os.walk(DIST_DIR):
+        for file_name in files:
+            relative = os.path.relpath(os.path.join(root, file_name), DIST_DIR)
+            if relative != os.path.basename(MANIFEST_PATH) and relative not in keep and not file_name.endswith('.tmp'):
+                os.remove(os.path.join(root, file_name))
+    if verbose:
+        for source, name in manifest.items():
+            print(f"{source} -> dist/{name} ({os.path.getsize(os.path.join(STATIC_DIR, source)):,} -> {os.path.getsize(os.path.join(DIST_DIR, name)):,} bytes, "
+                  f"gzip {os.path.getsize(os.path.join(DIST_DIR, name + '.gz')):,})")
+    return manifest
+
+
+def compile_templates(app):
+    """Loads every template once so the Jinja bytecode cache holds all of them."""
+    if app.jinja_env.bytecode_cache is None: return 0
+    names = app.jinja_env.list_templates(extensions=['html'])
+    for name in names: app.jinja_env.get_template(name)
+    return len(names)
+
+
+# --- Runtime lookup ---
+_manifest_cache = {'mtime': None, 'manifest': {}, 'token': ''}
+_manifest_lock = Lock()
+
+
+def _manifest():
+    """(manifest, token), re-read only when the file changes (e.g. after a rebuild)."""
+    try: mtime = os.path.getmtime(MANIFEST_PATH)
+    except OSError: mtime = None
+    with _manifest_lock:
+        if mtime != _manifest_cache['mtime']:
+            try:
+                with open(MANIFEST_PATH, 'rb') as handle: raw = handle.read()
+                _manifest_cache['manifest'], _manifest_cache['token'] = json.loads(raw), hashlib.sha1(raw).hexdigest()[:12]
+            except (OSError, ValueError):
+                _manifest_cache['manifest'], _manifest_cache['token'] = {}, ''
+            _manifest_cache['mtime'] = mtime
+        return _manifest_cache['manifest'], _manifest_cache['token']
+
+
+def manifest_token():
+    """Changes whenever the assets are rebuilt; part of the page cache key, since pages link the built names."""
+    return _manifest()[1]
+
+
+def fingerprint_static(endpoint, values):
+    """``url_defaults`` hook: ``url_for('static', filename=<source>)`` points at the built file."""
+    if endpoint == 'static':
+        built = _manifest()[0].get(values.get('filename'))
+        if built: values['filename'] = f'dist/{built}'
+
+
+def send_asset(filename):
+    """Serves a built asset, precompressed when the browser accepts it."""
+    path = safe_join(DIST_DIR, filename)
+    if path is None or not os.path.isfile(path): abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.isfile(path + suffix):
+            response = send_from_directory(DIST_DIR, filename + suffix, mimetype=mimetype)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(DIST_DIR, filename, mimetype=mimetype)
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_app(app):
+    app.url_defaults(fingerprint_static)
+    app.add_url_rule('/static/dist/<path:filename>', 'asset', send_asset) # More specific than /static/<path:filename>
+
+
+if __name__ == '__main__':
+    built = build_all()
+    print(f"{len(built)} assets in the asset manifest ({MANIFEST_PATH}).")
+    from app import app
+    compiled = compile_templates(app)
+    print(f"{compiled} templates compiled into the Jinja bytecode cache." if compiled else "Jinja bytecode cache is off (JINJA_BYTECODE_CACHE).")
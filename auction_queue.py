@@ -0,0 +1,110 @@
+"""Per-round shuffled player queue for next_player.
+
+When a round starts, the current league's live pool ('Unsold', non-retained)
+is shuffled once and stored as ``auction_queue`` rows with a cursor on the
+league's ``AuctionRound`` row. Each pick is then a primary-key lookup at the cursor instead of loading
+the whole pool for ``random.choice``.
+
+The order is reproducible for audit: the first segment is
+``random.Random(seed)`` applied to the sorted player ids, and any segment
+appended later (players who re-entered the pool mid-round) uses
+``random.Random(f"{seed}:{offset}")``. See ``replay_round_order()``.
+
+None of these functions commit; changes go out with the auction state
+transition that follows them.
+"""
+import random
+
+from sqlalchemy import delete, insert, select
+
+from models import db, Player, AuctionRound, AuctionQueueEntry
+from auction_stats import get_status_summary
+from leagues import current_league_id
+
+
+def _live_pool_ids():
+    return list(db.session.execute(
+        select(Player.id).where(Player.league_id == current_league_id(), Player.status == 'Unsold', Player.is_retained == False)
+        .order_by(Player.id)
+    ).scalars())
+
+
+def _queue_entries(auction_round):
+    return (AuctionQueueEntry.league_id == current_league_id(), AuctionQueueEntry.auction_round == auction_round)
+
+
+def _round_row(auction_round):
+    return db.session.get(AuctionRound, (current_league_id(), auction_round))
+
+
+def _segment_rng(seed, offset):
+    return random.Random(seed) if offset == 0 else random.Random(f"{seed}:{offset}")
+
+
+def _append_segment(round_row, player_ids):
+    order = sorted(player_ids); _segment_rng(round_row.seed, round_row.queue_length).shuffle(order)
+    if order:
+        db.session.execute(insert(AuctionQueueEntry), [
+            {'league_id': round_row.league_id, 'auction_round': round_row.auction_round, 'position': round_row.queue_length + i,
+             'segment': round_row.queue_length, 'player_id': player_id}
+            for i, player_id in enumerate(order)
+        ])
+    round_row.queue_length += len(order)
+
+
+def build_round_queue(auction_round, seed=None):
+    """Shuffles the current live pool into the queue for ``auction_round`` (replacing any previous one)."""
+    if seed is None: seed = random.SystemRandom().randrange(2 ** 31)
+    db.session.execute(delete(AuctionQueueEntry).where(*_queue_entries(auction_round)))
+    round_row = _round_row(auction_round)
+    if round_row is None:
+        round_row = AuctionRound(league_id=current_league_id(), auction_round=auction_round); db.session.add(round_row)
+    round_row.seed = seed; round_row.queue_length = 0; round_row.cursor = 0
+    _append_segment(round_row, _live_pool_ids())
+    return round_row
+
+
+def next_queued_player(auction_round):
+    """Advances the cursor to the next player still in the live pool; None when the round is exhausted."""
+    round_row = _round_row(auction_round)
+    if round_row is None: round_row = build_round_queue(auction_round)
+    while True:
+        if round_row.cursor >= round_row.queue_length:
+            # Players who re-entered the pool after the shuffle (skipped lot, late import) go to the back
+            if get_status_summary().currently_unsold_count == 0: return None
+            queued = select(AuctionQueueEntry.player_id).where(*_queue_entries(auction_round), AuctionQueueEntry.position >= round_row.cursor)
+            still_queued = set(db.session.execute(queued).scalars())
+            stragglers = [pid for pid in _live_pool_ids() if pid not in still_queued]
+            if not stragglers: return None
+            _append_segment(round_row, stragglers)
+        player_id = db.session.execute(
+            select(AuctionQueueEntry.player_id)
+            .where(*_queue_entries(auction_round), AuctionQueueEntry.position == round_row.cursor)
+        ).scalar_one()
+        round_row.cursor += 1
+        player = db.session.get(Player, player_id)
+        if player is not None and player.status == 'Unsold' and not player.is_retained:
+            return player
+
+
+def clear_queues():
+    """Drops every round queue of the current league (auction reset)."""
+    db.session.execute(delete(AuctionQueueEntry).where(AuctionQueueEntry.league_id == current_league_id()))
+    db.session.execute(delete(AuctionRound).where(AuctionRound.league_id == current_league_id()))
+
+
+def replay_round_order(auction_round):
+    """Recomputes the stored order from the seed; returns (stored, replayed) player id lists for audit."""
+    round_row = _round_row(auction_round)
+    if round_row is None: return [], []
+    rows = db.session.execute(
+        select(AuctionQueueEntry.segment, AuctionQueueEntry.player_id)
+        .where(*_queue_entries(auction_round)).order_by(AuctionQueueEntry.position)
+    ).all()
+    stored = [row.player_id for row in rows]
+    segments = {}
+    for row in rows: segments.setdefault(row.segment, []).append(row.player_id)
+    replayed = []
+    for offset, player_ids in sorted(segments.items()):
+        order = sorted(player_ids); _segment_rng(round_row.seed, offset).shuffle(order); replayed.extend(order)
+    return stored, replayed
@@ -0,0 +1,212 @@
+"""Shared auction state machine.
+
+The live auction progress (started, current player, round, round/auction
+complete, paused) lives in the league's ``auction_state`` row (its id is the
+league id) instead of each browser's session cookie, so admins, captains and
+spectators on any gunicorn worker see the same auction.
+
+Every transition is a conditional ``UPDATE ... WHERE version = :seen`` that
+commits together with the route's own player/team changes; if another worker
+moved the state first, ``AuctionStateConflict`` is raised and nothing is
+written. Readers get a snapshot cached in-process for
+``AUCTION_STATE_CACHE_SECONDS``; when a snapshot shows a version this worker
+did not write, the league's other in-process caches (rosters, status
+summary) are dropped so they are rebuilt from the database.
+"""
+import datetime
+import time
+from dataclasses import dataclass, replace
+from threading import Lock
+
+from flask import current_app
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, AuctionState
+from rosters import invalidate_rosters
+from auction_stats import invalidate_summary
+from leagues import current_league_id
+from db_engines import on_primary
+
+DEFAULT_CACHE_SECONDS = 1.0
+
+
+class AuctionStateConflict(Exception):
+    """Raised when the auction state changed underneath a transition (e.g. another admin console)."""
+
+
+@dataclass(frozen=True)
+class AuctionSnapshot:
+    league_id: int = None
+    version: int = 0
+    started: bool = False
+    current_player_id: int = None
+    auction_round: int = 1
+    round_complete: bool = False
+    auction_complete: bool = False
+    paused: bool = False
+    high_bid: int = None
+    high_bid_team_id: int = None
+    stats_version: int = 0 # Moves only when player stats change (imports); restarts keep it
+    updated_at: datetime.datetime = None # UTC time of the last transition or leading bid
+
+
+_state_cache = {} # league_id -> (snapshot, loaded_at)
+_state_lock = Lock()
+
+
+def ensure_state_row(league_id=None):
+    """Creates the league's shared state row (default: the current league) if it does not exist yet."""
+    league_id = current_league_id() if league_id is None else league_id
+    if db.session.get(AuctionState, league_id) is None:
+        try:
+            db.session.execute(insert(AuctionState).values(id=league_id, **_initial_values()))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback() # Another worker created it first
+
+
+def _initial_values():
+    initial = AuctionSnapshot()
+    return dict(started=initial.started, current_player_id=initial.current_player_id, auction_round=initial.auction_round,
+                round_complete=initial.round_complete, auction_complete=initial.auction_complete, paused=initial.paused,
+                high_bid=None, high_bid_team_id=None, version=0, updated_at=datetime.datetime.utcnow())
+
+
+@on_primary
+def _load(league_id):
+    row = db.session.execute(select(AuctionState.__table__).where(AuctionState.id == league_id)).mappings().first()
+    if row is None:
+        ensure_state_row(league_id)
+        row = db.session.execute(select(AuctionState.__table__).where(AuctionState.id == league_id)).mappings().first()
+    return AuctionSnapshot(league_id=league_id, version=row['version'], started=bool(row['started']), current_player_id=row['current_player_id'],
+                           auction_round=row['auction_round'], round_complete=bool(row['round_complete']),
+                           auction_complete=bool(row['auction_complete']), paused=bool(row['paused']),
+                           high_bid=row['high_bid'], high_bid_team_id=row['high_bid_team_id'], stats_version=row['stats_version'],
+                           updated_at=row['updated_at'])
+
+
+def _remember(snapshot, own_write=False):
+    with _state_lock:
+        previous, _ = _state_cache.get(snapshot.league_id, (None, 0.0))
+        _state_cache[snapshot.league_id] = (snapshot, time.monotonic())
+    # A version this worker did not produce means another worker changed the league's players/teams.
+    if not own_write and (previous is None or previous.version != snapshot.version):
+        invalidate_rosters(snapshot.league_id); invalidate_summary(snapshot.league_id)
+
+
+def get_auction_state(fresh=False, league_id=None):
+    """Returns the league's current snapshot (default: the current league). Pass ``fresh=True`` before deciding on a transition."""
+    league_id = current_league_id() if league_id is None else league_id
+    if not fresh:
+        ttl = current_app.config.get('AUCTION_STATE_CACHE_SECONDS', DEFAULT_CACHE_SECONDS)
+        with _state_lock:
+            snapshot, loaded_at = _state_cache.get(league_id, (None, 0.0))
+            if snapshot is not None and time.monotonic() - loaded_at < ttl:
+                return snapshot
+    snapshot = _load(league_id)
+    _remember(snapshot)
+    return snapshot
+
+
+def _transition(state, conditions=(), **changes):
+    """Applies ``changes`` if nobody moved the state since ``state`` was read, and commits the session."""
+    changes['updated_at'] = datetime.datetime.utcnow()
+    result = db.session.execute(
+        update(AuctionState)
+        .where(AuctionState.id == state.league_id, AuctionState.version == state.version, *conditions)
+        .values(version=state.version + 1, **changes)
+    )
+    if result.rowcount != 1:
+        db.session.rollback()
+        raise AuctionStateConflict('The auction was updated from another console. Please check the current state and try again.')
+    db.session.commit()
+    snapshot = replace(state, version=state.version + 1, **changes)
+    _remember(snapshot, own_write=True)
+    return snapshot
+
+
+# --- TRANSITIONS ---
+CLOSED_LOT = dict(current_player_id=None, high_bid=None, high_bid_team_id=None)
+
+
+def present_player(state, player_id):
+    """next_player: put ``player_id`` up for bidding."""
+    return _transition(state, started=True, current_player_id=player_id, round_complete=False, auction_complete=False, high_bid=None, high_bid_team_id=None)
+
+
+def mark_sold(state):
+    """The current player was sold; the lot closes."""
+    return _transition(state, **CLOSED_LOT)
+
+
+def sell_to_high_bidder(state):
+    """Like ``mark_sold``, but only if the leading bid is still the one in ``state`` (no later bid slipped in)."""
+    return _transition(state, conditions=(AuctionState.high_bid == state.high_bid, AuctionState.high_bid_team_id == state.high_bid_team_id), **CLOSED_LOT)
+
+
+def mark_unsold(state):
+    """The current player was passed over for this round; the lot closes."""
+    return _transition(state, **CLOSED_LOT)
+
+
+def complete_round(state):
+    """The live pool is empty but passed-over players remain for another round."""
+    return _transition(state, started=False, round_complete=True, **CLOSED_LOT)
+
+
+def complete_auction(state):
+    """Every non-retained player has been processed."""
+    return _transition(state, started=False, round_complete=False, auction_complete=True, **CLOSED_LOT)
+
+
+def start_round(state, auction_round):
+    """Passed-over players are back in the pool for ``auction_round``."""
+    return _transition(state, auction_round=auction_round, started=True, round_complete=False, paused=False)
+
+
+def pause(state):
+    return _transition(state, paused=True)
+
+
+def resume(state):
+    return _transition(state, paused=False)
+
+
+def touch(state, stats_changed=False):
+    """Bumps the version without changing progress (players/teams changed outside the auction routes, e.g. an import).
+
+    Pass ``stats_changed=True`` when player stats were rewritten, so cached ratings are recomputed too.
+    """
+    snapshot = _transition(state, **(dict(stats_version=state.stats_version + 1) if stats_changed else {}))
+    # Other workers drop their caches when they see the new version; this one wrote it, so drop them here (e.g. an import job's worker)
+    invalidate_rosters(snapshot.league_id); invalidate_summary(snapshot.league_id)
+    return snapshot
+
+
+def restore(state, **progress):
+    """Sets the progress fields to ``progress`` (journal undo/rebuild); any leading bid is dropped."""
+    return _transition(state, high_bid=None, high_bid_team_id=None, **progress)
+
+
+def restart(state):
+    """Back to a fresh, not-yet-started auction (round 1)."""
+    values = _initial_values(); values.pop('version')
+    return _transition(state, **values)
+
+
+# --- BIDS (no version bump: bids do not change players/teams, and must not conflict with admin transitions) ---
+def raise_high_bid(league_id, player_id, team_id, amount, min_raise=1):
+    """Makes ``amount`` by ``team_id`` the leading bid if ``player_id`` is still up, ``amount`` beats the current one by ``min_raise``
+    and ``team_id`` does not already lead (a team never raises its own bid, whichever worker took the earlier one).
+
+    One conditional UPDATE, not committed; returns False when another bid (or a lot change) got there first.
+    """
+    result = db.session.execute(
+        update(AuctionState)
+        .where(AuctionState.id == league_id, AuctionState.current_player_id == player_id, AuctionState.started == True,
+               AuctionState.paused == False, or_(AuctionState.high_bid.is_(None), AuctionState.high_bid + min_raise <= amount),
+               or_(AuctionState.high_bid_team_id.is_(None), AuctionState.high_bid_team_id != team_id))
+        .values(high_bid=amount, high_bid_team_id=team_id, updated_at=datetime.datetime.utcnow())
+    )
+    return result.rowcount == 1
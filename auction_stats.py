@@ -0,0 +1,131 @@
+"""Player status summary shared by the home, auction and export views.
+
+All counts of a league come from a single ``GROUP BY is_retained, status,
+unsold_round`` query (served by the ``ix_player_league_status`` index). The
+summary is kept in-process per league and adjusted in place by the auction routes
+(sold, unsold, next round), so a normal page view runs no COUNT queries.
+Anything that rewrites statuses wholesale (reset, import) should call
+``invalidate_summary()`` instead.
+"""
+from threading import Lock
+
+from sqlalchemy import func, select
+
+from models import db, Team, Player
+from leagues import current_league_id, get_league
+from db_engines import on_primary
+
+
+class StatusSummary:
+    """Player counts keyed on (is_retained, status, unsold_round), plus the team count and squad size."""
+
+    def __init__(self, counts, team_count, max_team_slots):
+        self.counts = dict(counts)
+        self.team_count = team_count
+        self.max_team_slots = max_team_slots
+
+    # --- Raw lookups ---
+    def count(self, status, is_retained=False):
+        return sum(n for (retained, row_status, _), n in self.counts.items() if retained == is_retained and row_status == status)
+
+    # --- Derived figures used by the templates ---
+    @property
+    def total_players(self):
+        return sum(self.counts.values())
+
+    @property
+    def retained_count(self):
+        return sum(n for (retained, _, _), n in self.counts.items() if retained)
+
+    @property
+    def total_auction_players(self):
+        return self.total_players - self.retained_count
+
+    @property
+    def sold_count(self):
+        return self.count('Sold')
+
+    @property
+    def currently_unsold_count(self):
+        return self.count('Unsold')
+
+    @property
+    def marked_unsold_count(self):
+        return self.count('Passed')
+
+    @property
+    def auction_slots_available(self):
+        return self.team_count * self.max_team_slots - self.retained_count
+
+    def round_unsold_count(self, auction_round):
+        return self.counts.get((False, 'Passed', auction_round), 0)
+
+    def count_for_filter(self, filter_by):
+        """Row count for the players page / export filters ('all', 'retained', 'auction', 'sold', 'unsold')."""
+        if filter_by == 'retained': return self.retained_count
+        if filter_by == 'auction': return self.total_auction_players
+        if filter_by == 'sold': return self.sold_count
+        if filter_by == 'unsold': return self.currently_unsold_count + self.marked_unsold_count
+        return self.total_players
+
+    # --- In-place transitions (mirror what the auction routes commit) ---
+    def _move(self, from_key, to_key, n=1):
+        self.counts[from_key] = max(self.counts.get(from_key, 0) - n, 0)
+        self.counts[to_key] = self.counts.get(to_key, 0) + n
+
+
+_summary_cache = {} # league_id -> StatusSummary
+_summary_lock = Lock()
+
+
+@on_primary
+def load_status_summary(league_id):
+    """Builds a fresh summary of the league from one GROUP BY query (and a team count)."""
+    rows = db.session.execute(
+        select(Player.is_retained, Player.status, Player.unsold_round, func.count(Player.id))
+        .where(Player.league_id == league_id)
+        .group_by(Player.is_retained, Player.status, Player.unsold_round)
+    ).all()
+    team_count = db.session.execute(select(func.count(Team.id)).where(Team.league_id == league_id)).scalar_one()
+    return StatusSummary({(bool(retained), status, unsold_round): n for retained, status, unsold_round, n in rows},
+                         team_count, get_league(league_id).max_team_slots)
+
+
+def get_status_summary(league_id=None):
+    """Returns the league's in-process summary (default: the current league), loading it on first use or after an invalidation."""
+    league_id = current_league_id() if league_id is None else league_id
+    with _summary_lock:
+        if _summary_cache.get(league_id) is None:
+            _summary_cache[league_id] = load_status_summary(league_id)
+        return _summary_cache[league_id]
+
+
+LIVE_POOL = (False, 'Unsold', None)
+
+
+def _apply(from_key, to_key, n=1):
+    with _summary_lock:
+        summary = _summary_cache.get(current_league_id())
+        if summary is not None:
+            summary._move(from_key, to_key, n)
+
+
+def record_sold():
+    """One live-pool player was sold."""
+    _apply(LIVE_POOL, (False, 'Sold', None))
+
+
+def record_unsold(auction_round):
+    """One live-pool player was passed over in ``auction_round``."""
+    _apply(LIVE_POOL, (False, 'Passed', auction_round))
+
+
+def record_round_started(completed_round, moved_count):
+    """Players passed over in ``completed_round`` went back into the live pool."""
+    _apply((False, 'Passed', completed_round), LIVE_POOL, moved_count)
+
+
+def invalidate_summary(league_id=None):
+    """Drops the league's summary (default: the current league) so the next reader reloads it from the database."""
+    with _summary_lock:
+        _summary_cache.pop(current_league_id() if league_id is None else league_id, None)
@@ -0,0 +1,258 @@
+"""Auction-night load benchmark.
+
+Seeds a scratch database with N teams and M synthetic players (written to a
+CSV and loaded through ``import_players_from_csv``), then drives a whole
+auction through the real routes with Flask's test client (next_player,
+sold/unsold, start_next_round) while spectator threads keep requesting
+``/``, ``/teams``, ``/auctions``, ``/players`` and the exports. Reports
+p50/p95/p99 latency, throughput and SQL statements per route (from the
+metrics hooks) and saves the results as JSON named after the git commit,
+so runs can be compared between commits.
+
+    python benchmark.py --teams 8 --players 300 --spectators 16
+    python benchmark.py --database-url postgresql://localhost/cpl_bench
+    python benchmark.py --compare instance/benchmarks/<older run>.json
+
+The database at --database-url is wiped: never point it at the live one.
+"""
+import argparse
+import contextlib
+import csv
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BASE_DIR, 'instance', 'benchmarks')
+ADMIN = ('bench_admin', 'bench-admin-pw')
+CAPTAIN = ('bench_captain', 'bench-captain-pw')
+RETAINED_PER_TEAM = 2
+MIN_PRICE, MAX_PRICE, PRICE_STEP = 50, 1500, 25
+
+# (route name, path, weight, needs a logged-in spectator)
+SPECTATOR_ROUTES = [
+    ('home', '/', 3, False),
+    ('teams', '/teams', 3, False),
+    ('auctions', '/auctions', 6, False),
+    ('players', '/players', 2, True),
+    ('export_players', '/export_players?filter=all', 1, True),
+    ('export_auction_excel', '/export_auction_excel', 1, True),
+    ('export_team_excel', '/export_team_excel/{team_id}', 1, True),
+]
+
+
+class Recorder:
+    """Thread-safe latency/status log per route."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.started = time.perf_counter()
+
+    def request(self, client, route, method, path, **kwargs):
+        started = time.perf_counter()
+        response = client.open(path, method=method, **kwargs)
+        elapsed = time.perf_counter() - started
+        response.close()
+        with self._lock: self.samples.setdefault(route, []).append((elapsed, response.status_code))
+        return response
+
+
+# --- Seeding ---
+def write_players_csv(path, team_names, player_count, rng):
+    columns = ['player_name', 'image_filename', 'is_retained', 'retaining_team_name', 'last_year_price', 'role', 'overall_matches',
+               'overall_runs', 'overall_wickets', 'overall_sr', 'overall_hs', 'batting_inn', 'batting_avg', 'bowling_inn', 'bowling_avg', 'econ', 'bbi']
+    retained = {index: team_name for index, team_name in enumerate(name for name in team_names for _ in range(RETAINED_PER_TEAM))}
+    with open(path, 'w', newline='') as handle:
+        writer = csv.writer(handle); writer.writerow(columns)
+        for index in range(player_count):
+            matches = rng.randint(0, 120)
+            writer.writerow([f'BENCH PLAYER {index + 1:04d}', '', 'TRUE' if index in retained else 'FALSE', retained.get(index, ''),
+                             rng.randrange(200, 1200, PRICE_STEP) if index in retained else '', rng.choice(['Batsman', 'Bowler', 'All-Rounder', 'Wicket Keeper']),
+                             matches, rng.randint(0, 3000), rng.randint(0, 150), round(rng.uniform(60, 180), 2), rng.randint(0, 120), matches,
+                             round(rng.uniform(5, 45), 2), rng.randint(0, matches), round(rng.uniform(8, 40), 2), round(rng.uniform(4, 11), 2),
+                             f'{rng.randint(1, 6)}({rng.randint(5, 30)})'])
+
+
+def seed(app, team_count, player_count, rng, scratch_dir):
+    from models import db, User, Team
+    from migrations import migration_metadata, run_migrations
+    from import_players import import_players_from_csv
+    with app.app_context():
+        db.drop_all(); migration_metadata.drop_all(db.engine)
+        run_migrations(verbose=False)
+        teams = [Team(team_name=f'BENCH TEAM {n}', captain_name=f'CAPTAIN {n}') for n in range(1, team_count + 1)]
+        db.session.add_all(teams); db.session.flush()
+        admin = User(full_name='Benchmark Admin', username=ADMIN[0], role='Super Admin'); admin.set_password(ADMIN[1])
+        captain = User(full_name='Benchmark Captain', username=CAPTAIN[0], role='Captain', team_id=teams[0].id); captain.set_password(CAPTAIN[1])
+        db.session.add_all([admin, captain]); db.session.commit()
+        team_names, team_ids = [team.team_name for team in teams], [team.id for team in teams]
+    csv_path = os.path.join(scratch_dir, 'players.csv')
+    write_players_csv(csv_path, team_names, player_count, rng)
+    with contextlib.redirect_stdout(io.StringIO()): # The importer is chatty
+        counts = import_players_from_csv(csv_path)
+    if not counts or counts['added'] != player_count: sys.exit(f"Seeding failed: {counts}")
+    return team_ids
+
+
+# --- Load ---
+def spectator(app, recorder, stop, team_ids, rng, logged_in, think_seconds):
+    client = app.test_client()
+    if logged_in: client.post('/login', data={'username': CAPTAIN[0], 'password': CAPTAIN[1]})
+    routes = [route for route in SPECTATOR_ROUTES if logged_in or not route[3]]
+    while not stop.is_set():
+        route, path, _, _ = rng.choices(routes, weights=[route[2] for route in routes])[0]
+        recorder.request(client, route, 'GET', path.format(team_id=rng.choice(team_ids)))
+        if think_seconds: time.sleep(rng.uniform(0, 2 * think_seconds))
+
+
+def run_auction(app, recorder, rng, max_rounds):
+    """Admin loop: present, sell or pass, next round; until the auction completes or max_rounds is reached."""
+    from sqlalchemy import select
+    import auction_state
+    from models import db, Team
+    admin = app.test_client()
+    admin.post('/login', data={'username': ADMIN[0], 'password': ADMIN[1]})
+    outcome = {'sold': 0, 'unsold': 0, 'rounds': 1}
+    recorder.request(admin, 'next_player', 'GET', '/next_player')
+    while True:
+        with app.app_context():
+            state = auction_state.get_auction_state(fresh=True)
+            teams = db.session.execute(select(Team.id, Team.purse, Team.slots_remaining)).all()
+        if state.auction_complete: break
+        if state.round_complete:
+            if state.auction_round >= max_rounds: break
+            recorder.request(admin, 'start_next_round', 'GET', '/start_next_round'); outcome['rounds'] += 1
+            recorder.request(admin, 'next_player', 'GET', '/next_player'); continue
+        if state.current_player_id is None:
+            recorder.request(admin, 'next_player', 'GET', '/next_player'); continue
+        bidders = [team for team in teams if team.slots_remaining > 0 and team.purse >= MIN_PRICE]
+        if bidders and rng.random() < 0.8 ** (state.auction_round - 1) * 0.85: # Later rounds pass more players
+            team = rng.choice(bidders)
+            price = rng.randrange(MIN_PRICE, min(team.purse, MAX_PRICE) + 1, PRICE_STEP)
+            recorder.request(admin, 'mark_sold', 'POST', f'/sold/{state.current_player_id}', data={'team_id': team.id, 'sold_price': price})
+            outcome['sold'] += 1
+        else:
+            recorder.request(admin, 'mark_unsold', 'POST', f'/unsold/{state.current_player_id}')
+            outcome['unsold'] += 1
+        recorder.request(admin, 'next_player', 'GET', '/next_player') # What the browser does after the redirect
+    return outcome
+
+
+# --- Reporting ---
+def percentile(sorted_values, pct):
+    if not sorted_values: return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))]
+
+
+def summarize(recorder, elapsed, sql_by_route):
+    routes, total_requests, total_errors = {}, 0, 0
+    for route, samples in sorted(recorder.samples.items()):
+        latencies = sorted(elapsed_s * 1000 for elapsed_s, _ in samples)
+        errors = sum(1 for _, status in samples if status >= 500)
+        sql = sql_by_route.get(route, {})
+        served = sql.get('requests') or 0
+        routes[route] = {
+            'requests': len(samples), 'errors': errors,
+            'p50_ms': round(percentile(latencies, 50), 2), 'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2), 'max_ms': round(latencies[-1], 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 2),
+            'queries_per_request': round(sql.get('queries', 0) / served, 2) if served else None,
+            'db_ms_per_request': round(sql.get('db_seconds', 0.0) * 1000 / served, 2) if served else None,
+        }
+        total_requests += len(samples); total_errors += errors
+    return routes, {'requests': total_requests, 'errors': total_errors, 'seconds': round(elapsed, 2),
+                    'throughput_rps': round(total_requests / elapsed, 1) if elapsed else None}
+
+
+def print_report(results, baseline=None):
+    auction, totals = results['auction'], results['totals']
+    print(f"\n{results['backend']} @ {results['commit']}{' (dirty)' if results['dirty'] else ''}: "
+          f"{auction['sold']} sold, {auction['unsold']} passed over {auction['rounds']} round(s) in {auction['seconds']}s")
+    print(f"{totals['requests']} requests in {totals['seconds']}s = {totals['throughput_rps']} req/s, {totals['errors']} errors\n")
+    header = f"{'route':<22}{'reqs':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}"
+    print(header + ('   p95 vs baseline' if baseline else '')); print('-' * (len(header) + (18 if baseline else 0)))
+    for route, row in results['routes'].items():
+        queries = '-' if row['queries_per_request'] is None else f"{row['queries_per_request']:.1f}"
+        line = f"{route:<22}{row['requests']:>7}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{queries:>9}"
+        old = (baseline or {}).get('routes', {}).get(route)
+        if old and old['p95_ms']: line += f"   {old['p95_ms']:.1f} -> {row['p95_ms']:.1f} ({(row['p95_ms'] / old['p95_ms'] - 1) * 100:+.0f}%)"
+        print(line)
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BASE_DIR, capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate a full auction under spectator load and report per-route latency.')
+    parser.add_argument('--teams', type=int, default=8)
+    parser.add_argument('--players', type=int, default=200)
+    parser.add_argument('--spectators', type=int, default=16, help='Concurrent spectator threads (half of them logged in).')
+    parser.add_argument('--think-ms', type=float, default=50, help='Mean pause between a spectator\'s requests.')
+    parser.add_argument('--max-rounds', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=2025)
+    parser.add_argument('--database-url', help='Scratch database (wiped). Default: a temporary SQLite file.')
+    parser.add_argument('--output', help=f'Results JSON (default: {os.path.relpath(RESULTS_DIR, BASE_DIR)}/<commit>-<backend>.json).')
+    parser.add_argument('--compare', help='Earlier results JSON to compare p95 latencies against.')
+    args = parser.parse_args()
+
+    scratch_dir = tempfile.mkdtemp(prefix='cpl_bench_')
+    database_url = args.database_url or f"sqlite:///{os.path.join(scratch_dir, 'bench.db')}"
+    os.environ['DATABASE_URL'] = database_url # Read when app.py is imported
+    os.environ['METRICS_ENABLED'] = '1'
+    from app import app
+    from metrics import metrics
+    from models import db
+    app.instance_path = scratch_dir # Keep the export cache away from the real one
+
+    rng = random.Random(args.seed)
+    team_ids = seed(app, args.teams, args.players, rng, scratch_dir)
+    recorder, stop = Recorder(), threading.Event()
+    threads = [threading.Thread(target=spectator, args=(app, recorder, stop, team_ids, random.Random(args.seed + n), n % 2 == 0, args.think_ms / 1000), daemon=True)
+               for n in range(args.spectators)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        for thread in threads: thread.start()
+        outcome = run_auction(app, recorder, rng, args.max_rounds)
+        auction_seconds = time.perf_counter() - started
+        stop.set()
+        for thread in threads: thread.join()
+        elapsed = time.perf_counter() - started
+
+    routes, totals = summarize(recorder, elapsed, metrics.route_summary())
+    commit, dirty = git_revision()
+    backend = database_url.split(':', 1)[0].split('+', 1)[0]
+    results = {'commit': commit, 'dirty': dirty, 'backend': backend, 'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+               'python': platform.python_version(), 'args': {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'database_url')},
+               'auction': {**outcome, 'seconds': round(auction_seconds, 2)}, 'totals': totals, 'routes': routes}
+    baseline = None
+    if args.compare:
+        with open(args.compare) as handle: baseline = json.load(handle)
+    print_report(results, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}{'-dirty' if dirty else ''}-{backend}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as handle: json.dump(results, handle, indent=2)
+    print(f"\nResults saved to {output}")
+    with app.app_context(): db.engine.dispose()
+    shutil.rmtree(scratch_dir, ignore_errors=True)
+    return 1 if totals['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
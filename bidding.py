@@ -0,0 +1,180 @@
+"""Live captain bidding on the player currently up for auction.
+
+Captains post bids to ``/bid``. Each worker keeps an in-memory bid ladder
+for the current lot of each league and turns most of a burst away without touching the
+database: a bid on another lot, below the next minimum, from the team
+already leading, or beyond the team's purse/slots (from the cached rosters)
+is rejected from memory. A bid that passes becomes the leading bid through
+one conditional UPDATE on the league's shared ``auction_state`` row
+(``auction_state.raise_high_bid``), so workers never disagree on the leader;
+the UPDATE also refuses a raise by the leading team, so a captain cannot
+outbid themselves through a worker that has not seen their earlier bid. A
+worker whose ladder was stale loses that UPDATE, catches up and rejects.
+
+Accepted bids are buffered per worker and written to the ``Bid`` table in
+batches, riding on the commit of a later accepted bid, or flushed when the
+admin closes the lot. The leading bid itself is always on ``auction_state``,
+so a worker restart can lose a few seconds of bid history but never the
+sale price. Closing the lot (``/close_lot``) sells to the leading bidder
+through the normal sale path.
+"""
+import datetime
+import time
+from dataclasses import dataclass
+from threading import Lock
+
+from flask import current_app
+from sqlalchemy import insert
+
+from models import db, Bid
+import auction_state
+from rosters import get_team_rosters
+from live_feed import publish
+
+DEFAULT_BID_INCREMENT = 50
+FLUSH_SIZE = 25
+FLUSH_SECONDS = 5.0
+
+
+class BidRejected(Exception):
+    """The bid was not accepted; the message says why."""
+
+    def __init__(self, message, next_minimum=None):
+        super().__init__(message)
+        self.next_minimum = next_minimum
+
+
+@dataclass(frozen=True)
+class AcceptedBid:
+    player_id: int
+    team_id: int
+    team_name: str
+    amount: int
+    next_minimum: int
+
+
+@dataclass
+class BidLadder:
+    """The leading bid on one lot as this worker knows it, plus bid counters."""
+    player_id: int
+    high_bid: int = None
+    high_team_id: int = None
+    accepted: int = 0
+    rejected: int = 0
+
+    def next_minimum(self, increment):
+        return increment if self.high_bid is None else self.high_bid + increment
+
+    def catch_up(self, high_bid, high_team_id):
+        """Adopts a leading bid seen elsewhere (shared state, another thread) if it is ahead of ours."""
+        if high_bid is not None and (self.high_bid is None or high_bid > self.high_bid):
+            self.high_bid, self.high_team_id = high_bid, high_team_id
+
+
+def bid_increment():
+    return current_app.config.get('BID_INCREMENT', DEFAULT_BID_INCREMENT)
+
+
+class BidBook:
+    """Per-worker ladder for each league's current lot and the buffer of accepted bids not yet written."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._ladders = {} # league_id -> BidLadder
+        self._pending = []
+        self._pending_since = None
+
+    def _ladder_for(self, league_id, player_id):
+        ladder = self._ladders.get(league_id)
+        if ladder is None or ladder.player_id != player_id: # New lot: the league's earlier ladder is finished
+            ladder = self._ladders[league_id] = BidLadder(player_id=player_id)
+        return ladder
+
+    def leading_bid(self, state, player_id):
+        """(high_bid, team_id, next_minimum) for ``player_id``, from this worker's ladder or ``state``, whichever is ahead."""
+        with self._lock:
+            ladder = self._ladder_for(state.league_id, player_id); ladder.catch_up(state.high_bid, state.high_bid_team_id)
+            return ladder.high_bid, ladder.high_team_id, ladder.next_minimum(bid_increment())
+
+    def _check(self, state, team, player_id, amount, increment):
+        """In-memory validation; returns the ladder or raises BidRejected."""
+        with self._lock:
+            ladder = self._ladder_for(state.league_id, player_id)
+            ladder.catch_up(state.high_bid, state.high_bid_team_id)
+            minimum = ladder.next_minimum(increment)
+            reason = None
+            if team.slots_remaining <= 0: reason = f'{team.team_name} has no remaining slots.'
+            elif ladder.high_team_id == team.id: reason = f'{team.team_name} already holds the highest bid ({ladder.high_bid}).'
+            elif amount < minimum: reason = f'Bid at least {minimum}.'
+            elif amount > team.purse: reason = f'{team.team_name} cannot bid more than its remaining purse ({team.purse}).'
+            if reason:
+                ladder.rejected += 1; raise BidRejected(reason, minimum)
+            return ladder
+
+    def place(self, state, team_id, user_id, player_id, amount):
+        """Validates and records one captain bid. Returns an AcceptedBid; raises BidRejected."""
+        if state.current_player_id != player_id: state = auction_state.get_auction_state(fresh=True) # The cached snapshot may predate the lot
+        if not state.started or state.paused or state.current_player_id is None: raise BidRejected('No player is up for bidding right now.')
+        if state.current_player_id != player_id: raise BidRejected('Bidding has moved on to another player.')
+        team = next((roster for roster in get_team_rosters() if roster.id == team_id), None)
+        if team is None: raise BidRejected('Your account is not linked to a team.')
+        increment = bid_increment()
+        ladder = self._check(state, team, player_id, amount, increment)
+
+        if not auction_state.raise_high_bid(state.league_id, player_id, team_id, amount, min_raise=increment):
+            db.session.rollback()
+            fresh = auction_state.get_auction_state(fresh=True)
+            with self._lock:
+                ladder.catch_up(fresh.high_bid, fresh.high_bid_team_id); ladder.rejected += 1
+                minimum = ladder.next_minimum(increment)
+            if fresh.current_player_id != player_id: raise BidRejected('Bidding has moved on to another player.')
+            if fresh.high_bid_team_id == team_id: raise BidRejected(f'{team.team_name} already holds the highest bid ({fresh.high_bid}).', minimum)
+            raise BidRejected(f'Outbid: the leading bid is now {fresh.high_bid}. Bid at least {minimum}.', minimum)
+
+        bid_row = dict(player_id=player_id, team_id=team_id, user_id=user_id, amount=amount,
+                       auction_round=state.auction_round, created_at=datetime.datetime.utcnow())
+        with self._lock: batch = self._take_batch() if self._flush_due() else []
+        try:
+            if batch: db.session.execute(insert(Bid), batch + [bid_row]) # Buffered history rides on this commit
+            publish('bid', player_id=player_id, team_id=team_id, team_name=team.team_name, amount=amount, next_minimum=amount + increment)
+            db.session.commit()
+        except Exception:
+            db.session.rollback(); self._restore(batch)
+            raise
+        with self._lock:
+            if not batch: self._buffer(bid_row)
+            ladder.catch_up(amount, team_id); ladder.accepted += 1
+        return AcceptedBid(player_id=player_id, team_id=team_id, team_name=team.team_name, amount=amount, next_minimum=amount + increment)
+
+    # --- Bid history batches (callers hold the lock unless noted) ---
+    def _flush_due(self):
+        return len(self._pending) + 1 >= FLUSH_SIZE or (self._pending_since is not None and time.monotonic() - self._pending_since >= FLUSH_SECONDS)
+
+    def _buffer(self, bid_row):
+        self._pending.append(bid_row)
+        if self._pending_since is None: self._pending_since = time.monotonic()
+
+    def _take_batch(self):
+        batch, self._pending, self._pending_since = self._pending, [], None
+        return batch
+
+    def _restore(self, batch):
+        """Puts a batch whose transaction failed back in front of the buffer (takes the lock)."""
+        if not batch: return
+        with self._lock:
+            self._pending = batch + self._pending
+            self._pending_since = self._pending_since or time.monotonic()
+
+    def flush(self):
+        """Writes this worker's buffered bids in one transaction (e.g. before the lot closes). Returns how many."""
+        with self._lock: batch = self._take_batch()
+        if not batch: return 0
+        try:
+            db.session.execute(insert(Bid), batch); db.session.commit()
+        except Exception:
+            db.session.rollback(); self._restore(batch)
+            raise
+        return len(batch)
+
+
+bid_book = BidBook()
@@ -0,0 +1,134 @@
+"""Database engine profiles and read-only routing.
+
+``DB_PROFILE`` picks how engines are tuned; ``auto`` (the default) follows
+the scheme of ``DATABASE_URL``:
+
+- ``sqlite``: every new connection gets ``PRAGMA journal_mode=WAL`` (readers
+  no longer wait for the writer), ``busy_timeout`` (``SQLITE_BUSY_TIMEOUT_MS``,
+  so a write waits for the lock instead of failing with "database is
+  locked") and ``synchronous=NORMAL`` (safe with WAL, one fsync per
+  checkpoint rather than per commit).
+- ``postgres``: a connection pool of ``DB_POOL_SIZE`` plus
+  ``DB_MAX_OVERFLOW`` connections, checked with a ping before use and
+  recycled after ``DB_POOL_RECYCLE`` seconds, so workers keep their
+  connections instead of reconnecting per burst.
+- ``default``: SQLAlchemy's defaults, nothing changed.
+
+Read-only routing: ``DATABASE_READ_URL`` adds a ``read`` bind (a Postgres
+replica, with the same pool profile); for SQLite, ``SQLITE_READ_POOL=1``
+adds a second pool on the same file whose connections are set
+``query_only``. Views marked ``@read_only`` (the public pages and the
+player list) send their SELECTs there; anything else, and every
+INSERT/UPDATE/DELETE, flush or ``FOR UPDATE`` read, uses the primary.
+
+The in-process caches (auction state, rosters, status summary, ratings,
+leagues) are shared with the admin routes and invalidated by the primary's
+auction state version, so their loaders run ``@on_primary``: a replica a
+few milliseconds behind never fills them with data older than the version
+they are keyed on.
+"""
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+
+READ_BIND = 'read'
+PROFILES = ('auto', 'sqlite', 'postgres', 'default')
+DEFAULT_SQLITE_BUSY_TIMEOUT_MS = 5000
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 10
+DEFAULT_POOL_RECYCLE = 1800
+DEFAULT_POOL_TIMEOUT = 30
+
+
+def _profile_for(url, profile):
+    if profile != 'auto': return profile
+    if url.startswith('sqlite'): return 'sqlite'
+    if url.startswith(('postgresql', 'postgres')): return 'postgres'
+    return 'default'
+
+
+def _engine_options(app, profile):
+    if profile == 'postgres':
+        return {'pool_size': app.config['DB_POOL_SIZE'], 'max_overflow': app.config['DB_MAX_OVERFLOW'], 'pool_pre_ping': True,
+                'pool_recycle': app.config['DB_POOL_RECYCLE'], 'pool_timeout': app.config['DB_POOL_TIMEOUT']}
+    if profile == 'sqlite': # pysqlite's own lock wait, in seconds; the pragma below covers other drivers
+        return {'connect_args': {'timeout': app.config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+    return {}
+
+
+def configure(app):
+    """Sets the engine options and the read bind from the profile settings in ``app.config``. Call before ``db.init_app``."""
+    config = app.config
+    if config.get('DB_PROFILE', 'auto') not in PROFILES: raise ValueError(f"DB_PROFILE must be one of {', '.join(PROFILES)}, not {config['DB_PROFILE']!r}.")
+    for key, default in (('DB_PROFILE', 'auto'), ('SQLITE_BUSY_TIMEOUT_MS', DEFAULT_SQLITE_BUSY_TIMEOUT_MS), ('DB_POOL_SIZE', DEFAULT_POOL_SIZE),
+                         ('DB_MAX_OVERFLOW', DEFAULT_MAX_OVERFLOW), ('DB_POOL_RECYCLE', DEFAULT_POOL_RECYCLE), ('DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT)):
+        config.setdefault(key, default)
+    url = config['SQLALCHEMY_DATABASE_URI']
+    profile = _profile_for(url, config['DB_PROFILE'])
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {**_engine_options(app, profile), **config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    read_url = config.get('DATABASE_READ_URL') or (url if profile == 'sqlite' and config.get('SQLITE_READ_POOL') else None)
+    if read_url:
+        config.setdefault('SQLALCHEMY_BINDS', {})[READ_BIND] = {'url': read_url, **_engine_options(app, _profile_for(read_url, config['DB_PROFILE']))}
+
+
+def _sqlite_pragmas(app, read_only):
+    busy_timeout = app.config['SQLITE_BUSY_TIMEOUT_MS']
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not read_only: cursor.execute('PRAGMA journal_mode=WAL') # Stored in the file; the read pool may not write it
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout)}')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        if read_only: cursor.execute('PRAGMA query_only=ON')
+        cursor.close()
+    return on_connect
+
+
+def init_app(app, db):
+    """Installs the SQLite connect pragmas on the app's engines. Call after ``db.init_app``."""
+    with app.app_context():
+        engines = dict(db.engines)
+    for bind_key, engine in engines.items():
+        if engine.dialect.name == 'sqlite' and _profile_for(str(engine.url), app.config['DB_PROFILE']) == 'sqlite':
+            event.listen(engine, 'connect', _sqlite_pragmas(app, read_only=bind_key == READ_BIND))
+
+
+# --- Read-only routing ---
+def read_only(view):
+    """Route decorator: the view only reads, so its SELECTs may go to the read bind."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        g.read_only = True
+        try: return view(*args, **kwargs)
+        finally: g.read_only = False
+    return wrapped
+
+
+@contextmanager
+def primary():
+    """Sends reads inside the block to the primary, even in a ``@read_only`` view."""
+    if not has_app_context(): yield; return
+    routed = g.get('read_only', False); g.read_only = False
+    try: yield
+    finally: g.read_only = routed
+
+
+def on_primary(loader):
+    """Decorator for cache loaders: see the module docstring."""
+    @wraps(loader)
+    def wrapped(*args, **kwargs):
+        with primary(): return loader(*args, **kwargs)
+    return wrapped
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends plain SELECTs of ``@read_only`` views to the read bind, when there is one."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and isinstance(clause, Select) and clause._for_update_arg is None and not self._flushing
+                and has_app_context() and g.get('read_only') and READ_BIND in self._db.engines):
+            return self._db.engines[READ_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
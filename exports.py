@@ -0,0 +1,185 @@
+"""Excel/CSV exports for players and teams.
+
+Files are written row by row from a query iterator (openpyxl write-only mode
+or the csv module), so memory stays flat however large the pool is. Each
+file is cached under ``instance/export_cache`` keyed on the league and its
+auction data version; repeat downloads are served straight from disk until a sale, reset
+or import bumps the version. The cache lives on disk, so all workers share
+it.
+"""
+import csv
+import os
+import re
+import tempfile
+import time
+
+from flask import current_app
+from sqlalchemy import select
+
+from models import db, Team, Player
+from metrics import metrics
+from leagues import current_league_id, get_league
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CSV_MIMETYPE = 'text/csv'
+YIELD_PER = 500
+PROGRESS_EVERY = 200 # Rows between progress callbacks (background export jobs)
+
+# --- Column layouts (header, value) ---
+PLAYER_COLUMNS = [
+    ('Player Name', lambda p: p.player_name),
+    ('Status', lambda p: p.status_label),
+    ('Price (Points)', lambda p: p.sold_price if (p.is_retained or p.status == 'Sold') else 0),
+    ('Matches', lambda p: p.overall_matches),
+    ('Bat Inn', lambda p: p.batting_inn),
+    ('Bat Runs', lambda p: p.overall_runs),
+    ('Bat Avg', lambda p: p.batting_avg),
+    ('Bat SR', lambda p: p.overall_sr),
+    ('Bat HS', lambda p: p.overall_hs),
+    ('Bowl Inn', lambda p: p.bowling_inn),
+    ('Bowl Wkts', lambda p: p.overall_wickets),
+    ('Bowl Avg', lambda p: p.bowling_avg),
+    ('Bowl Econ', lambda p: p.econ),
+    ('Bowl BBI', lambda p: p.bbi),
+]
+
+TEAM_PLAYER_COLUMNS = [
+    ('Player Name', lambda p: p.player_name),
+    ('Status', lambda p: "Retained" if p.is_retained else ("Sold" if p.status == 'Sold' else "Unsold/Other")),
+    ('Price (Points)', lambda p: p.sold_price if p.sold_price is not None else 0),
+    ('Role', lambda p: p.role),
+    ('Overall Matches', lambda p: p.overall_matches),
+    ('Overall Runs', lambda p: p.overall_runs),
+    ('Overall Wickets', lambda p: p.overall_wickets),
+    ('Batting Avg', lambda p: p.batting_avg),
+    ('Batting SR', lambda p: p.overall_sr),
+    ('Highest Score', lambda p: p.overall_hs),
+    ('Bowling Avg', lambda p: p.bowling_avg),
+    ('Economy', lambda p: p.econ),
+    ('Best Bowling', lambda p: p.bbi),
+]
+
+TEAM_SUMMARY_COLUMNS = [
+    ('Team Name', lambda t: t.team_name),
+    ('Captain', lambda t: t.captain_name),
+    ('Purse Spent', lambda t: t.purse_spent),
+    ('Purse Remaining', lambda t: t.purse),
+    ('Players', lambda t: t.players_taken_count),
+    ('Slots Left', lambda t: t.slots_remaining),
+]
+
+PLAYER_FILTERS = {
+    'retained': ("retained_players", lambda q: q.where(Player.is_retained == True)),
+    'auction': ("auction_pool_players", lambda q: q.where(Player.is_retained == False)),
+    'sold': ("sold_players", lambda q: q.where(Player.is_retained == False, Player.status == 'Sold')),
+    'unsold': ("unsold_players", lambda q: q.where(Player.is_retained == False, Player.status.in_(['Unsold', 'Passed']))),
+    'all': ("all_players", lambda q: q),
+}
+
+
+# --- Query iterators (generators, so a query only runs when its sheet is written) ---
+def iter_players(filter_by='all'):
+    query = PLAYER_FILTERS.get(filter_by, PLAYER_FILTERS['all'])[1](select(Player).where(Player.league_id == current_league_id())).order_by(Player.player_name)
+    yield from db.session.scalars(query.execution_options(yield_per=YIELD_PER))
+
+
+def iter_team_players(team_id):
+    query = select(Player).where(Player.team_id == team_id).order_by(Player.is_retained.desc(), Player.player_name)
+    yield from db.session.scalars(query.execution_options(yield_per=YIELD_PER))
+
+
+# --- Writers ---
+def sheet_title(name):
+    """Excel sheet titles: max 31 characters, none of []:*?/\\."""
+    return re.sub(r'[\[\]:*?/\\]', '_', name)[:31] or 'Sheet'
+
+
+def _counted(rows, written, progress):
+    """Yields ``rows``, calling ``progress(total rows written)`` every PROGRESS_EVERY rows (``written`` is shared across sheets)."""
+    for row in rows:
+        yield row
+        written[0] += 1
+        if written[0] % PROGRESS_EVERY == 0: progress(written[0])
+
+
+def write_xlsx(path, sheets, progress=None):
+    """sheets: iterable of (title, columns, rows). Streams rows through an openpyxl write-only workbook."""
+    from openpyxl import Workbook # Loaded on the first workbook written, not when a worker boots
+    workbook = Workbook(write_only=True); written = [0]
+    for title, columns, rows in sheets:
+        worksheet = workbook.create_sheet(sheet_title(title))
+        worksheet.append([header for header, _ in columns])
+        if progress: rows = _counted(rows, written, progress)
+        for row in rows: worksheet.append([value(row) for _, value in columns])
+    workbook.save(path)
+
+
+def write_csv(path, columns, rows, progress=None):
+    if progress: rows = _counted(rows, [0], progress)
+    with open(path, 'w', newline='', encoding='utf-8') as handle:
+        writer = csv.writer(handle)
+        writer.writerow([header for header, _ in columns])
+        for row in rows: writer.writerow([value(row) for _, value in columns])
+
+
+# --- Version-keyed disk cache ---
+def cache_dir():
+    path = os.path.join(current_app.instance_path, 'export_cache')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def cached_export(key, extension, data_version, build):
+    """Returns the path of ``key`` built at ``data_version``, calling ``build(path)`` only on a cache miss."""
+    directory = cache_dir()
+    path = os.path.join(directory, f"{key}-v{data_version}.{extension}")
+    if os.path.exists(path): return path
+    handle, tmp_path = tempfile.mkstemp(dir=directory, suffix=f".{extension}.tmp"); os.close(handle)
+    try:
+        started = time.perf_counter()
+        build(tmp_path)
+        metrics.observe_export_build(re.sub(r'^league\d+-|-\d+$', '', key), time.perf_counter() - started) # league1-team-7 -> team
+        os.replace(tmp_path, path) # Atomic, so concurrent workers never serve a half-written file
+    finally:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+    for name in os.listdir(directory): # Older versions of this export are stale now
+        if name.startswith(f"{key}-v") and name.endswith(f".{extension}") and name != os.path.basename(path):
+            try: os.remove(os.path.join(directory, name))
+            except OSError: pass
+    return path
+
+
+# --- Exports ---
+def export_players_file(filter_by, data_version, file_format='xlsx', progress=None):
+    """Returns (path, download_name, mimetype) for the current league's players list under ``filter_by``.
+
+    ``progress(rows written)`` is called while the file is built (not on a cache hit).
+    """
+    if filter_by not in PLAYER_FILTERS: filter_by = 'all'
+    base_name = PLAYER_FILTERS[filter_by][0]
+    key = f"league{current_league_id()}-players-{filter_by}"
+    if file_format == 'csv':
+        path = cached_export(key, 'csv', data_version, lambda p: write_csv(p, PLAYER_COLUMNS, iter_players(filter_by), progress))
+        return path, f"{base_name}.csv", CSV_MIMETYPE
+    path = cached_export(key, 'xlsx', data_version,
+                         lambda p: write_xlsx(p, [('Players', PLAYER_COLUMNS, iter_players(filter_by))], progress))
+    return path, f"{base_name}.xlsx", XLSX_MIMETYPE
+
+
+def export_team_file(team, data_version, progress=None):
+    """Returns (path, download_name, mimetype) for one team's players."""
+    path = cached_export(f"league{team.league_id}-team-{team.id}", 'xlsx', data_version,
+                         lambda p: write_xlsx(p, [(team.team_name, TEAM_PLAYER_COLUMNS, iter_team_players(team.id))], progress))
+    return path, f'{team.team_name}_players.xlsx', XLSX_MIMETYPE
+
+
+def export_auction_file(data_version, progress=None):
+    """Returns (path, download_name, mimetype) for the current league's auction: a team summary sheet, then one sheet per team."""
+    league = get_league()
+    def build(path):
+        teams = db.session.scalars(select(Team).where(Team.league_id == league.id).order_by(Team.team_name)).all()
+        sheets = [('Teams', TEAM_SUMMARY_COLUMNS, teams)]
+        sheets += [(team.team_name, TEAM_PLAYER_COLUMNS, iter_team_players(team.id)) for team in teams]
+        write_xlsx(path, sheets, progress)
+    path = cached_export(f"league{league.id}-auction", 'xlsx', data_version, build)
+    return path, f'{league.slug}_auction_full.xlsx', XLSX_MIMETYPE
@@ -0,0 +1,144 @@
+"""Player photo derivatives: resized WebP + fallback variants with content-hashed names.
+
+``python image_pipeline.py`` (run at build/deploy time, and by the importer)
+reads every photo in ``static/images``, writes a display-size variant of
+each into ``static/images/derived`` as WebP plus a PNG/JPEG fallback, and
+records them in ``manifest.json``. File names embed a hash of
+the source bytes and the variant settings, so they can be served with
+far-future immutable cache headers and change whenever the photo does.
+
+The web app only reads the manifest (``image_variant``); Pillow is needed
+just for building.
+"""
+import hashlib
+import json
+import os
+import sys
+from collections import defaultdict
+from threading import Lock
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = os.path.join(BASE_DIR, 'static', 'images')
+DERIVED_DIR = os.path.join(IMAGES_DIR, 'derived')
+MANIFEST_PATH = os.path.join(DERIVED_DIR, 'manifest.json')
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp'}
+
+# Longest edge in pixels; 'display' covers the 300px auction card / 220px home cards at 2x, the only places photos are shown.
+# Add a size here only together with a template that uses it: every size is encoded for every photo.
+SIZES = {'display': 600}
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+PIPELINE_VERSION = 1 # Bump when the variant settings change so every hash changes
+
+
+def source_images():
+    return sorted(name for name in os.listdir(IMAGES_DIR)
+                  if os.path.isfile(os.path.join(IMAGES_DIR, name)) and os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS)
+
+
+def _variant_hash(source_bytes, size_name):
+    digest = hashlib.sha256(source_bytes)
+    digest.update(f"{PIPELINE_VERSION}:{size_name}:{SIZES[size_name]}:{WEBP_QUALITY}:{JPEG_QUALITY}".encode())
+    return digest.hexdigest()[:12]
+
+
+def build_variants(filename, manifest_entry=None):
+    """Writes the variants of one source photo (unless already built) and returns its manifest entry."""
+    source_path = os.path.join(IMAGES_DIR, filename)
+    with open(source_path, 'rb') as handle: source_bytes = handle.read()
+    stem = os.path.splitext(filename)[0].lower()
+    hashes = {size_name: _variant_hash(source_bytes, size_name) for size_name in SIZES}
+    if manifest_entry and all(
+        size_name in manifest_entry and f"-{hashes[size_name]}." in manifest_entry[size_name]['webp']
+        and all(os.path.exists(os.path.join(DERIVED_DIR, manifest_entry[size_name][key])) for key in ('webp', 'fallback'))
+        for size_name in SIZES
+    ):
+        return {size_name: manifest_entry[size_name] for size_name in SIZES} # Unchanged photo; variants of dropped sizes are pruned
+
+    from PIL import Image, ImageOps # Build-time dependency only
+    entry = {}
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        for size_name, max_edge in SIZES.items():
+            names = {'webp': f"{stem}-{size_name}-{hashes[size_name]}.webp",
+                     'fallback': f"{stem}-{size_name}-{hashes[size_name]}.{'png' if has_alpha else 'jpg'}"}
+            variant = image.copy(); variant.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            variant = variant.convert('RGBA' if has_alpha else 'RGB')
+            variant.save(os.path.join(DERIVED_DIR, names['webp']), 'WEBP', quality=WEBP_QUALITY, method=4)
+            if has_alpha: variant.save(os.path.join(DERIVED_DIR, names['fallback']), 'PNG')
+            else: variant.save(os.path.join(DERIVED_DIR, names['fallback']), 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+            entry[size_name] = {**names, 'width': variant.width, 'height': variant.height}
+    return entry
+
+
+def build_all(filenames=None, verbose=True):
+    """Builds variants for ``filenames`` (default: every source photo), updates the manifest and prunes stale files."""
+    os.makedirs(DERIVED_DIR, exist_ok=True)
+    manifest = load_manifest_file()
+    names = source_images() if filenames is None else [name for name in filenames if os.path.isfile(os.path.join(IMAGES_DIR, name))]
+    for name in names:
+        manifest[name] = build_variants(name, manifest.get(name))
+        if verbose: print(f"Image variants ready: {name}")
+    if filenames is None: # Full build: forget photos that no longer exist
+        manifest = {name: entry for name, entry in manifest.items() if name in names}
+    tmp_path = MANIFEST_PATH + '.tmp'
+    with open(tmp_path, 'w') as handle: json.dump(manifest, handle, indent=1, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+    referenced = {variant[key] for entry in manifest.values() for variant in entry.values() for key in ('webp', 'fallback')}
+    for name in os.listdir(DERIVED_DIR):
+        if name != os.path.basename(MANIFEST_PATH) and name not in referenced and not name.endswith('.tmp'):
+            os.remove(os.path.join(DERIVED_DIR, name))
+    return manifest
+
+
+def check_image_files(image_filenames):
+    """Returns (missing, duplicates) for the photos the players reference.
+
+    missing: referenced filenames with no file in static/images.
+    duplicates: {stem: [files]} where one photo exists under several extensions (e.g. .jpeg and .png).
+    """
+    available = set(source_images())
+    missing = sorted({name for name in image_filenames if name and name != 'default_player.png' and name not in available})
+    by_stem = defaultdict(list)
+    for name in available: by_stem[os.path.splitext(name)[0].lower()].append(name)
+    duplicates = {stem: sorted(names) for stem, names in by_stem.items() if len(names) > 1}
+    return missing, duplicates
+
+
+# --- Runtime lookup (no Pillow needed) ---
+_manifest_cache = {'mtime': None, 'manifest': {}}
+_manifest_lock = Lock()
+
+
+def load_manifest_file():
+    try:
+        with open(MANIFEST_PATH) as handle: return json.load(handle)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def get_manifest():
+    """The manifest, re-read only when the file changes (e.g. after a rebuild)."""
+    try: mtime = os.path.getmtime(MANIFEST_PATH)
+    except OSError: mtime = None
+    with _manifest_lock:
+        if mtime != _manifest_cache['mtime']:
+            _manifest_cache['manifest'] = load_manifest_file() if mtime else {}
+            _manifest_cache['mtime'] = mtime
+        return _manifest_cache['manifest']
+
+
+def image_variant(filename, size='display'):
+    """Static paths for ``filename`` at ``size``: {'webp': ..., 'fallback': ...}, or the original photo if not built."""
+    filename = filename or 'default_player.png'
+    variant = get_manifest().get(filename, {}).get(size)
+    if not variant:
+        return {'webp': None, 'fallback': f'images/{filename}', 'width': None, 'height': None}
+    return {'webp': f"images/derived/{variant['webp']}", 'fallback': f"images/derived/{variant['fallback']}",
+            'width': variant['width'], 'height': variant['height']}
+
+
+if __name__ == '__main__':
+    built = build_all(sys.argv[1:] or None)
+    print(f"{len(built)} photos in the image manifest ({MANIFEST_PATH}).")
@@ -1,135 +1,198 @@
+import argparse
 import pandas as pd
+from sqlalchemy import insert, select, update
 from app import app, db
-from models import Player, Team
-import math
+from models import Player, Team, DEFAULT_LEAGUE_ID
+from leagues import current_league_id, league_by_slug, use_league
+import auction_state
+import journal
+from team_stats import recalculate_team_stats
+from migrations import run_migrations
+from image_pipeline import build_all, check_image_files
 
-def import_players_from_csv(filepath='players_data.csv'):
-    """Reads player data from CSV and populates the database."""
+INT_COLUMNS = ['overall_matches', 'overall_runs', 'overall_wickets', 'overall_hs', 'batting_inn', 'bowling_inn']
+FLOAT_COLUMNS = ['overall_sr', 'batting_avg', 'bowling_avg', 'econ']
+CSV_COLUMNS = ['player_name', 'image_filename', 'is_retained', 'retaining_team_name', 'last_year_price', 'role', 'bbi'] + INT_COLUMNS + FLOAT_COLUMNS
+TRUE_VALUES = ['TRUE', '1', 'YES', 'T']
+STAT_FIELDS = ['image_filename', 'is_retained', 'role', 'bbi'] + INT_COLUMNS + FLOAT_COLUMNS
+AUCTION_FIELDS = ['status', 'unsold_round', 'sold_price', 'team_id']
+
+
+def _clean_str(column, default):
+    """Stripped strings; missing values become `default` (blank strings are kept, as before)."""
+    return column.astype('string').str.strip().fillna(default)
+
+
+def clean_player_frame(df, teams_map):
+    """Coerces the raw CSV columns once per column and returns one cleaned row per player name."""
+    df = df.copy()
+    for column in CSV_COLUMNS:
+        if column not in df.columns: df[column] = pd.NA
+
+    names = df['player_name'].astype('string').str.strip()
+    missing_name = names.isna() | (names == '')
+    for index in df.index[missing_name]: print(f"Skipping row {index + 2}: Missing player name.")
+    df = df.loc[~missing_name]
+
+    cleaned = pd.DataFrame(index=df.index)
+    cleaned['player_name'] = names[~missing_name]
+    image = _clean_str(df['image_filename'], '')
+    cleaned['image_filename'] = image.where(image != '', 'default_player.png')
+    cleaned['role'] = _clean_str(df['role'], 'N/A')
+    cleaned['bbi'] = _clean_str(df['bbi'], '-')
+    for column in INT_COLUMNS:
+        cleaned[column] = pd.to_numeric(df[column], errors='coerce').fillna(0).astype('int64')
+    for column in FLOAT_COLUMNS:
+        cleaned[column] = pd.to_numeric(df[column], errors='coerce').fillna(0.0).astype('float64')
+
+    # --- Retention: only valid when the retaining team exists ---
+    is_retained = df['is_retained'].astype('string').str.strip().str.upper().isin(TRUE_VALUES).fillna(False).astype(bool)
+    team_names = _clean_str(df['retaining_team_name'], '')
+    team_ids = team_names.map(teams_map).astype('Int64')
+    unknown_team = is_retained & (team_names != '') & team_ids.isna()
+    for index in df.index[unknown_team]:
+        print(f"Warning: Retaining team '{team_names[index]}' not found for player '{cleaned.at[index, 'player_name']}'.")
+    is_retained = is_retained & ~unknown_team
+    last_year_price = pd.to_numeric(df['last_year_price'], errors='coerce').fillna(0).astype('int64')
+
+    cleaned['is_retained'] = is_retained
+    cleaned['team_id'] = team_ids.where(is_retained & team_ids.notna(), None)
+    cleaned['sold_price'] = last_year_price.where(is_retained, 0)
+    cleaned['status'] = pd.Series('Unsold', index=df.index).where(~is_retained, 'Retained')
+    cleaned['unsold_round'] = None
+
+    duplicated = cleaned['player_name'].duplicated(keep='last')
+    for name in cleaned.loc[duplicated, 'player_name']: print(f"Warning: Player '{name}' appears more than once; using the last row.")
+    return cleaned.loc[~duplicated]
+
+
+def _auction_fields(current, record):
+    """Retention comes from the CSV; auction progress of pool players is left untouched."""
+    if record['is_retained']:
+        return {'status': 'Retained', 'unsold_round': None, 'sold_price': record['sold_price'], 'team_id': record['team_id']}
+    if current.is_retained:
+        return {'status': 'Unsold', 'unsold_round': None, 'sold_price': 0, 'team_id': None}
+    return {'status': current.status, 'unsold_round': current.unsold_round, 'sold_price': current.sold_price, 'team_id': current.team_id}
+
+
+def upsert_players(records, dry_run=False):
+    """Inserts new players and updates changed ones (keyed on player name within the current league) in bulk. Returns the diff counts."""
+    league_id = current_league_id()
+    columns = [Player.id, Player.player_name] + [getattr(Player, field) for field in STAT_FIELDS + AUCTION_FIELDS]
+    existing = {row.player_name: row for row in db.session.execute(select(*columns).where(Player.league_id == league_id)).all()}
+
+    inserts, updates, unchanged = [], [], 0
+    for record in records:
+        current = existing.get(record['player_name'])
+        if current is None:
+            inserts.append({'league_id': league_id, **{field: record[field] for field in ['player_name'] + STAT_FIELDS + AUCTION_FIELDS}}); continue
+        values = {field: record[field] for field in STAT_FIELDS}; values.update(_auction_fields(current, record))
+        if any(getattr(current, field) != value for field, value in values.items()): updates.append({'id': current.id, **values})
+        else: unchanged += 1
+
+    if not dry_run:
+        if inserts: db.session.execute(insert(Player), inserts)
+        if updates: db.session.execute(update(Player), updates)
+    return {'added': len(inserts), 'updated': len(updates), 'unchanged': unchanged}
+
+
+def _report(progress, percent, message):
+    print(message)
+    if progress: progress(percent, message)
+
+
+def import_players_from_csv(filepath='players_data.csv', dry_run=False, league_id=DEFAULT_LEAGUE_ID, progress=None):
+    """Reads player data from CSV and upserts it into the league (or only reports the diff when dry_run).
+
+    ``progress(percent, message)`` is called after each stage (background import jobs); percent is None for errors.
+    """
     try:
-        df = pd.read_csv(filepath).fillna(value=pd.NA)
-        print(f"Reading data from {filepath}...")
+        df = pd.read_csv(filepath)
+        _report(progress, 10, f"Reading data from {filepath}...")
     except FileNotFoundError:
-        print(f"Error: CSV file not found at {filepath}")
+        _report(progress, None, f"Error: CSV file not found at {filepath}")
         return
     except Exception as e:
-        print(f"Error reading CSV file: {e}")
+        _report(progress, None, f"Error reading CSV file: {e}")
         return
 
     with app.app_context():
-        teams_map = {team.team_name.strip(): team.id for team in Team.query.all()}
-
-    new_players_count = 0
-    updated_players_count = 0
-
-    with app.app_context():
-        for index, row in df.iterrows():
-            try:
-                player_name = str(row['player_name']).strip() if pd.notna(row['player_name']) else None
-                if not player_name:
-                    print(f"Skipping row {index + 2}: Missing player name.")
-                    continue
-
-                player = Player.query.filter_by(player_name=player_name).first()
-
-                is_retained_val = row.get('is_retained', False)
-                is_retained = str(is_retained_val).strip().upper() in ['TRUE', '1', 'YES', 'T']
-                retaining_team_name = str(row.get('retaining_team_name', '')).strip() if pd.notna(row.get('retaining_team_name')) else ''
-                last_year_price_val = row.get('last_year_price', 0)
-                last_year_price = int(float(last_year_price_val)) if pd.notna(last_year_price_val) and str(last_year_price_val).strip() else 0
-                team_id = None
-                if is_retained and retaining_team_name:
-                    if retaining_team_name in teams_map: team_id = teams_map[retaining_team_name]
-                    else: print(f"Warning: Retaining team '{retaining_team_name}' not found for player '{player_name}'."); is_retained = False
-                image_filename = str(row.get('image_filename')).strip() if pd.notna(row.get('image_filename')) else None
-
-                def safe_int(value, default=0):
-                    if pd.isna(value) or value is None or (isinstance(value, str) and not value.strip()): return default
-                    if isinstance(value, float) and math.isnan(value): return default
-                    try: return int(float(value))
-                    except (ValueError, TypeError): return default
-                def safe_float(value, default=0.0):
-                    if pd.isna(value) or value is None or (isinstance(value, str) and not value.strip()): return default
-                    if isinstance(value, float) and math.isnan(value): return default
-                    try: return float(value)
-                    except (ValueError, TypeError): return default
-                def safe_str(value, default=None):
-                    if pd.isna(value) or value is None: return default
-                    return str(value).strip()
-
-                # --- Data mapping (CPL_2024 fields removed) ---
-                player_data = {
-                    'player_name': player_name,
-                    'image_filename': image_filename if image_filename else 'default_player.png',
-                    'is_retained': is_retained,
-                    'team_id': team_id,
-                    'sold_price': last_year_price if is_retained else 0,
-                    'status': 'Retained' if is_retained else 'Unsold',
-                    'role': safe_str(row.get('role'), 'N/A'),
-                    'overall_matches': safe_int(row.get('overall_matches')),
-                    'overall_runs': safe_int(row.get('overall_runs')),
-                    'overall_wickets': safe_int(row.get('overall_wickets')),
-                    'overall_sr': safe_float(row.get('overall_sr')),
-                    'overall_hs': safe_int(row.get('overall_hs')),
-                    'batting_inn': safe_int(row.get('batting_inn')),
-                    'batting_avg': safe_float(row.get('batting_avg')),
-                    'bowling_inn': safe_int(row.get('bowling_inn')),
-                    'bowling_avg': safe_float(row.get('bowling_avg')),
-                    'econ': safe_float(row.get('econ')),
-                    'bbi': safe_str(row.get('bbi'), '-'),
-                }
-
-                if not player:
-                    player = Player(**player_data)
-                    db.session.add(player)
-                    new_players_count += 1
-                else:
-                    print(f"Player '{player_name}' already exists. Updating details.")
-                    for key, value in player_data.items():
-                        setattr(player, key, value)
-                    if player_data['is_retained'] and player.status != 'Sold': player.status = 'Retained'
-                    elif not player_data['is_retained'] and player.status == 'Retained': player.status = 'Unsold'
-                    updated_players_count += 1
-            except Exception as e:
-                print(f"Error processing row {index + 2} for player '{row.get('player_name', 'N/A')}': {e}"); db.session.rollback()
-        
+        use_league(league_id)
+        teams_map = {team_name.strip(): team_id for team_id, team_name in db.session.execute(
+            select(Team.id, Team.team_name).where(Team.league_id == league_id)).all()} # Retaining teams come from the same league
+        cleaned = clean_player_frame(df, teams_map)
+        records = cleaned.astype(object).where(cleaned.notna(), None).to_dict('records')
+        report_image_files(cleaned['image_filename'])
+        _report(progress, 30, f"Checked {len(records)} players; writing changes...")
         try:
+            counts = upsert_players(records, dry_run=dry_run)
+            if dry_run:
+                db.session.rollback()
+                _report(progress, 100, f"Dry run (nothing written). Would add: {counts['added']}, update: {counts['updated']}, unchanged: {counts['unchanged']}")
+                return counts
             db.session.commit()
-            print(f"Import complete. Added: {new_players_count}, Updated: {updated_players_count}")
+            _report(progress, 60, f"Import complete. Added: {counts['added']}, Updated: {counts['updated']}, Unchanged: {counts['unchanged']}")
         except Exception as e:
             db.session.rollback()
-            print(f"Error during final database commit: {e}")
+            _report(progress, None, f"Error during database import: {e}")
+            return
+
+    recalculate_initial_team_stats(league_id)
+    if progress: progress(75, "Team stats recalculated; building player photos...")
+    build_player_images(cleaned['image_filename'])
+    with app.app_context():
+        use_league(league_id)
+        # Web workers drop their cached rosters/counts, and their ratings when players were added or changed
+        auction_state.touch(auction_state.get_auction_state(fresh=True), stats_changed=bool(counts['added'] or counts['updated']))
+        journal.take_baseline(); db.session.commit() # Retention may have changed: undo must not replay across the import
+    if progress: progress(100, f"Added {counts['added']}, updated {counts['updated']}, unchanged {counts['unchanged']}.")
+    return counts
 
-    recalculate_initial_team_stats()
 
+def report_image_files(image_filenames):
+    """Warns about photos the CSV references that are missing, and photos stored under several extensions."""
+    missing, duplicates = check_image_files(set(image_filenames))
+    for name in missing: print(f"Warning: Image '{name}' not found in static/images; the default photo will be shown.")
+    for stem, names in sorted(duplicates.items()): print(f"Warning: Photo '{stem}' exists more than once: {', '.join(names)}")
 
-def recalculate_initial_team_stats():
-    """Calculates team stats based on retained players."""
-    print("Recalculating initial team stats based on retained players...")
+
+def build_player_images(image_filenames):
+    """Builds the WebP/fallback variants for the imported players' photos (unchanged photos are skipped)."""
+    try:
+        manifest = build_all(sorted(set(image_filenames) | {'default_player.png'}), verbose=False)
+        print(f"Player photo variants up to date ({len(manifest)} photos).")
+    except ImportError:
+        print("Pillow is not installed; skipping photo variants (run `python image_pipeline.py` where it is).")
+
+
+def recalculate_initial_team_stats(league_id=DEFAULT_LEAGUE_ID):
+    """Calculates the league's team stats from the players assigned to each team (retained and already bought)."""
+    print("Recalculating team stats from retained and bought players...")
     with app.app_context():
-        all_teams = Team.query.all()
-        max_slots = 15
-        for team in all_teams:
-            retained_players = team.players.filter_by(is_retained=True).all()
-            retained_count = len(retained_players); retained_cost = sum(p.sold_price for p in retained_players if p.sold_price is not None)
-            team.players_taken_count = retained_count; team.slots_remaining = max_slots - retained_count
-            team.purse_spent = retained_cost; team.purse = 10000 - retained_cost
-            print(f"Team: {team.team_name}, Retained: {retained_count}, Cost: {retained_cost}, Purse Left: {team.purse}, Slots Left: {team.slots_remaining}")
         try:
+            recalculate_team_stats(league_id)
             db.session.commit()
-            print("Initial team stats updated successfully.")
         except Exception as e:
             db.session.rollback()
             print(f"Error updating team stats: {e}")
+            return
+        for team in Team.query.filter_by(league_id=league_id).order_by(Team.team_name).all():
+            print(f"Team: {team.team_name}, Players: {team.players_taken_count}, Spent: {team.purse_spent}, Purse Left: {team.purse}, Slots Left: {team.slots_remaining}")
+        print("Team stats updated successfully.")
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import or update players from a CSV file (upsert keyed on player name within a league).')
+    parser.add_argument('filepath', nargs='?', default='players_data.csv')
+    parser.add_argument('--league', metavar='SLUG', help='League to import into (default: the default league).')
+    parser.add_argument('--dry-run', action='store_true', help='Only print how many players would be added/updated/unchanged.')
+    args = parser.parse_args()
     with app.app_context():
         inspector = db.inspect(db.engine)
         if not inspector.has_table("player") or not inspector.has_table("team"):
             print("Database tables ('player' or 'team') not found.")
-            print("Please run the Flask app once (`flask run`) to create the database and tables before importing.")
+            print("Please run `flask --app app init-db` to create the database and tables before importing.")
         else:
-            print("Resetting ALL player data for fresh import...")
-            Player.query.delete()
-            db.session.commit()
-            print("Existing players deleted.")
-            import_players_from_csv()
\ No newline at end of file
+            run_migrations(verbose=True) # The upsert writes columns added by later migrations
+            league = league_by_slug(args.league) if args.league else None
+            if args.league and league is None: parser.error(f"No league '{args.league}'. Create it with `python leagues.py create`.")
+            import_players_from_csv(args.filepath, dry_run=args.dry_run, league_id=league.id if league else DEFAULT_LEAGUE_ID)
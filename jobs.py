@@ -0,0 +1,287 @@
+"""Background jobs: exports, player imports and bulk user uploads off the request thread.
+
+An admin starts a job from the dashboard; the route inserts a ``Job`` row
+(status ``queued``) and answers with its id at once. Each web worker runs a
+few runner threads (``JOB_THREADS``, started on first use like the live feed
+poller, stopped again after a minute without work) that claim queued rows
+with a conditional ``UPDATE ... WHERE status = 'queued'``, so exactly one
+worker runs each job whichever worker took the request, and a job queued by
+a worker that exited is picked up by another.
+
+While a job runs, its progress (percent and a message) goes to
+``instance/jobs/job-<id>.json``, replaced atomically, rather than to the
+row: an export streams its rows from an open cursor, and on SQLite another
+connection cannot commit while that cursor is being read. The file lives on
+disk next to the artifacts, so every worker reads the same progress, just
+like the export cache. The row records the outcome. A running job whose
+progress file has not moved for ``STALE_SECONDS`` (its worker died) is
+marked failed.
+
+Artifacts (a copy of the export, so the export cache can prune its older
+versions) and uploaded CSVs live under ``instance/jobs`` and are deleted
+with their rows after ``RETENTION_HOURS``. Runner threads share the
+worker's app and connection pool; writing a workbook still holds the GIL,
+so keep ``JOB_THREADS`` small.
+"""
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+from flask import current_app, url_for
+from sqlalchemy import delete, select, update
+
+from models import db, Job, Team
+import auction_state
+from auction_stats import get_status_summary
+from rosters import get_team_rosters
+from leagues import current_league_id, use_league
+from exports import PLAYER_FILTERS, export_players_file, export_team_file, export_auction_file
+from provisioning import ProvisioningError, provision_users
+
+DEFAULT_JOB_THREADS = 1
+POLL_SECONDS = 2.0
+IDLE_SECONDS = 60.0
+STALE_SECONDS = 600
+RETENTION_HOURS = 24
+PROGRESS_SECONDS = 0.5 # Minimum interval between progress file writes
+JOB_KINDS = ('export_players', 'export_team', 'export_auction', 'import_players', 'provision_users')
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+class JobFailed(Exception):
+    """The job could not produce its result; the message is shown to the admin."""
+
+
+@dataclass(frozen=True)
+class JobResult:
+    message: str
+    path: str = None # Artifact to copy under instance/jobs
+    download_name: str = None
+    mimetype: str = None
+
+
+def job_dir():
+    path = os.path.join(current_app.instance_path, 'jobs')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _progress_path(job_id):
+    return os.path.join(job_dir(), f"job-{job_id}.json")
+
+
+def read_progress(job_id):
+    """(percent, message, modified time) from the progress file, or None before the job has reported."""
+    try:
+        with open(_progress_path(job_id)) as handle: data = json.load(handle)
+        return data['progress'], data['message'], os.path.getmtime(_progress_path(job_id))
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+class JobProgress:
+    """Progress callback for a running job: ``progress(percent, message)``; percent None keeps the last value."""
+
+    def __init__(self, job_id):
+        self.job_id, self.path = job_id, _progress_path(job_id)
+        self.percent, self.message, self._written_at = 0, 'Starting...', 0.0
+        self.write()
+
+    def __call__(self, percent, message):
+        if percent is not None: self.percent = max(0, min(100, int(percent)))
+        self.message = message
+        if time.monotonic() - self._written_at >= PROGRESS_SECONDS or percent in (None, 100): self.write()
+
+    def write(self):
+        handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+        with os.fdopen(handle, 'w') as f: json.dump({'progress': self.percent, 'message': self.message}, f)
+        os.replace(tmp_path, self.path)
+        self._written_at = time.monotonic()
+
+    def rows(self, total, start=5, end=95):
+        """Row-count callback for the export writers, mapped onto ``start``..``end`` percent."""
+        return lambda written: self(start + (end - start) * min(written, total) / max(total, 1), f"{written:,} of {total:,} rows written")
+
+
+# --- Handlers (run in a runner thread, inside an app context in the job's league) ---
+def _export_players(params, progress):
+    filter_by = params.get('filter') if params.get('filter') in PLAYER_FILTERS else 'all'
+    file_format = 'csv' if params.get('format') == 'csv' else 'xlsx'
+    total = get_status_summary().count_for_filter(filter_by)
+    if total == 0: raise JobFailed(f"No players found for the filter '{filter_by}'.")
+    state = auction_state.get_auction_state(fresh=True)
+    path, download_name, mimetype = export_players_file(filter_by, state.version, file_format, progress.rows(total))
+    return JobResult(f"Exported {total:,} players.", path, download_name, mimetype)
+
+
+def _export_team(params, progress):
+    team = db.session.execute(select(Team).where(Team.id == params.get('team_id'), Team.league_id == current_league_id())).scalar()
+    roster = next((r for r in get_team_rosters() if team is not None and r.id == team.id), None)
+    if roster is None or not roster.has_players: raise JobFailed(f"{team.team_name if team else 'This team'} has no players to export.")
+    total = len(roster.retained) + len(roster.bought)
+    state = auction_state.get_auction_state(fresh=True)
+    path, download_name, mimetype = export_team_file(team, state.version, progress.rows(total))
+    return JobResult(f"Exported {total} players of {team.team_name}.", path, download_name, mimetype)
+
+
+def _export_auction(params, progress):
+    rosters = get_team_rosters()
+    total = len(rosters) + sum(len(roster.retained) + len(roster.bought) for roster in rosters)
+    state = auction_state.get_auction_state(fresh=True)
+    path, download_name, mimetype = export_auction_file(state.version, progress.rows(total))
+    return JobResult(f"Exported {len(rosters)} teams.", path, download_name, mimetype)
+
+
+def _import_players(params, progress):
+    from import_players import import_players_from_csv # Imports the app module; only needed once a job runs
+    try: counts = import_players_from_csv(params['upload'], dry_run=params.get('dry_run', False), league_id=current_league_id(), progress=progress)
+    finally: os.remove(params['upload']) # Read once; the job row keeps the original file name
+    if counts is None: raise JobFailed(progress.message)
+    if params.get('dry_run'): return JobResult(f"Dry run: would add {counts['added']}, update {counts['updated']}; {counts['unchanged']} unchanged.")
+    return JobResult(f"Added {counts['added']}, updated {counts['updated']}, unchanged {counts['unchanged']}.")
+
+
+def _provision_users(params, progress):
+    try: count = provision_users(params['upload'], current_league_id(), params['roles'], params.get('dry_run', False), progress=progress)
+    except ProvisioningError as e: raise JobFailed(str(e))
+    finally: os.remove(params['upload'])
+    return JobResult(f"Dry run: {count} users would be created." if params.get('dry_run') else f"Created {count} users.")
+
+
+HANDLERS = {'export_players': _export_players, 'export_team': _export_team, 'export_auction': _export_auction, 'import_players': _import_players,
+            'provision_users': _provision_users}
+
+
+# --- Submitting and reading jobs ---
+def save_upload(file_storage):
+    """Stores an uploaded CSV under instance/jobs; returns its path."""
+    path = os.path.join(job_dir(), f"upload-{uuid.uuid4().hex}.csv")
+    file_storage.save(path)
+    return path
+
+
+def submit(kind, params, user_id=None):
+    """Queues a job in the current league and wakes this worker's runners. Commits; returns the Job."""
+    if kind not in JOB_KINDS: raise ValueError(f'Unknown job: {kind}')
+    purge_expired()
+    job = Job(league_id=current_league_id(), kind=kind, params=json.dumps(params), status='queued', progress=0, message='Waiting to start...', user_id=user_id)
+    db.session.add(job); db.session.commit()
+    job_runner.wake()
+    return job
+
+
+def recent_jobs(limit=20):
+    return db.session.execute(select(Job).where(Job.league_id == current_league_id()).order_by(Job.id.desc()).limit(limit)).scalars().all()
+
+
+def job_status(job):
+    """(status, percent, message) with live progress for running jobs; fails jobs whose runner stopped reporting."""
+    if job.status != 'running': return job.status, job.progress, job.message
+    live = read_progress(job.id)
+    beat = live[2] if live else (job.started_at or job.created_at).replace(tzinfo=datetime.timezone.utc).timestamp()
+    if time.time() - beat > STALE_SECONDS:
+        _finish(job.id, 'failed', live[0] if live else 0, 'The worker running this job stopped; start it again.')
+        db.session.refresh(job)
+        return job.status, job.progress, job.message
+    return (job.status, live[0], live[1]) if live else (job.status, job.progress, job.message)
+
+
+def job_json(job):
+    status, progress, message = job_status(job)
+    return {'id': job.id, 'kind': job.kind, 'status': status, 'progress': progress, 'message': message,
+            'created_at': job.created_at.isoformat() + 'Z',
+            'download_url': url_for('download_job', job_id=job.id) if status == 'done' and job.artifact else None}
+
+
+def artifact_path(job):
+    return os.path.join(job_dir(), job.artifact) if job.artifact else None
+
+
+def purge_expired():
+    """Deletes finished jobs older than RETENTION_HOURS with their files (not committed)."""
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(hours=RETENTION_HOURS)
+    expired = db.session.execute(select(Job.id, Job.artifact, Job.params).where(Job.status.notin_(ACTIVE_STATUSES), Job.created_at < cutoff)).all()
+    for job_id, artifact, params in expired:
+        files = [artifact and os.path.join(job_dir(), artifact), _progress_path(job_id), json.loads(params).get('upload')] # Upload: if the import never ran
+        for path in filter(None, files):
+            try: os.remove(path)
+            except OSError: pass
+    if expired: db.session.execute(delete(Job).where(Job.id.in_([job_id for job_id, _, _ in expired])))
+
+
+def _finish(job_id, status, progress, message, **values):
+    db.session.execute(update(Job).where(Job.id == job_id, Job.status == 'running').values(
+        status=status, progress=progress, message=(message or '')[:255], finished_at=datetime.datetime.utcnow(), **values))
+    db.session.commit()
+
+
+class JobRunner:
+    """Per-worker runner threads that claim and execute queued jobs."""
+
+    def __init__(self):
+        self.app = None
+        self._threads = []
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['job_runner'] = self
+
+    def wake(self):
+        """Starts the runner threads if they are not running, and makes them look for work now."""
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for n in range(len(self._threads), self.app.config.get('JOB_THREADS', DEFAULT_JOB_THREADS)):
+                thread = threading.Thread(target=self._run, name=f'job-runner-{n}', daemon=True)
+                thread.start(); self._threads.append(thread)
+        self._wake.set()
+
+    def _run(self):
+        idle_since = time.monotonic()
+        while time.monotonic() - idle_since < IDLE_SECONDS:
+            self._wake.wait(POLL_SECONDS); self._wake.clear()
+            try:
+                with self.app.app_context():
+                    while self._claim_and_run(): idle_since = time.monotonic()
+            except Exception as e:
+                print(f"Job runner error: {e}")
+
+    def _claim_and_run(self):
+        """Claims the oldest queued job and runs it; False when there was none."""
+        for job_id in db.session.execute(select(Job.id).where(Job.status == 'queued').order_by(Job.id).limit(5)).scalars().all():
+            claimed = db.session.execute(update(Job).where(Job.id == job_id, Job.status == 'queued')
+                                         .values(status='running', started_at=datetime.datetime.utcnow())).rowcount == 1
+            db.session.commit()
+            if claimed:
+                self._execute(db.session.get(Job, job_id)); return True
+        return False
+
+    def _execute(self, job):
+        job_id, kind, params = job.id, job.kind, json.loads(job.params)
+        use_league(job.league_id)
+        progress = JobProgress(job_id)
+        try:
+            result = HANDLERS[kind](params, progress)
+            values = {}
+            if result.path: # Keep a copy: the export cache drops older versions when the data changes
+                artifact = f"job-{job_id}{os.path.splitext(result.path)[1]}"
+                shutil.copyfile(result.path, os.path.join(job_dir(), artifact))
+                values = dict(artifact=artifact, download_name=result.download_name, mimetype=result.mimetype)
+            db.session.rollback() # Close the handler's read transaction before writing the outcome
+            _finish(job_id, 'done', 100, result.message, **values)
+        except Exception as e:
+            db.session.rollback()
+            _finish(job_id, 'failed', progress.percent, str(e) if isinstance(e, JobFailed) else f"{type(e).__name__}: {e}")
+        finally:
+            try: os.remove(progress.path)
+            except OSError: pass
+
+
+job_runner = JobRunner()
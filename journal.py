@@ -0,0 +1,314 @@
+"""Auction journal: snapshots and replay over the live feed events, for undo and state rebuilds.
+
+Every auction transition already appends an ``AuctionEvent`` row in the same
+transaction as its player/team changes (``live_feed.publish``), so that
+table is an append-only journal of the auction that can never disagree with
+the rows it describes. This module folds those events into a ``Ledger``:
+the auction progress, every non-retained player out of the live pool, and
+the retained totals per team, from which purses and slots follow.
+
+``JournalSnapshot`` rows checkpoint the ledger. A *baseline* snapshot is
+read from the tables when the journal starts (migration 007), on every reset
+and after every import; undo never goes back past the latest baseline.
+Ordinary snapshots are replayed ledgers saved every ``SNAPSHOT_EVERY``
+journaled writes, so an undo or rebuild replays at most a few dozen events
+whatever the length of the auction. Each league has its own journal: its
+events, snapshots and rows, read and written in the current league.
+
+Undo is itself an event (``undo`` with the undone event ids): it replays up
+to the first undone event, writes the difference to the player rows,
+recomputes the team totals and restores the auction progress in one
+transition. A player whose lot is reopened goes back into the live pool;
+if their queue position was already passed they are re-queued at the end
+of the round like any other straggler (``auction_queue``).
+
+``python journal.py --verify`` compares the tables with the replayed
+journal; ``--rebuild`` writes the replayed state back (e.g. after a manual
+database edit); ``--undo N`` undoes the last N events (``--league <slug>``
+for a league other than the default).
+"""
+import json
+from dataclasses import dataclass, field
+from threading import Lock
+
+from sqlalchemy import delete, func, or_, select, update
+
+from models import db, Team, Player, AuctionEvent, AuctionState, JournalSnapshot, DEFAULT_LEAGUE_ID
+import auction_state
+from leagues import current_league_id, get_league, league_by_slug, use_league
+from rosters import invalidate_rosters
+from auction_stats import invalidate_summary
+from team_stats import recalculate_team_stats, TEAM_PURSE, MAX_TEAM_SLOTS
+from live_feed import publish
+
+SNAPSHOT_EVERY = 25
+JOURNAL_KINDS = ('player_up', 'sold', 'unsold', 'round_complete', 'auction_complete', 'round_started', 'paused', 'resumed')
+LOT_KINDS = ('sold', 'unsold')
+PROGRESS_FIELDS = ('started', 'current_player_id', 'auction_round', 'round_complete', 'auction_complete', 'paused')
+INITIAL_PROGRESS = {name: getattr(auction_state.AuctionSnapshot(), name) for name in PROGRESS_FIELDS}
+POOL = ('Unsold', None, 0, None) # (status, unsold_round, sold_price, team_id) of a player in the live pool
+
+
+class JournalError(Exception):
+    """Nothing to undo, or no baseline to replay from."""
+
+
+@dataclass
+class Ledger:
+    """Replayed auction state as of journal event ``event_id``."""
+    event_id: int
+    progress: dict
+    players: dict = field(default_factory=dict) # {player_id: (status, unsold_round, sold_price, team_id)}; live pool players are absent
+    retained: dict = field(default_factory=dict) # {team_id: (players, points)} from retained players
+    team_purse: int = TEAM_PURSE # The league's rules, from which purses and slots follow
+    max_team_slots: int = MAX_TEAM_SLOTS
+
+    # --- Replay (mirrors the auction routes and auction_state transitions) ---
+    def apply(self, kind, data):
+        progress = self.progress
+        if kind == 'player_up':
+            progress.update(started=True, current_player_id=data['player_id'], round_complete=False, auction_complete=False)
+        elif kind == 'sold':
+            self.players[data['player_id']] = ('Sold', None, data['price'], data['team_id']); progress['current_player_id'] = None
+        elif kind == 'unsold':
+            self.players[data['player_id']] = ('Passed', data['round'], 0, None); progress['current_player_id'] = None
+        elif kind == 'round_complete':
+            progress.update(started=False, round_complete=True, current_player_id=None)
+        elif kind == 'auction_complete':
+            progress.update(started=False, round_complete=False, auction_complete=True, current_player_id=None)
+        elif kind == 'round_started': # Players passed in the round just completed go back into the pool
+            for player_id, (status, unsold_round, _, _) in list(self.players.items()):
+                if status == 'Passed' and unsold_round == data['round'] - 1: del self.players[player_id]
+            progress.update(auction_round=data['round'], started=True, round_complete=False, paused=False)
+        elif kind == 'paused': progress['paused'] = True
+        elif kind == 'resumed': progress['paused'] = False
+
+    def teams(self):
+        """{team_id: (purse, purse_spent, players_taken_count, slots_remaining)}, as recalculate_team_stats() would write."""
+        taken = {team_id: count for team_id, (count, _) in self.retained.items()}
+        spent = {team_id: points for team_id, (_, points) in self.retained.items()}
+        for status, _, price, team_id in self.players.values():
+            if status == 'Sold' and team_id in taken: taken[team_id] += 1; spent[team_id] += price or 0
+        return {team_id: (self.team_purse - spent[team_id], spent[team_id], taken[team_id], self.max_team_slots - taken[team_id]) for team_id in taken}
+
+    # --- Snapshot payload ---
+    def to_json(self):
+        return json.dumps({'progress': self.progress, 'players': [[player_id, *values] for player_id, values in sorted(self.players.items())],
+                           'retained': [[team_id, *values] for team_id, values in sorted(self.retained.items())],
+                           'teams': [[team_id, *values] for team_id, values in sorted(self.teams().items())]}, separators=(',', ':'))
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        payload = json.loads(snapshot.payload)
+        league = get_league(snapshot.league_id)
+        return cls(event_id=snapshot.event_id, progress=payload['progress'],
+                   players={row[0]: tuple(row[1:]) for row in payload['players']},
+                   retained={row[0]: tuple(row[1:]) for row in payload['retained']},
+                   team_purse=league.team_purse, max_team_slots=league.max_team_slots)
+
+
+# --- Baselines (read from the tables) ---
+def read_baseline(execute, league_id, progress=None):
+    """Ledger of the league's tables through ``execute`` (a session's or a connection's); progress defaults to its auction_state row.
+
+    ``league_id=None`` reads every row with the default rules (migration 007, before leagues existed).
+    """
+    def scoped(query, *models):
+        return query if league_id is None else query.where(*[model.league_id == league_id for model in models])
+    if progress is None:
+        row = execute(select(*[getattr(AuctionState, name) for name in PROGRESS_FIELDS])
+                      .where(AuctionState.id == (DEFAULT_LEAGUE_ID if league_id is None else league_id))).first()
+        progress = dict(row._mapping) if row is not None else dict(INITIAL_PROGRESS)
+    retained = {team_id: (0, 0) for team_id in execute(scoped(select(Team.id), Team)).scalars()}
+    for team_id, count, points in execute(scoped(
+        select(Player.team_id, func.count(Player.id), func.coalesce(func.sum(Player.sold_price), 0))
+        .where(Player.is_retained == True, Player.team_id.isnot(None)), Player).group_by(Player.team_id)
+    ).all():
+        if team_id in retained: retained[team_id] = (count, points)
+    players = {row.id: (row.status, row.unsold_round, row.sold_price or 0, row.team_id) for row in execute(scoped(
+        select(Player.id, Player.status, Player.unsold_round, Player.sold_price, Player.team_id)
+        .where(Player.is_retained == False, Player.status != 'Unsold'), Player)
+    ).all()}
+    event_id = execute(scoped(select(func.max(AuctionEvent.id)), AuctionEvent)).scalar() or 0
+    progress = {name: progress[name] if name in ('current_player_id', 'auction_round') else bool(progress[name]) for name in PROGRESS_FIELDS}
+    ledger = Ledger(event_id=event_id, progress=progress, players=players, retained=retained)
+    if league_id is not None:
+        league = get_league(league_id); ledger.team_purse, ledger.max_team_slots = league.team_purse, league.max_team_slots
+    return ledger
+
+
+def take_baseline(progress=None, league_id=None):
+    """Records the league's tables (default: the current league) as its journal's new starting point (reset, import). Not committed."""
+    league_id = current_league_id() if league_id is None else league_id
+    ledger = read_baseline(db.session.execute, league_id, progress)
+    db.session.add(JournalSnapshot(league_id=league_id, event_id=ledger.event_id, baseline=True, payload=ledger.to_json()))
+    return ledger
+
+
+# --- Reading the journal ---
+def _latest_snapshot(baseline_only=False, before=None):
+    query = select(JournalSnapshot).where(JournalSnapshot.league_id == current_league_id())
+    if baseline_only: query = query.where(JournalSnapshot.baseline == True)
+    if before is not None: query = query.where(JournalSnapshot.event_id < before)
+    return db.session.execute(query.order_by(JournalSnapshot.event_id.desc(), JournalSnapshot.id.desc()).limit(1)).scalar()
+
+
+def _journal_events(after_id, before_id=None):
+    """[(id, kind, payload)] of journaled events after ``after_id``, with undone events and undo markers removed; plus the last id read."""
+    query = select(AuctionEvent.id, AuctionEvent.kind, AuctionEvent.payload).where(
+        AuctionEvent.league_id == current_league_id(), AuctionEvent.id > after_id, AuctionEvent.kind.in_(JOURNAL_KINDS + ('undo',)))
+    if before_id is not None: query = query.where(AuctionEvent.id < before_id)
+    rows = db.session.execute(query.order_by(AuctionEvent.id)).all()
+    undone = set()
+    for row in rows:
+        if row.kind == 'undo': undone.update(json.loads(row.payload).get('undone', []))
+    events = [tuple(row) for row in rows if row.kind != 'undo' and row.id not in undone]
+    return events, (rows[-1].id if rows else after_id)
+
+
+def replay(before_id=None):
+    """(ledger, events applied) from the latest usable snapshot through the end of the journal (or up to ``before_id``)."""
+    snapshot = _latest_snapshot(before=before_id)
+    if snapshot is None: raise JournalError('The auction journal has no baseline yet; run the migrations first.')
+    ledger = Ledger.from_snapshot(snapshot)
+    events, last_id = _journal_events(ledger.event_id, before_id)
+    for _, kind, payload in events: ledger.apply(kind, json.loads(payload))
+    ledger.event_id = last_id
+    return ledger, len(events)
+
+
+# --- Writing a ledger back ---
+def _write_players(ledger):
+    """Brings non-retained player rows in line with ``ledger`` (bulk UPDATE of the rows that differ); returns how many."""
+    current = {row.id: (row.status, row.unsold_round, row.sold_price or 0, row.team_id) for row in db.session.execute(
+        select(Player.id, Player.status, Player.unsold_round, Player.sold_price, Player.team_id)
+        .where(Player.league_id == current_league_id(), Player.is_retained == False, or_(Player.status != 'Unsold', Player.team_id.isnot(None)))
+    ).all()}
+    changed = [player_id for player_id in current.keys() | ledger.players.keys() if current.get(player_id, POOL) != ledger.players.get(player_id, POOL)]
+    missing = [player_id for player_id in changed if player_id not in current] # Back out of the pool; make sure they still exist
+    if missing: missing = set(missing) - set(db.session.execute(select(Player.id).where(Player.id.in_(missing))).scalars())
+    rows = [dict(zip(('id', 'status', 'unsold_round', 'sold_price', 'team_id'), (player_id, *ledger.players.get(player_id, POOL))))
+            for player_id in changed if player_id not in missing]
+    if rows: db.session.execute(update(Player), rows)
+    recalculate_team_stats() # Purses and slots follow from the player rows
+    return len(rows)
+
+
+def _restore(state, ledger, kind, **data):
+    players_changed = _write_players(ledger)
+    publish(kind, players_changed=players_changed, **data)
+    state = auction_state.restore(state, **ledger.progress) # Commits with the player/team changes
+    invalidate_rosters(); invalidate_summary()
+    return state
+
+
+@dataclass(frozen=True)
+class UndoResult:
+    events: list # [(event id, kind, payload dict)] that were undone, oldest first
+
+    def describe(self):
+        events = [(kind, data) for _, kind, data in self.events if kind != 'player_up'] or [(kind, data) for _, kind, data in self.events]
+        return '; '.join(describe_event(kind, data) for kind, data in events)
+
+
+def describe_event(kind, data):
+    if kind == 'sold': return f"{data.get('player_name', 'Player')} sold to {data.get('team_name', 'team')} for {data.get('price')}"
+    if kind == 'unsold': return f"{data.get('player_name', 'Player')} marked unsold"
+    return kind.replace('_', ' ')
+
+
+def undo(count=None):
+    """Undoes the last ``count`` journaled events, or by default everything back to and including the last sale/unsold mark."""
+    state = auction_state.get_auction_state(fresh=True)
+    baseline = _latest_snapshot(baseline_only=True)
+    if baseline is None: raise JournalError('The auction journal has no baseline yet; run the migrations first.')
+    events, _ = _journal_events(baseline.event_id)
+    if count is None:
+        lots = [index for index, (_, kind, _) in enumerate(events) if kind in LOT_KINDS]
+        targets = events[lots[-1]:] if lots else []
+    else:
+        targets = events[-count:] if count > 0 else []
+    if not targets: raise JournalError('Nothing to undo since the auction was last reset or imported.')
+    first_id = targets[0][0]
+    # Snapshots that include the undone events are no longer on the journal's path
+    db.session.execute(delete(JournalSnapshot).where(JournalSnapshot.league_id == current_league_id(), JournalSnapshot.baseline == False,
+                                                     JournalSnapshot.event_id >= first_id))
+    ledger, _ = replay(before_id=first_id)
+    undone = [(event_id, kind, json.loads(payload)) for event_id, kind, payload in targets]
+    _restore(state, ledger, 'undo', undone=[event_id for event_id, _, _ in undone], description=UndoResult(undone).describe())
+    return UndoResult(undone)
+
+
+def rebuild():
+    """Writes the replayed journal back to the player, team and auction state rows. Returns the ledger."""
+    state = auction_state.get_auction_state(fresh=True)
+    ledger, _ = replay()
+    _restore(state, ledger, 'rebuild')
+    return ledger
+
+
+def verify():
+    """Differences between the tables and the replayed journal (empty when they agree)."""
+    ledger, _ = replay()
+    current = read_baseline(db.session.execute, current_league_id())
+    problems = []
+    for player_id in sorted(current.players.keys() | ledger.players.keys()):
+        expected, actual = ledger.players.get(player_id, POOL), current.players.get(player_id, POOL)
+        if expected != actual: problems.append(f"Player {player_id}: journal {expected}, table {actual}")
+    teams = {row.id: (row.purse, row.purse_spent, row.players_taken_count, row.slots_remaining) for row in db.session.execute(
+        select(Team.id, Team.purse, Team.purse_spent, Team.players_taken_count, Team.slots_remaining).where(Team.league_id == current_league_id())).all()}
+    for team_id, expected in sorted(ledger.teams().items()):
+        if teams.get(team_id) != expected: problems.append(f"Team {team_id}: journal {expected}, table {teams.get(team_id)}")
+    for name in PROGRESS_FIELDS:
+        if ledger.progress.get(name) != current.progress.get(name): problems.append(f"Auction {name}: journal {ledger.progress.get(name)}, table {current.progress.get(name)}")
+    return problems
+
+
+# --- Periodic snapshots ---
+_checkpoint = {} # league_id -> journaled writes in this worker
+_checkpoint_lock = Lock()
+
+
+def save_snapshot(min_events=SNAPSHOT_EVERY):
+    """Saves the replayed ledger if at least ``min_events`` events were replayed past the latest snapshot. Commits."""
+    ledger, applied = replay()
+    if applied < min_events: return None
+    db.session.add(JournalSnapshot(league_id=current_league_id(), event_id=ledger.event_id, baseline=False, payload=ledger.to_json())); db.session.commit()
+    return ledger
+
+
+def checkpoint():
+    """Call after a journaled write has committed; every ``SNAPSHOT_EVERY`` writes in this worker, a snapshot may be saved."""
+    with _checkpoint_lock:
+        writes = _checkpoint[current_league_id()] = _checkpoint.get(current_league_id(), 0) + 1
+        if writes % SNAPSHOT_EVERY: return None
+    try:
+        return save_snapshot()
+    except Exception as e: # A missed snapshot only makes the next replay longer
+        db.session.rollback(); print(f"Journal snapshot failed: {e}")
+        return None
+
+
+if __name__ == '__main__':
+    import argparse
+    from app import app
+    parser = argparse.ArgumentParser(description='Verify, rebuild or undo the auction from its journal.')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--verify', action='store_true', help='Report differences between the tables and the replayed journal.')
+    group.add_argument('--rebuild', action='store_true', help='Write the replayed journal back to the tables.')
+    group.add_argument('--undo', type=int, metavar='N', help='Undo the last N journaled events.')
+    parser.add_argument('--league', metavar='SLUG', help='League to work on (default: the default league).')
+    args = parser.parse_args()
+    with app.app_context():
+        if args.league:
+            league = league_by_slug(args.league)
+            if league is None: parser.error(f"No league '{args.league}'.")
+            use_league(league.id)
+        if args.verify:
+            problems = verify()
+            for problem in problems: print(problem)
+            print("Tables match the journal." if not problems else f"{len(problems)} difference(s).")
+        elif args.rebuild:
+            ledger = rebuild(); print(f"Rebuilt from the journal up to event {ledger.event_id}.")
+        else:
+            print(f"Undone: {undo(args.undo).describe()}")
@@ -0,0 +1,158 @@
+"""Leagues: one deployment running several independent auctions.
+
+Teams, players, the auction state row (``auction_state.id`` is the league
+id), round queues, live feed events and journal snapshots all belong to a
+league, and every query and in-process cache (rosters, status summary,
+auction state, ratings, bid ladders, feed subscribers) is keyed on it.
+Purse and squad size are per-league rules.
+
+Each request works in one league, picked once in ``before_request``: a
+captain always works in their own team's league; anyone else gets
+``?league=<slug>`` (remembered in the session), else the league already in
+their session, else the default league. Code outside a request (importer,
+CLI tools) uses the default league unless it calls ``use_league()``.
+
+``python leagues.py create <slug> "<name>" --team "Team:Captain" ...`` adds
+a league with its teams; ``python leagues.py list`` shows them.
+"""
+from dataclasses import dataclass
+from threading import Lock
+
+from flask import g, has_app_context, request, session
+from flask_login import current_user
+from sqlalchemy import select
+
+from models import db, League, Team, DEFAULT_LEAGUE_ID
+from db_engines import on_primary
+
+
+@dataclass(frozen=True)
+class LeagueRules:
+    id: int
+    slug: str
+    name: str
+    team_purse: int
+    max_team_slots: int
+
+
+_league_cache = {'leagues': None, 'team_leagues': None}
+_league_lock = Lock()
+
+
+@on_primary
+def _load():
+    leagues = {row.id: LeagueRules(**row._asdict()) for row in db.session.execute(
+        select(League.id, League.slug, League.name, League.team_purse, League.max_team_slots).order_by(League.id)).all()}
+    team_leagues = dict(db.session.execute(select(Team.id, Team.league_id)).all())
+    return leagues, team_leagues
+
+
+def _cached():
+    with _league_lock:
+        if _league_cache['leagues'] is None:
+            _league_cache['leagues'], _league_cache['team_leagues'] = _load()
+        return _league_cache['leagues'], _league_cache['team_leagues']
+
+
+def invalidate_leagues():
+    """Drops the cached leagues and team -> league map (after adding a league or team)."""
+    with _league_lock:
+        _league_cache['leagues'] = _league_cache['team_leagues'] = None
+
+
+def all_leagues():
+    """{league_id: LeagueRules}, cached in-process (leagues change only through ``create_league``)."""
+    return _cached()[0]
+
+
+def team_league_id(team_id):
+    league_id = _cached()[1].get(team_id)
+    if league_id is None: # A team created by another worker since the map was loaded
+        invalidate_leagues(); league_id = _cached()[1].get(team_id)
+    return league_id
+
+
+def league_by_slug(slug):
+    return next((league for league in all_leagues().values() if league.slug == slug), None)
+
+
+def current_league_id():
+    """League of the current request or ``use_league()`` call; the default league anywhere else."""
+    return g.get('league_id', DEFAULT_LEAGUE_ID) if has_app_context() else DEFAULT_LEAGUE_ID
+
+
+def use_league(league_id):
+    """Makes ``league_id`` the current league for the rest of this app context (CLI tools, tests)."""
+    g.league_id = league_id
+
+
+def get_league(league_id=None):
+    """Rules of ``league_id`` (default: the current league)."""
+    league_id = current_league_id() if league_id is None else league_id
+    league = all_leagues().get(league_id)
+    if league is None: # Created by another worker since the cache was loaded
+        invalidate_leagues(); league = all_leagues().get(league_id)
+    if league is None: raise LookupError(f'No league with id {league_id}.')
+    return league
+
+
+def resolve_request_league():
+    """before_request: the league this request works in (see the module docstring)."""
+    if request.endpoint in ('static', 'asset'): return
+    league_id = None
+    if current_user.is_authenticated and current_user.role == 'Captain' and current_user.team_id is not None:
+        league_id = team_league_id(current_user.team_id) # Captains never leave their own league
+    else:
+        slug = request.args.get('league')
+        league = league_by_slug(slug) if slug else None
+        if league is not None: session['league_id'] = league.id
+        league_id = league.id if league is not None else session.get('league_id')
+    if league_id not in all_leagues(): league_id = DEFAULT_LEAGUE_ID
+    g.league_id = league_id
+
+
+def template_context():
+    leagues = all_leagues()
+    return {'league': leagues.get(current_league_id()), 'leagues': list(leagues.values())}
+
+
+def init_app(app):
+    app.before_request(resolve_request_league)
+    app.context_processor(template_context)
+
+
+def create_league(slug, name, teams, team_purse=10000, max_team_slots=15):
+    """Adds a league with ``teams`` [(team_name, captain_name)], its auction state row and journal baseline. Commits."""
+    import auction_state, journal # Both import this module's callers; imported here to keep leagues.py at the bottom of the graph
+    league = League(slug=slug, name=name, team_purse=team_purse, max_team_slots=max_team_slots)
+    db.session.add(league); db.session.flush()
+    db.session.add_all([Team(league_id=league.id, team_name=team_name, captain_name=captain_name, purse=team_purse,
+                             purse_spent=0, players_taken_count=0, slots_remaining=max_team_slots) for team_name, captain_name in teams])
+    db.session.commit(); invalidate_leagues()
+    auction_state.ensure_state_row(league.id)
+    journal.take_baseline(league_id=league.id); db.session.commit()
+    return get_league(league.id)
+
+
+if __name__ == '__main__':
+    import argparse
+    from app import app
+    parser = argparse.ArgumentParser(description='List leagues or add one with its teams.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='List leagues with their rules and team counts.')
+    create = commands.add_parser('create', help='Add a league.')
+    create.add_argument('slug'); create.add_argument('name')
+    create.add_argument('--purse', type=int, default=10000, help='Starting purse per team (points).')
+    create.add_argument('--slots', type=int, default=15, help='Maximum players per team, retained included.')
+    create.add_argument('--team', action='append', default=[], metavar='NAME:CAPTAIN', help='A team and its captain (repeatable).')
+    args = parser.parse_args()
+    with app.app_context():
+        if args.command == 'create':
+            if league_by_slug(args.slug): parser.error(f"League '{args.slug}' already exists.")
+            teams = [tuple(part.strip() for part in team.split(':', 1)) if ':' in team else (team.strip(), '-') for team in args.team]
+            league = create_league(args.slug, args.name, teams, args.purse, args.slots)
+            print(f"Created league '{league.slug}' ({league.name}) with {len(teams)} teams.")
+        else:
+            counts = dict(db.session.execute(select(Team.league_id, db.func.count(Team.id)).group_by(Team.league_id)).all())
+            for league in all_leagues().values():
+                print(f"{league.id}: {league.slug} - {league.name} (purse {league.team_purse}, slots {league.max_team_slots}, {counts.get(league.id, 0)} teams)")
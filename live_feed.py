@@ -0,0 +1,141 @@
+"""Live auction feed for spectators (Server-Sent Events).
+
+Auction routes call ``publish()`` before their transition commits, which adds
+an ``AuctionEvent`` row to the same transaction. Each worker runs one poller
+thread that reads new rows (one small indexed query per interval, however
+many browsers are connected) and fans them out to the in-process subscriber
+queues behind ``/auctions/stream`` of the event's league. Because the database is the pub/sub
+channel, this works across gunicorn workers on both SQLite and Postgres.
+
+Event ids are assigned when a row is inserted, not when it commits: with
+concurrent writers (bids and transitions, several leagues, Postgres) a
+lower id can become visible after a higher one was already read. Ids the
+poller skipped over are kept as gaps and asked for again on every poll
+until they show up or ``GAP_SECONDS`` pass (an id whose transaction rolled
+back never fills), so a late commit is delivered instead of lost.
+
+Long-lived streams hold a worker connection each; run gunicorn with a
+threaded or async worker class (``--worker-class gthread --threads N``) when
+serving many spectators.
+"""
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import func, or_, select
+
+from models import db, AuctionEvent
+from leagues import current_league_id
+
+POLL_SECONDS = 0.5
+KEEPALIVE_SECONDS = 15
+REPLAY_BUFFER = 200
+GAP_SECONDS = 10 # How long a skipped id is waited for; far longer than any auction transaction
+MAX_GAPS = 500
+
+
+def publish(kind, **data):
+    """Queues an event for the current league on the current session; it is delivered once the caller commits."""
+    db.session.add(AuctionEvent(league_id=current_league_id(), kind=kind, payload=json.dumps(data)))
+
+
+def format_event(event_id, kind, payload):
+    return f"id: {event_id}\nevent: {kind}\ndata: {payload}\n\n"
+
+
+class LiveFeed:
+    """Per-worker fan-out of committed AuctionEvent rows to SSE subscribers."""
+
+    def __init__(self, poll_seconds=POLL_SECONDS):
+        self.app = None
+        self.poll_seconds = poll_seconds
+        self._subscribers = {} # league_id -> set of queues
+        self._recent = deque(maxlen=REPLAY_BUFFER) # (league_id, (id, kind, payload)) for Last-Event-ID catch-up
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_id = None
+        self._gaps = {} # Skipped event id -> when it was first missed
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['live_feed'] = self
+
+    # --- Poller (started lazily, after gunicorn has forked) ---
+    def _ensure_poller(self):
+        with self._lock:
+            if not any(self._subscribers.values()):
+                # The poller idles while nobody listens; start from the newest event rather than replaying the backlog
+                with self.app.app_context():
+                    self._last_id = db.session.execute(select(func.max(AuctionEvent.id))).scalar() or 0
+                self._gaps = {}
+            if self._thread is not None and self._thread.is_alive(): return
+            self._thread = threading.Thread(target=self._run, name='live-feed-poller', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            with self._lock:
+                if not any(self._subscribers.values()): continue
+            try: self.poll()
+            except Exception as e: print(f"Live feed poll failed: {e}")
+
+    def poll(self):
+        """Reads the events committed since the last poll, including late commits of skipped ids, and broadcasts them."""
+        with self._lock:
+            now = time.monotonic()
+            self._gaps = {event_id: missed_at for event_id, missed_at in self._gaps.items() if now - missed_at < GAP_SECONDS}
+            last_id, gaps = self._last_id, list(self._gaps)
+        newer = AuctionEvent.id > last_id
+        with self.app.app_context():
+            rows = db.session.execute(
+                select(AuctionEvent.league_id, AuctionEvent.id, AuctionEvent.kind, AuctionEvent.payload)
+                .where(or_(newer, AuctionEvent.id.in_(gaps)) if gaps else newer)
+                .order_by(AuctionEvent.id).limit(REPLAY_BUFFER)
+            ).all()
+        for row in rows: self._broadcast(row.league_id, (row.id, row.kind, row.payload))
+
+    def _broadcast(self, league_id, event):
+        event_id = event[0]
+        with self._lock:
+            if event_id in self._gaps: del self._gaps[event_id] # A late commit
+            elif event_id > self._last_id:
+                missed_at = time.monotonic()
+                for skipped in range(max(self._last_id + 1, event_id - MAX_GAPS), event_id): self._gaps[skipped] = missed_at
+                self._last_id = event_id
+            else: return # Already delivered
+            self._recent.append((league_id, event))
+            subscribers = list(self._subscribers.get(league_id, ()))
+        for subscriber in subscribers: subscriber.put(event)
+
+    # --- Subscribers ---
+    def subscribe(self, league_id, last_event_id=None):
+        self._ensure_poller()
+        subscriber = queue.Queue()
+        with self._lock:
+            if last_event_id is not None:
+                for event_league_id, event in self._recent:
+                    if event_league_id == league_id and event[0] > last_event_id: subscriber.put(event)
+            self._subscribers.setdefault(league_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, league_id, subscriber):
+        with self._lock:
+            self._subscribers.get(league_id, set()).discard(subscriber)
+
+    def stream(self, league_id, last_event_id=None):
+        """Generator of SSE frames of ``league_id`` for one browser; ends when the client disconnects."""
+        subscriber = self.subscribe(league_id, last_event_id)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try: event = subscriber.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty: yield ": keepalive\n\n"; continue
+                yield format_event(*event)
+        finally:
+            self.unsubscribe(league_id, subscriber)
+
+
+live_feed = LiveFeed()
@@ -0,0 +1,192 @@
+"""Per-request SQL instrumentation and Prometheus metrics.
+
+When enabled (``METRICS_ENABLED``), SQLAlchemy ``before/after_cursor_execute``
+hooks count the statements each request runs, their total time and the
+slowest one, and the Flask request hooks fold that into per-route metrics
+served in Prometheus text format at ``/metrics``:
+
+- ``cpl_http_request_duration_seconds`` (histogram) and
+  ``cpl_http_requests_total`` per route/method/status
+- ``cpl_db_queries_per_request`` (histogram), ``cpl_db_queries_total`` and
+  ``cpl_db_query_seconds_total`` per route
+- ``cpl_export_build_seconds`` (histogram) per export, recorded on cache misses
+
+With ``SLOW_REQUEST_MS`` set, requests slower than that are logged with
+their query count, DB time and slowest statement.
+
+Nothing is registered when both are off, so a disabled app pays no
+overhead. Metrics are per process: scrape every gunicorn worker, or
+run a single worker while profiling.
+"""
+import bisect
+import threading
+import time
+
+from flask import request
+from sqlalchemy import event
+
+from models import db
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+EXPORT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels):
+    """(('route', 'teams'), ('method', 'GET')) -> {route="teams",method="GET"}"""
+    if not labels: return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name, self.help_text = name, help_text
+        self._values = {}
+
+    def inc(self, labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        lines += [f'{self.name}{_label_text(labels)} {value}' for labels, value in sorted(self._values.items())]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name, self.help_text, self.buckets = name, help_text, tuple(buckets)
+        self._series = {} # labels -> [bucket counts..., sum, count]
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None: series = self._series[labels] = [0] * (len(self.buckets) + 2)
+        index = bisect.bisect_left(self.buckets, value) # First bucket whose upper bound holds value
+        if index < len(self.buckets): series[index] += 1
+        series[-2] += value; series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_label_text(labels + (("le", bound),))} {cumulative}')
+            lines.append(f'{self.name}_bucket{_label_text(labels + (("le", "+Inf"),))} {series[-1]}')
+            lines.append(f'{self.name}_sum{_label_text(labels)} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{_label_text(labels)} {series[-1]}')
+        return lines
+
+
+class RequestStats:
+    """SQL activity of the request being served on this thread."""
+    __slots__ = ('started', 'queries', 'db_seconds', 'slowest_seconds', 'slowest_statement')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0; self.db_seconds = 0.0; self.slowest_seconds = 0.0; self.slowest_statement = None
+
+
+class Metrics:
+    """Flask extension wiring the SQL hooks, request hooks and the /metrics route."""
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.slow_request_ms = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.request_duration = Histogram('cpl_http_request_duration_seconds', 'Request latency by route.', REQUEST_BUCKETS)
+        self.requests = Counter('cpl_http_requests_total', 'Requests by route, method and status.')
+        self.queries_per_request = Histogram('cpl_db_queries_per_request', 'SQL statements per request by route.', QUERY_COUNT_BUCKETS)
+        self.queries = Counter('cpl_db_queries_total', 'SQL statements by route.')
+        self.query_seconds = Counter('cpl_db_query_seconds_total', 'Time spent in SQL statements by route.')
+        self.export_build = Histogram('cpl_export_build_seconds', 'Export file build time (cache misses).', EXPORT_BUCKETS)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['metrics'] = self
+        self.enabled = bool(app.config.get('METRICS_ENABLED'))
+        self.slow_request_ms = app.config.get('SLOW_REQUEST_MS')
+        if not (self.enabled or self.slow_request_ms): return # Disabled: no hooks at all
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._teardown_request)
+        if self.enabled:
+            app.add_url_rule('/metrics', 'metrics', self.render_response)
+
+    # --- SQL hooks ---
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if getattr(self._local, 'stats', None) is not None:
+            conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stats = getattr(self._local, 'stats', None)
+        starts = conn.info.get('metrics_query_start')
+        if stats is None or not starts: return
+        elapsed = time.perf_counter() - starts.pop()
+        stats.queries += 1; stats.db_seconds += elapsed
+        if elapsed > stats.slowest_seconds: stats.slowest_seconds, stats.slowest_statement = elapsed, statement
+
+    # --- Request hooks ---
+    def _start_request(self):
+        self._local.stats = RequestStats()
+
+    def _finish_request(self, response):
+        self._record(response.status_code)
+        return response
+
+    def _teardown_request(self, exc):
+        if getattr(self._local, 'stats', None) is not None: self._record(500) # after_request did not run (unhandled error)
+
+    def _record(self, status_code):
+        stats, self._local.stats = self._local.stats, None
+        if stats is None: return
+        elapsed = time.perf_counter() - stats.started
+        route = request.endpoint or '<unmatched>' # Endpoint names keep label cardinality bounded
+        if self.enabled:
+            with self._lock:
+                self.request_duration.observe((('route', route), ('method', request.method)), elapsed)
+                self.requests.inc((('route', route), ('method', request.method), ('status', status_code)))
+                self.queries_per_request.observe((('route', route),), stats.queries)
+                self.queries.inc((('route', route),), stats.queries)
+                self.query_seconds.inc((('route', route),), stats.db_seconds)
+        if self.slow_request_ms and elapsed * 1000 >= self.slow_request_ms:
+            slowest = ' '.join((stats.slowest_statement or '-').split())[:300]
+            self.app.logger.warning(f"Slow request {request.method} {request.path} ({route}): {elapsed * 1000:.0f}ms, "
+                                    f"{stats.queries} queries in {stats.db_seconds * 1000:.0f}ms, slowest {stats.slowest_seconds * 1000:.0f}ms: {slowest}")
+
+    # --- Other observations ---
+    def observe_export_build(self, export_key, seconds):
+        if not self.enabled: return
+        with self._lock: self.export_build.observe((('export', export_key),), seconds)
+
+    def route_summary(self):
+        """{route: {'requests', 'queries', 'db_seconds'}} from the counters (used by benchmark.py)."""
+        summary = {}
+        with self._lock:
+            for labels, series in self.queries_per_request._series.items():
+                summary[dict(labels)['route']] = {'requests': series[-1], 'queries': series[-2],
+                                                  'db_seconds': self.query_seconds._values.get(labels, 0.0)}
+        return summary
+
+    # --- Exposition ---
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in (self.request_duration, self.requests, self.queries_per_request, self.queries, self.query_seconds, self.export_build):
+                lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+    def render_response(self):
+        return self.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+metrics = Metrics()
@@ -0,0 +1,196 @@
+"""Versioned schema migrations for SQLite and Postgres deployments.
+
+``create_all`` only creates missing tables, so column additions, data
+rewrites and new indexes on existing databases go through the numbered
+steps below. Applied versions are recorded in ``schema_migrations``; each
+step runs in its own transaction and is written to be safe on a database
+that ``create_all`` already built with the current models.
+
+Run with ``python migrations.py`` or ``flask --app app init-db`` (which also
+seeds an empty database) once per deploy; requests never check the schema.
+"""
+import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.exc import DBAPIError
+
+from models import db, League, Team, Player, Bid, AuctionEvent, AuctionRound, AuctionQueueEntry, JournalSnapshot, Job, DEFAULT_LEAGUE_ID
+
+migration_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', migration_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def _columns(conn, table_name):
+    return {column['name'] for column in inspect(conn).get_columns(table_name)}
+
+
+# --- MIGRATION STEPS ---
+def create_missing_tables(conn):
+    """Baseline: every table of the current models (existing tables are left alone)."""
+    db.metadata.create_all(conn)
+
+
+def normalize_player_status(conn):
+    """'Round N Unsold' / 'Unsold Final' become status 'Passed' with the round in player.unsold_round."""
+    if 'unsold_round' not in _columns(conn, 'player'):
+        conn.execute(text('ALTER TABLE player ADD COLUMN unsold_round INTEGER'))
+    player = Player.__table__
+    legacy = conn.execute(select(player.c.id, player.c.status).where(
+        (player.c.status == 'Unsold Final') | player.c.status.like('Round % Unsold')
+    )).all()
+    for player_id, status in legacy: # One-off rewrite; the LIKE above never runs again
+        parts = status.split()
+        unsold_round = int(parts[1]) if parts[0] == 'Round' and parts[1].isdigit() else None
+        conn.execute(player.update().where(player.c.id == player_id).values(status='Passed', unsold_round=unsold_round))
+
+
+def create_player_indexes(conn):
+    """Composite indexes for the status summary/pool lookups, rosters and name lookups."""
+    columns = _columns(conn, 'player')
+    for index in Player.__table__.indexes:
+        if all(column.name in columns for column in index.columns): # League-prefixed indexes wait for migration 008
+            index.create(conn, checkfirst=True)
+
+
+def add_captain_bidding(conn):
+    """Leading-bid columns on auction_state and the bid history table."""
+    columns = _columns(conn, 'auction_state')
+    if 'high_bid' not in columns: conn.execute(text('ALTER TABLE auction_state ADD COLUMN high_bid INTEGER'))
+    if 'high_bid_team_id' not in columns: conn.execute(text('ALTER TABLE auction_state ADD COLUMN high_bid_team_id INTEGER REFERENCES team (id)'))
+    Bid.__table__.create(conn, checkfirst=True)
+
+
+STAT_COLUMNS = ['overall_matches', 'overall_runs', 'overall_wickets', 'overall_sr', 'overall_hs', 'batting_inn', 'batting_avg', 'bowling_inn', 'bowling_avg', 'econ']
+
+
+def add_player_listing_indexes(conn):
+    """Missing stats become 0 (as the importer writes them) so keyset pages can compare them; then the sort indexes."""
+    player = Player.__table__
+    for column in STAT_COLUMNS:
+        conn.execute(player.update().where(player.c[column].is_(None)).values({column: 0}))
+    create_player_indexes(conn)
+
+
+def add_stats_version(conn):
+    """auction_state.stats_version, the key of the cached player ratings."""
+    if 'stats_version' not in _columns(conn, 'auction_state'):
+        conn.execute(text('ALTER TABLE auction_state ADD COLUMN stats_version INTEGER NOT NULL DEFAULT 0'))
+
+
+def start_auction_journal(conn):
+    """Snapshot table, and the current tables as the journal's first baseline."""
+    from journal import read_baseline # journal imports the auction modules; keep them out of plain migration runs until needed
+    JournalSnapshot.__table__.create(conn, checkfirst=True)
+    ledger = read_baseline(conn.execute, league_id=None)
+    conn.execute(JournalSnapshot.__table__.insert().values(event_id=ledger.event_id, baseline=True, payload=ledger.to_json(),
+                                                           created_at=datetime.datetime.utcnow()))
+
+
+LEAGUE_TABLES = ['team', 'player', 'auction_event', 'journal_snapshot']
+PRE_LEAGUE_INDEXES = ['ix_player_retained_status', 'ix_player_team', 'ix_player_name', 'ix_player_listing',
+                      *[f'ix_player_sort_{column}' for column in ('overall_matches', 'overall_runs', 'overall_wickets', 'overall_sr',
+                                                                  'overall_hs', 'batting_avg', 'bowling_avg', 'econ')]]
+
+
+def _rebuild_sqlite_table(conn, table):
+    """SQLite cannot drop a constraint: copy the rows into a table created from the model and swap it in."""
+    existing = _columns(conn, table.name)
+    metadata = MetaData(); League.__table__.to_metadata(metadata) # Foreign keys resolve against the copy's metadata
+    replacement = table.to_metadata(metadata, name=f'{table.name}__new')
+    for index in list(replacement.indexes): replacement.indexes.discard(index) # Created under their real names after the swap
+    replacement.create(conn)
+    columns = ', '.join(column.name for column in table.columns if column.name in existing)
+    conn.execute(text(f'INSERT INTO {replacement.name} ({columns}) SELECT {columns} FROM {table.name}'))
+    conn.execute(text(f'DROP TABLE {table.name}'))
+    conn.execute(text(f'ALTER TABLE {replacement.name} RENAME TO {table.name}'))
+
+
+def partition_by_league(conn):
+    """League table and default league; league_id on teams, players, events and snapshots; per-league names, queues and indexes."""
+    League.__table__.create(conn, checkfirst=True)
+    league = League.__table__
+    if conn.execute(select(league.c.id).where(league.c.id == DEFAULT_LEAGUE_ID)).first() is None:
+        conn.execute(league.insert().values(id=DEFAULT_LEAGUE_ID, slug='cpl', name='CPL 2025', team_purse=10000, max_team_slots=15,
+                                            created_at=datetime.datetime.utcnow()))
+    for table_name in LEAGUE_TABLES:
+        if 'league_id' not in _columns(conn, table_name):
+            reference = ' REFERENCES league (id)' if table_name in ('team', 'player') else ''
+            conn.execute(text(f'ALTER TABLE {table_name} ADD COLUMN league_id INTEGER NOT NULL DEFAULT {DEFAULT_LEAGUE_ID}{reference}'))
+
+    # Team names were unique across the deployment; now only within a league
+    global_name = [constraint for constraint in inspect(conn).get_unique_constraints('team') if constraint['column_names'] == ['team_name']]
+    if global_name and conn.dialect.name == 'sqlite': _rebuild_sqlite_table(conn, Team.__table__)
+    elif global_name: conn.execute(text(f'ALTER TABLE team DROP CONSTRAINT {global_name[0]["name"]}'))
+
+    # Round queues are keyed by (league, round): recreate them with the league in the primary key, keeping their rows
+    for model in (AuctionRound, AuctionQueueEntry):
+        table = model.__table__
+        if 'league_id' in _columns(conn, table.name): continue
+        rows = [dict(row._mapping, league_id=DEFAULT_LEAGUE_ID) for row in conn.execute(text(f'SELECT * FROM {table.name}')).all()]
+        conn.execute(text(f'DROP TABLE {table.name}')); table.create(conn)
+        if rows: conn.execute(table.insert(), rows)
+
+    for name in PRE_LEAGUE_INDEXES: conn.execute(text(f'DROP INDEX IF EXISTS {name}'))
+    for table in (Team.__table__, Player.__table__, AuctionEvent.__table__, JournalSnapshot.__table__):
+        for index in table.indexes: index.create(conn, checkfirst=True)
+
+
+def add_state_updated_at(conn):
+    """auction_state.updated_at, the Last-Modified of the public pages."""
+    if 'updated_at' not in _columns(conn, 'auction_state'):
+        conn.execute(text('ALTER TABLE auction_state ADD COLUMN updated_at TIMESTAMP'))
+    conn.execute(text('UPDATE auction_state SET updated_at = :now WHERE updated_at IS NULL'), {'now': datetime.datetime.utcnow()})
+
+
+def create_job_table(conn):
+    """Background job table (jobs.py)."""
+    Job.__table__.create(conn, checkfirst=True)
+
+
+MIGRATIONS = [
+    (1, 'create_missing_tables', create_missing_tables),
+    (2, 'normalize_player_status', normalize_player_status),
+    (3, 'create_player_indexes', create_player_indexes),
+    (4, 'add_captain_bidding', add_captain_bidding),
+    (5, 'add_player_listing_indexes', add_player_listing_indexes),
+    (6, 'add_stats_version', add_stats_version),
+    (7, 'start_auction_journal', start_auction_journal),
+    (8, 'partition_by_league', partition_by_league),
+    (9, 'add_state_updated_at', add_state_updated_at),
+    (10, 'create_job_table', create_job_table),
+]
+
+
+def run_migrations(engine=None, verbose=True):
+    """Applies every pending migration in order; returns the versions applied."""
+    engine = engine or db.engine
+    migration_metadata.create_all(engine)
+    with engine.connect() as conn:
+        applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+    newly_applied = []
+    for version, name, step in MIGRATIONS:
+        if version in applied: continue
+        try:
+            with engine.begin() as conn:
+                step(conn)
+                conn.execute(schema_migrations.insert().values(version=version, name=name, applied_at=datetime.datetime.utcnow()))
+        except DBAPIError:
+            # Another process may have applied the same step concurrently; only that case is tolerated
+            with engine.connect() as conn:
+                if conn.execute(select(schema_migrations.c.version).where(schema_migrations.c.version == version)).first() is None: raise
+            continue
+        newly_applied.append(version)
+        if verbose: print(f"Applied migration {version:03d}: {name}")
+    return newly_applied
+
+
+if __name__ == '__main__':
+    from app import app
+    with app.app_context():
+        applied = run_migrations()
+        if not applied: print("Database schema is up to date.")
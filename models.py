@@ -1,10 +1,23 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean, Text, DateTime, Index
 from sqlalchemy.orm import relationship
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from db_engines import RoutingSession
+import datetime
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession}) # Reads of @read_only views may go to a read bind (db_engines.py)
+
+DEFAULT_LEAGUE_ID = 1 # Created by migration 008; holds everything that existed before leagues
+
+class League(db.Model):
+    # One independent auction: its own teams, players, auction state and purse/squad rules
+    id = Column(Integer, primary_key=True)
+    slug = Column(String(50), unique=True, nullable=False) # Selected with ?league=<slug>
+    name = Column(String(100), nullable=False)
+    team_purse = Column(Integer, default=10000, nullable=False)
+    max_team_slots = Column(Integer, default=15, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
 
 class User(db.Model, UserMixin):
     id = Column(Integer, primary_key=True)
@@ -24,19 +37,31 @@ class User(db.Model, UserMixin):
         return check_password_hash(self.password_hash, password)
 
 class Team(db.Model):
+    __table_args__ = (Index('ix_team_league_name', 'league_id', 'team_name', unique=True),) # Names are unique within a league
     id = Column(Integer, primary_key=True)
-    team_name = Column(String(100), unique=True, nullable=False)
+    league_id = Column(Integer, ForeignKey('league.id'), nullable=False, default=DEFAULT_LEAGUE_ID)
+    team_name = Column(String(100), nullable=False)
     captain_name = Column(String(100), nullable=False)
-    purse = Column(Integer, default=10000)
+    purse = Column(Integer, default=10000) # Set from the league's rules by recalculate_team_stats()
     purse_spent = Column(Integer, default=0)
     players_taken_count = Column(Integer, default=0)
-    slots_remaining = Column(Integer, default=15) # Assuming max 15 slots
+    slots_remaining = Column(Integer, default=15)
 
     captain = relationship('User', uselist=False, back_populates='team')
     players = relationship('Player', back_populates='team', lazy='dynamic')
 
 class Player(db.Model):
+    # Every lookup is within one league, so every index leads with league_id
+    __table_args__ = (
+        Index('ix_player_league_status', 'league_id', 'is_retained', 'status', 'unsold_round'), # Status summary, live pool, next-round pool
+        Index('ix_player_league_team', 'league_id', 'team_id', 'is_retained'), # Rosters and team stats
+        Index('ix_player_league_name', 'league_id', 'player_name'), # Import upsert key and list ordering
+        Index('ix_player_league_listing', 'league_id', 'is_retained', 'player_name', 'id'), # Players page default order (keyset pages)
+        *[Index(f'ix_player_league_sort_{column}', 'league_id', column, 'id') for column in (
+            'overall_matches', 'overall_runs', 'overall_wickets', 'overall_sr', 'overall_hs', 'batting_avg', 'bowling_avg', 'econ')], # Players page stat sorts
+    )
     id = Column(Integer, primary_key=True)
+    league_id = Column(Integer, ForeignKey('league.id'), nullable=False, default=DEFAULT_LEAGUE_ID)
     player_name = Column(String(100), nullable=False)
     image_filename = Column(String(100), nullable=True, default='default_player.png')
     is_retained = Column(Boolean, default=False, nullable=False)
@@ -59,8 +84,96 @@ class Player(db.Model):
     econ = Column(Float, nullable=True)
     bbi = Column(String(20), nullable=True)
 
-    # Auction Status
+    # Auction Status: 'Retained', 'Unsold' (live pool), 'Sold' or 'Passed' (unsold in round `unsold_round`, waiting for the next round)
     status = Column(String(20), default='Unsold', nullable=False)
+    unsold_round = Column(Integer, nullable=True)
     sold_price = Column(Integer, default=0)
     team_id = Column(Integer, ForeignKey('team.id'), nullable=True)
-    team = relationship('Team', back_populates='players')
\ No newline at end of file
+    team = relationship('Team', back_populates='players')
+
+    @property
+    def status_label(self):
+        """Display status as shown before statuses were normalized, e.g. 'Round 2 Unsold'."""
+        if self.is_retained: return 'Retained'
+        if self.status == 'Passed': return f'Round {self.unsold_round} Unsold' if self.unsold_round else 'Unsold Final'
+        return self.status
+
+class AuctionState(db.Model):
+    # One shared row per league (id = league id) holding the live auction progress for every worker and browser
+    id = Column(Integer, primary_key=True)
+    started = Column(Boolean, default=False, nullable=False)
+    current_player_id = Column(Integer, ForeignKey('player.id'), nullable=True)
+    auction_round = Column(Integer, default=1, nullable=False)
+    round_complete = Column(Boolean, default=False, nullable=False)
+    auction_complete = Column(Boolean, default=False, nullable=False)
+    paused = Column(Boolean, default=False, nullable=False)
+    version = Column(Integer, default=0, nullable=False) # Bumped by every transition (optimistic locking)
+    high_bid = Column(Integer, nullable=True) # Leading captain bid on current_player_id (does not bump version)
+    high_bid_team_id = Column(Integer, ForeignKey('team.id'), nullable=True)
+    stats_version = Column(Integer, default=0, nullable=False) # Bumped when an import changes player rows (ratings cache key)
+    updated_at = Column(DateTime, nullable=True) # Last transition or leading bid (Last-Modified of the public pages)
+
+class AuctionRound(db.Model):
+    # Shuffled order for one round: queue positions [0, queue_length) with the next pick at `cursor`
+    league_id = Column(Integer, ForeignKey('league.id'), primary_key=True)
+    auction_round = Column(Integer, primary_key=True)
+    seed = Column(Integer, nullable=False) # random.Random(seed) over the sorted player ids reproduces the order
+    queue_length = Column(Integer, default=0, nullable=False)
+    cursor = Column(Integer, default=0, nullable=False)
+
+class AuctionQueueEntry(db.Model):
+    __tablename__ = 'auction_queue'
+    league_id = Column(Integer, ForeignKey('league.id'), primary_key=True)
+    auction_round = Column(Integer, primary_key=True)
+    position = Column(Integer, primary_key=True)
+    segment = Column(Integer, default=0, nullable=False) # Position where this entry's shuffled segment starts
+    player_id = Column(Integer, ForeignKey('player.id'), nullable=False)
+
+class Bid(db.Model):
+    # Accepted captain bids, written in batches by bidding.py (the leading bid itself lives on auction_state)
+    __table_args__ = (Index('ix_bid_player', 'player_id', 'amount'),)
+    id = Column(Integer, primary_key=True)
+    player_id = Column(Integer, ForeignKey('player.id'), nullable=False)
+    team_id = Column(Integer, ForeignKey('team.id'), nullable=False)
+    user_id = Column(Integer, ForeignKey('user.id'), nullable=True)
+    amount = Column(Integer, nullable=False)
+    auction_round = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+class AuctionEvent(db.Model):
+    # Live feed messages (player up, sold, unsold, round/pause changes), written in the same transaction as the change
+    __table_args__ = (Index('ix_auction_event_league', 'league_id', 'id'),) # One league's journal
+    id = Column(Integer, primary_key=True)
+    league_id = Column(Integer, nullable=False, default=DEFAULT_LEAGUE_ID)
+    kind = Column(String(30), nullable=False)
+    payload = Column(Text, nullable=False, default='{}') # JSON
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+class JournalSnapshot(db.Model):
+    # Auction state replayed from the AuctionEvent journal up to event_id (see journal.py)
+    __tablename__ = 'journal_snapshot'
+    __table_args__ = (Index('ix_journal_snapshot_league', 'league_id', 'event_id'),)
+    id = Column(Integer, primary_key=True)
+    league_id = Column(Integer, nullable=False, default=DEFAULT_LEAGUE_ID)
+    event_id = Column(Integer, nullable=False) # Last AuctionEvent folded in
+    baseline = Column(Boolean, default=False, nullable=False) # Read from the tables (journal start, reset, import); undo stops here
+    payload = Column(Text, nullable=False) # JSON: progress, players out of the pool, retained and team totals
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+class Job(db.Model):
+    # Background export/import run by jobs.py; live progress of a running job is in instance/jobs/job-<id>.json
+    __table_args__ = (Index('ix_job_status', 'status', 'id'),)
+    id = Column(Integer, primary_key=True)
+    league_id = Column(Integer, nullable=False, default=DEFAULT_LEAGUE_ID)
+    kind = Column(String(30), nullable=False) # export_players, export_team, export_auction, import_players
+    params = Column(Text, nullable=False, default='{}') # JSON
+    status = Column(String(10), nullable=False, default='queued') # queued, running, done, failed
+    progress = Column(Integer, nullable=False, default=0) # Percent, final value once the job has finished
+    message = Column(String(255), nullable=True)
+    artifact = Column(String(255), nullable=True) # File name under instance/jobs
+    download_name = Column(String(255), nullable=True)
+    mimetype = Column(String(100), nullable=True)
+    user_id = Column(Integer, ForeignKey('user.id'), nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""Conditional GET and rendered-page cache for the public pages (/, /teams, /auctions).
+
+What these pages show follows from the league's auction data version
+(``auction_state.version``, bumped by every transition: sale, unsold mark,
+round change, pause, reset, undo and import) plus a few inputs that move
+without it: the leading captain bid, the viewer, the league list, the date
+(the home page countdown), the templates and the built assets they link
+(``assets.py``). A page's ETag is a hash of those, so a revalidation costs
+one read of the cached auction state snapshot
+(``AUCTION_STATE_CACHE_SECONDS``) and no other query; a matching
+``If-None-Match`` gets ``304 Not Modified``. ``Last-Modified`` is the state
+row's ``updated_at``.
+
+Rendered pages are also kept in a small per-worker LRU under the same key
+(``PAGE_CACHE_SIZE`` entries; 0 turns it off), so a browser without a copy
+still skips the view. Scoping: anonymous visitors share one entry per
+page, league and version; a logged-in user's pages are keyed on that user
+(their name, role and team are rendered into the page) and sent
+``Cache-Control: private``, so a page rendered for an admin or captain is
+never served to anyone else.
+"""
+import hashlib
+import os
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+
+from flask import Response, current_app, make_response, request
+from flask_login import current_user
+from werkzeug.http import is_resource_modified
+
+import auction_state
+from assets import manifest_token
+from leagues import all_leagues
+
+DEFAULT_PAGE_CACHE_SIZE = 128
+
+_pages = OrderedDict() # key -> (etag, body)
+_pages_lock = Lock()
+_template_token = {'token': None}
+
+
+def template_token():
+    """Hash of the template sources, so a deploy with changed templates never answers 304 with old HTML."""
+    if _template_token['token'] is None:
+        digest = hashlib.sha1()
+        folder = os.path.join(current_app.root_path, current_app.template_folder)
+        for root, _, files in sorted(os.walk(folder)):
+            for name in sorted(files):
+                with open(os.path.join(root, name), 'rb') as f: digest.update(name.encode()); digest.update(f.read())
+        _template_token['token'] = digest.hexdigest()[:12]
+    return _template_token['token']
+
+
+def viewer_scope():
+    """('anonymous',) for visitors; the user's identity as rendered into the page otherwise."""
+    if not current_user.is_authenticated: return ('anonymous',)
+    return ('user', current_user.id, current_user.username, current_user.role, current_user.team_id)
+
+
+def page_key(page, state, extra=()):
+    return (page, state.league_id, state.version, state.high_bid, state.high_bid_team_id, tuple(all_leagues()),
+            template_token(), manifest_token(), viewer_scope(), *extra)
+
+
+def _cached_page(key):
+    with _pages_lock:
+        entry = _pages.get(key)
+        if entry is not None: _pages.move_to_end(key)
+        return entry
+
+
+def _store_page(key, etag, body):
+    size = current_app.config.get('PAGE_CACHE_SIZE', DEFAULT_PAGE_CACHE_SIZE)
+    if size <= 0: return
+    with _pages_lock:
+        _pages[key] = (etag, body); _pages.move_to_end(key)
+        while len(_pages) > size: _pages.popitem(last=False)
+
+
+def _finish(response, etag, state, private):
+    response.set_etag(etag, weak=True)
+    if state.updated_at is not None: response.last_modified = state.updated_at
+    response.cache_control.no_cache = True # Revalidate every time; the answer is usually a 304
+    if private: response.cache_control.private = True
+    else: response.cache_control.public = True
+    response.vary.add('Cookie')
+    return response
+
+
+def conditional_page(page, extra=None):
+    """Route decorator: ETag/Last-Modified revalidation and the rendered-page cache for ``page``.
+
+    ``extra`` returns further key parts the page depends on (e.g. today's date).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'): return view(*args, **kwargs)
+            state = auction_state.get_auction_state() # Also drops this worker's stale rosters/summary
+            key = page_key(page, state, tuple(extra()) if extra else ())
+            etag = hashlib.sha1(repr(key).encode()).hexdigest()[:20]
+            private = current_user.is_authenticated
+            if not is_resource_modified(request.environ, etag=etag, last_modified=state.updated_at):
+                return _finish(Response(status=304), etag, state, private)
+            cached = _cached_page(key)
+            if cached is not None: return _finish(Response(cached[1], mimetype='text/html'), etag, state, private)
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200: return response # Redirects (e.g. an admin sent on to the next lot) are not cached
+            _store_page(key, etag, response.get_data())
+            return _finish(response, etag, state, private)
+        return wrapped
+    return decorator
@@ -0,0 +1,145 @@
+"""Server-side filtered, sorted and paginated player list for the players page
+(players of the current league).
+
+Filters reuse the export filters (``exports.PLAYER_FILTERS``), so the page
+and the Excel/CSV export always agree on what "sold" or "unsold" means.
+Pages are fetched with keyset pagination: the cursor holds the sort key of
+the last row shown, and the next page continues ``WHERE (sort key) > cursor``
+along an index (``ix_player_league_listing`` and the per-stat
+``ix_player_league_sort_*`` indexes) instead of counting past an OFFSET. Stat columns are never NULL
+(the importer writes 0; migration 005 backfilled older rows), which the
+keyset comparison relies on.
+"""
+import base64
+import binascii
+import json
+import math
+from dataclasses import dataclass, field
+
+from sqlalchemy import and_, false, or_, select
+
+from models import db, Team, Player
+from exports import PLAYER_FILTERS
+from leagues import current_league_id
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Sortable stat columns; each has an ix_player_league_sort_<name> (league_id, column, id) index
+SORT_COLUMNS = {
+    'overall_matches': Player.overall_matches,
+    'overall_runs': Player.overall_runs,
+    'overall_wickets': Player.overall_wickets,
+    'overall_sr': Player.overall_sr,
+    'overall_hs': Player.overall_hs,
+    'batting_avg': Player.batting_avg,
+    'bowling_avg': Player.bowling_avg,
+    'econ': Player.econ,
+}
+SORT_LABELS = {
+    'default': 'Retained first, then A-Z', 'name': 'Name', 'overall_matches': 'Matches', 'overall_runs': 'Runs',
+    'overall_wickets': 'Wickets', 'overall_sr': 'Strike Rate', 'overall_hs': 'Highest Score', 'batting_avg': 'Batting Avg',
+    'bowling_avg': 'Bowling Avg', 'econ': 'Economy',
+}
+
+
+@dataclass
+class PlayerPage:
+    rows: list # (Player, retaining/buying team name or None)
+    next_cursor: str = None
+    filter_by: str = 'all'
+    sort: str = 'default'
+    order: str = 'asc'
+    q: str = ''
+    params: dict = field(default_factory=dict)
+
+
+def sort_keys(sort, order):
+    """[(column, descending), ...] ending in Player.id so every key is unique."""
+    descending = order == 'desc'
+    if sort == 'default': return [(Player.is_retained, True), (Player.player_name, False), (Player.id, False)]
+    if sort == 'name': return [(Player.player_name, descending), (Player.id, descending)]
+    return [(SORT_COLUMNS[sort], descending), (Player.id, descending)]
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def fits_column(column, value):
+    """Whether a cursor value has the type of its sort column (bool, finite number or string), so it can be compared in SQL."""
+    python_type = column.type.python_type
+    if python_type is bool: return isinstance(value, bool)
+    if python_type in (int, float): return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+    return isinstance(value, python_type)
+
+
+def decode_cursor(cursor, keys):
+    """The sort key values in ``cursor``; ValueError unless there is one value of the right type per key (cursors come from the URL)."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, binascii.Error):
+        raise ValueError('Invalid cursor.')
+    if not isinstance(values, list) or len(values) != len(keys): raise ValueError('Invalid cursor.')
+    if not all(fits_column(column, value) for (column, _), value in zip(keys, values)): raise ValueError('Invalid cursor.')
+    return values
+
+
+def beyond(column, value, descending):
+    """``column`` strictly past ``value`` in the sort direction. SQLAlchemy only compares booleans with = and !=,
+    so for a boolean key the rows past True (descending) are the False ones and nothing is past False."""
+    if isinstance(value, bool): return column == (not value) if value == descending else false()
+    return column < value if descending else column > value
+
+
+def after_cursor(keys, values):
+    """Rows strictly after ``values`` in ``keys`` order: k0 > v0 OR (k0 = v0 AND k1 > v1) OR ... (per-key direction)."""
+    clauses = []
+    for index, (column, descending) in enumerate(keys):
+        ties = [keys[tie][0] == values[tie] for tie in range(index)]
+        clauses.append(and_(*ties, beyond(column, values[index], descending)))
+    return or_(*clauses)
+
+
+def list_players(filter_by='all', sort='default', order=None, q='', after=None, limit=PAGE_SIZE):
+    """One page of players. Raises ValueError for an unknown sort or a malformed cursor."""
+    if filter_by not in PLAYER_FILTERS: filter_by = 'all'
+    if sort not in SORT_LABELS: raise ValueError(f'Unknown sort: {sort}')
+    if order not in ('asc', 'desc'): order = 'asc' if sort in ('default', 'name') else 'desc' # Stats: highest first
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    q = (q or '').strip()
+    keys = sort_keys(sort, order)
+
+    query = PLAYER_FILTERS[filter_by][1](select(Player, Team.team_name).outerjoin(Team, Player.team_id == Team.id)
+                                         .where(Player.league_id == current_league_id()))
+    if q: query = query.where(Player.player_name.icontains(q, autoescape=True))
+    if after: query = query.where(after_cursor(keys, decode_cursor(after, keys)))
+    query = query.order_by(*[column.desc() if descending else column.asc() for column, descending in keys]).limit(limit + 1)
+
+    rows = db.session.execute(query).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1][0]
+        next_cursor = encode_cursor([getattr(last, column.key) for column, _ in keys])
+    return PlayerPage(rows=[tuple(row) for row in rows], next_cursor=next_cursor, filter_by=filter_by, sort=sort, order=order, q=q,
+                      params={'filter': filter_by, 'sort': sort, 'order': order, 'q': q, 'limit': limit})
+
+
+def list_players_from_args(args):
+    """``list_players`` driven by request args (filter, sort, order, q, after, limit)."""
+    try: limit = int(args.get('limit', PAGE_SIZE))
+    except ValueError: limit = PAGE_SIZE
+    return list_players(filter_by=args.get('filter', 'all'), sort=args.get('sort', 'default'), order=args.get('order'),
+                        q=args.get('q', ''), after=args.get('after') or None, limit=limit)
+
+
+def player_json(player, team_name):
+    return {
+        'id': player.id, 'player_name': player.player_name, 'status': player.status_label, 'is_retained': player.is_retained,
+        'team_name': team_name, 'role': player.role, 'sold_price': player.sold_price,
+        'overall_matches': player.overall_matches, 'batting_inn': player.batting_inn, 'overall_runs': player.overall_runs,
+        'batting_avg': player.batting_avg, 'overall_sr': player.overall_sr, 'overall_hs': player.overall_hs,
+        'bowling_inn': player.bowling_inn, 'overall_wickets': player.overall_wickets, 'bowling_avg': player.bowling_avg,
+        'econ': player.econ, 'bbi': player.bbi,
+    }
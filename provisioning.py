@@ -0,0 +1,160 @@
+"""Bulk user provisioning: captain and admin logins from a CSV file.
+
+Columns (header names are case-insensitive): ``full_name``, ``username``,
+``password``, optional ``role`` (``Captain``, ``Admin`` or ``Super Admin``;
+default ``Captain``) and optional ``team`` (a team name or id in the
+league, for captains only).
+
+The whole file is checked before anything is written: usernames against
+each other and against the ``user`` table in one query, team links against
+the league's teams in one query, and roles against what the uploader may
+create. Any problem rejects the file with every problem listed. Passwords
+are then hashed in a pool of ``PROVISION_PROCESSES`` processes (Werkzeug's
+hash is deliberately slow, ~0.1 s each) and all users are inserted in one
+transaction, so a file is created completely or not at all.
+
+From the dashboard the upload runs as a background job (jobs.py), so no web
+worker waits for the hashing. From the command line::
+
+    python provisioning.py captains.csv --league cpl --dry-run
+"""
+import csv
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app, has_app_context
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+
+from models import db, User, Team, DEFAULT_LEAGUE_ID
+
+ROLES = ('Captain', 'Admin', 'Super Admin')
+REQUIRED_COLUMNS = ('full_name', 'username', 'password')
+MAX_USERNAME_LENGTH = 50 # user.username is String(50)
+MAX_FULL_NAME_LENGTH = 100
+MIN_POOL_BATCH = 4 # Fewer passwords than this are hashed in-process; starting the pool costs more
+DEFAULT_PROVISION_PROCESSES = min(4, os.cpu_count() or 1)
+MAX_REPORTED_PROBLEMS = 20
+
+
+class ProvisioningError(Exception):
+    """The file was rejected; ``problems`` lists every reason ("Line 3: ...")."""
+
+    def __init__(self, problems):
+        self.problems = problems
+        shown = problems[:MAX_REPORTED_PROBLEMS]
+        more = f" (and {len(problems) - len(shown)} more)" if len(problems) > len(shown) else ''
+        super().__init__(f"Nothing was created. {'; '.join(shown)}{more}")
+
+
+def _report(progress, percent, message):
+    if progress: progress(percent, message)
+    else: print(message)
+
+
+def read_user_rows(path):
+    """[(line number, {column: value})] from the CSV; header names are lower-cased with spaces as underscores."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None: raise ProvisioningError(['The file is empty.'])
+        reader.fieldnames = [(name or '').strip().lower().replace(' ', '_') for name in reader.fieldnames]
+        missing = [column for column in REQUIRED_COLUMNS if column not in reader.fieldnames]
+        if missing: raise ProvisioningError([f"Missing column(s): {', '.join(missing)}."])
+        return [(reader.line_num, {key: (value or '').strip() for key, value in row.items() if key}) for row in reader
+                if any((value or '').strip() for key, value in row.items() if key)] # Blank lines are skipped
+
+
+def validate_rows(rows, league_id=DEFAULT_LEAGUE_ID, allowed_roles=ROLES):
+    """Checks every row; returns the user values to insert (password still in clear) or raises ProvisioningError."""
+    teams = dict(db.session.execute(select(Team.id, Team.team_name).where(Team.league_id == league_id)).all())
+    team_by_name = {name.strip().casefold(): team_id for team_id, name in teams.items()}
+    usernames = [values['username'] for _, values in rows if values['username']]
+    taken = set(db.session.execute(select(User.username).where(User.username.in_(usernames))).scalars()) if usernames else set()
+    problems, users, seen = [], [], {}
+    for line, values in rows:
+        full_name, username, password = values['full_name'], values['username'], values['password']
+        role = next((r for r in ROLES if r.casefold() == (values.get('role') or 'Captain').casefold()), None)
+        team = values.get('team') or ''
+        row_problems = [f"{column} is empty" for column in REQUIRED_COLUMNS if not values[column]]
+        if len(username) > MAX_USERNAME_LENGTH: row_problems.append(f"username is longer than {MAX_USERNAME_LENGTH} characters")
+        if len(full_name) > MAX_FULL_NAME_LENGTH: row_problems.append(f"full_name is longer than {MAX_FULL_NAME_LENGTH} characters")
+        if username in taken: row_problems.append(f"username '{username}' already exists")
+        elif username and username in seen: row_problems.append(f"username '{username}' is also on line {seen[username]}")
+        if role is None: row_problems.append(f"unknown role '{values.get('role')}'")
+        elif role not in allowed_roles: row_problems.append(f"you cannot create {role} users")
+        team_id = None
+        if team:
+            team_id = int(team) if team.isdigit() and int(team) in teams else team_by_name.get(team.casefold())
+            if team_id is None: row_problems.append(f"no team '{team}' in this league")
+            elif role != 'Captain': row_problems.append("only Captains are linked to a team")
+        seen.setdefault(username, line)
+        if row_problems: problems.append(f"Line {line}: {', '.join(row_problems)}")
+        else: users.append({'full_name': full_name, 'username': username, 'password': password, 'role': role, 'team_id': team_id})
+    if problems: raise ProvisioningError(problems)
+    return users
+
+
+def hash_passwords(passwords, processes=None, progress=None):
+    """Werkzeug hashes of ``passwords`` in order, computed in a process pool for larger batches."""
+    processes = processes or (current_app.config.get('PROVISION_PROCESSES') if has_app_context() else None) or DEFAULT_PROVISION_PROCESSES
+    total = len(passwords)
+    if processes <= 1 or total < MIN_POOL_BATCH:
+        hashes = []
+        for password in passwords:
+            hashes.append(generate_password_hash(password))
+            if progress: progress(len(hashes), total)
+        return hashes
+    # Spawned, not forked: the caller may be a job runner thread inside a threaded web worker
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+        hashes = []
+        for password_hash in pool.map(generate_password_hash, passwords, chunksize=max(1, total // (processes * 4))):
+            hashes.append(password_hash)
+            if progress and (len(hashes) % 10 == 0 or len(hashes) == total): progress(len(hashes), total)
+        return hashes
+
+
+def provision_users(path, league_id=DEFAULT_LEAGUE_ID, allowed_roles=ROLES, dry_run=False, processes=None, progress=None):
+    """Creates every user in the CSV at ``path`` in one transaction (or only validates, when dry_run); returns the number of users.
+
+    Raises ProvisioningError when the file is rejected. ``progress(percent, message)`` as for import jobs.
+    """
+    rows = read_user_rows(path)
+    if not rows: raise ProvisioningError(['The file has no users.'])
+    users = validate_rows(rows, league_id, allowed_roles)
+    _report(progress, 10, f"Checked {len(users)} users.")
+    if dry_run: return len(users)
+    hashes = hash_passwords([user.pop('password') for user in users], processes,
+                            lambda done, total: progress(10 + 80 * done / total, f"Hashed {done} of {total} passwords") if progress else None)
+    try:
+        db.session.execute(insert(User), [dict(user, password_hash=password_hash) for user, password_hash in zip(users, hashes)])
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback() # Someone created one of these usernames while the passwords were hashed
+        raise ProvisioningError(['A username in the file was created by someone else meanwhile; upload the file again.'])
+    _report(progress, 100, f"Created {len(users)} users.")
+    return len(users)
+
+
+if __name__ == '__main__':
+    import argparse
+    from app import app
+    from leagues import league_by_slug
+    parser = argparse.ArgumentParser(description='Create captain/admin logins from a CSV file (full_name, username, password[, role, team]).')
+    parser.add_argument('filepath')
+    parser.add_argument('--league', metavar='SLUG', help='League whose teams the captains are linked to (default: the default league).')
+    parser.add_argument('--dry-run', action='store_true', help='Only check the file.')
+    parser.add_argument('--processes', type=int, help=f'Password hashing processes (default: {DEFAULT_PROVISION_PROCESSES}).')
+    args = parser.parse_args()
+    with app.app_context():
+        league = league_by_slug(args.league) if args.league else None
+        if args.league and league is None: parser.error(f"No league '{args.league}'. Create it with `python leagues.py create`.")
+        try:
+            count = provision_users(args.filepath, league.id if league else DEFAULT_LEAGUE_ID, dry_run=args.dry_run, processes=args.processes)
+            if args.dry_run: print(f"Dry run: {count} users would be created.")
+        except ProvisioningError as e:
+            for problem in e.problems: print(problem)
+            raise SystemExit(f"Nothing was created ({len(e.problems)} problem(s)).")
+        except FileNotFoundError:
+            raise SystemExit(f"Error: CSV file not found at {args.filepath}")
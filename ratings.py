@@ -0,0 +1,248 @@
+"""Player ratings, percentile ranks, leaderboards and team strength.
+
+The stats columns of every player of a league are loaded into NumPy arrays
+with one query, and batting, bowling and all-rounder ratings (0-100) plus their
+percentile ranks are computed for all players in one vectorized pass:
+
+- each stat is scaled to 0..1 between its 5th and 95th percentile among
+  players who have that stat (so one freak figure does not flatten the rest),
+  inverted where lower is better (bowling average, economy);
+- the weighted sum is damped by experience, ``innings / (innings + 5)``, so
+  a single good innings does not top the board;
+- rows that only carry career totals (matches, runs, wickets, strike rate,
+  highest score; the innings, averages, economy and best figures blank, as
+  for the retained players in ``players_data.csv``) are rated on the stats
+  they have: the weights are shared out over the present stats and matches
+  stand in for innings;
+- the all-rounder rating is the geometric mean of the two, which is only
+  high for players who both bat and bowl.
+
+Best bowling (``bbi``) strings such as ``5(11)`` or ``5/11`` are parsed once
+per distinct value. The computed ratings are cached in-process per league and
+keyed on its ``auction_state.stats_version``, which the importer bumps only when it
+changes player rows; sales do not change stats, so the auction never
+triggers a recompute. Leaderboards and team totals are slices and
+``bincount``s over the cached arrays.
+"""
+import re
+from dataclasses import dataclass
+from threading import Lock
+
+import numpy as np
+from sqlalchemy import select
+
+from models import db, Player
+import auction_state
+from rosters import get_team_rosters
+from leagues import current_league_id
+from db_engines import on_primary
+
+EXPERIENCE_INNINGS = 5 # Innings at which a player gets half their full rating
+SCALE_PERCENTILES = (5, 95)
+BATTING_WEIGHTS = {'batting_avg': 0.35, 'overall_sr': 0.30, 'overall_runs': 0.25, 'overall_hs': 0.10}
+BOWLING_WEIGHTS = {'overall_wickets': 0.35, 'bowling_avg': 0.25, 'econ': 0.25, 'bbi_wickets': 0.15}
+STAT_COLUMNS = ['overall_matches', 'overall_runs', 'overall_wickets', 'overall_sr', 'overall_hs',
+                'batting_inn', 'batting_avg', 'bowling_inn', 'bowling_avg', 'econ']
+RATING_KINDS = ('batting', 'bowling', 'all_rounder')
+LEADERBOARD_SIZE = 20
+MAX_LEADERBOARD_SIZE = 500
+
+BBI_PATTERN = re.compile(r'^\s*(\d+)\s*(?:[(/-]\s*(\d+)\s*\)?)?\s*$') # '5(11)', '5/11', '5-11' or just '5'
+
+
+def parse_bbi(value):
+    """(wickets, runs) from a best-bowling string; NaN for parts that are missing or impossible."""
+    match = BBI_PATTERN.match(value or '')
+    if not match: return np.nan, np.nan
+    wickets = int(match.group(1))
+    if wickets > 10: return np.nan, np.nan
+    return float(wickets), float(match.group(2)) if match.group(2) is not None else np.nan
+
+
+def parse_bbi_array(values):
+    """Vectorized ``parse_bbi``: each distinct string is parsed once and broadcast back."""
+    if len(values) == 0: return np.zeros(0), np.zeros(0)
+    distinct, inverse = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    parsed = np.array([parse_bbi(value) for value in distinct], dtype=float).reshape(-1, 2)
+    return parsed[inverse, 0], parsed[inverse, 1]
+
+
+def scale(values, valid, higher_is_better=True):
+    """0..1 position of each value between the robust bounds of the valid values; invalid entries score 0."""
+    scaled = np.zeros(len(values))
+    if not valid.any(): return scaled
+    low, high = np.percentile(values[valid], SCALE_PERCENTILES)
+    if high > low: scaled = np.clip((values - low) / (high - low), 0.0, 1.0)
+    else: scaled = np.ones(len(values))
+    if not higher_is_better: scaled = 1.0 - scaled
+    return np.where(valid, scaled, 0.0)
+
+
+def percentile_ranks(values):
+    """Share of players (0-100) rated at or below each value."""
+    if len(values) == 0: return np.zeros(0)
+    return 100.0 * np.searchsorted(np.sort(values), values, side='right') / len(values)
+
+
+def weighted(parts, present, weights):
+    """Weighted sum of the 0..1 parts, with each player's weights shared out over the stats present for them."""
+    total = sum(weight * present[column] for column, weight in weights.items())
+    score = sum(weight * parts[column] for column, weight in weights.items())
+    return np.divide(score, total, out=np.zeros(len(score)), where=total > 0)
+
+
+def compute_ratings(stats, bbi):
+    """{'batting', 'bowling', 'all_rounder'} rating arrays (0-100) from stat arrays keyed by column name."""
+    bbi_wickets, bbi_runs = parse_bbi_array(bbi)
+    played = stats['overall_matches'] > 0
+    # Innings columns blank (stored as 0) but career totals filled: matches stand in for innings
+    batting_detail, bowling_detail = stats['batting_inn'] > 0, stats['bowling_inn'] > 0
+    batted = batting_detail | (played & (stats['overall_runs'] > 0))
+    bowled = bowling_detail | (played & (stats['overall_wickets'] > 0))
+    batting_innings = np.where(batting_detail, stats['batting_inn'], np.where(batted, stats['overall_matches'], 0.0))
+    bowling_innings = np.where(bowling_detail, stats['bowling_inn'], np.where(bowled, stats['overall_matches'], 0.0))
+    batting_present = {'batting_avg': batting_detail, 'overall_sr': batted, 'overall_runs': batted, 'overall_hs': batted}
+    bowling_present = {'overall_wickets': bowled, 'bowling_avg': bowling_detail, 'econ': bowling_detail, 'bbi_wickets': bowling_detail}
+    batting_parts = {column: scale(stats[column], batting_present[column]) for column in BATTING_WEIGHTS}
+    bowling_parts = {
+        'overall_wickets': scale(stats['overall_wickets'], bowled),
+        'bowling_avg': scale(stats['bowling_avg'], bowling_detail & (stats['overall_wickets'] > 0) & (stats['bowling_avg'] > 0), higher_is_better=False),
+        'econ': scale(stats['econ'], bowling_detail & (stats['econ'] > 0), higher_is_better=False),
+        # Best figures: wickets first, runs conceded as a fractional tiebreak (5(11) beats 5(30))
+        'bbi_wickets': scale(bbi_wickets - np.nan_to_num(bbi_runs, nan=99.0) / 1000.0, bowling_detail & ~np.isnan(bbi_wickets)),
+    }
+    batting = 100.0 * weighted(batting_parts, batting_present, BATTING_WEIGHTS)
+    bowling = 100.0 * weighted(bowling_parts, bowling_present, BOWLING_WEIGHTS)
+    batting *= batting_innings / (batting_innings + EXPERIENCE_INNINGS)
+    bowling *= bowling_innings / (bowling_innings + EXPERIENCE_INNINGS)
+    return {'batting': batting, 'bowling': bowling, 'all_rounder': np.sqrt(batting * bowling),
+            'bbi_wickets': bbi_wickets, 'bbi_runs': bbi_runs}
+
+
+@dataclass(frozen=True)
+class LeaderboardEntry:
+    rank: int
+    player_id: int
+    player_name: str
+    rating: float
+    percentile: float
+    batting: float
+    bowling: float
+    all_rounder: float
+
+
+@dataclass(frozen=True)
+class TeamStrength:
+    team_id: int
+    team_name: str
+    players: int
+    batting: float
+    bowling: float
+    all_rounder: float
+    strength: float # Sum of each player's best rating (batting, bowling or all-rounder)
+
+
+class PlayerRatings:
+    """Ratings and percentiles of every player of a league at one ``stats_version``, as arrays ordered by player id."""
+
+    def __init__(self, stats_version, ids, names, ratings, league_id=None):
+        self.stats_version, self.league_id = stats_version, league_id
+        self.ids, self.names = ids, names
+        self.ratings = {kind: np.round(ratings[kind], 2) for kind in RATING_KINDS}
+        self.percentiles = {kind: np.round(percentile_ranks(self.ratings[kind]), 1) for kind in RATING_KINDS}
+        self.best = np.maximum.reduce([self.ratings[kind] for kind in RATING_KINDS])
+        self.bbi_wickets, self.bbi_runs = ratings['bbi_wickets'], ratings['bbi_runs']
+
+    def __len__(self):
+        return len(self.ids)
+
+    def positions(self, player_ids):
+        """(array positions, found mask) of ``player_ids``; ids not rated yet have found=False."""
+        player_ids = np.asarray(player_ids, dtype=np.int64)
+        positions = np.searchsorted(self.ids, player_ids)
+        found = positions < len(self.ids)
+        found[found] = self.ids[positions[found]] == player_ids[found]
+        return positions, found
+
+    def entry(self, position, kind='all_rounder', rank=None):
+        return LeaderboardEntry(rank=rank, player_id=int(self.ids[position]), player_name=self.names[position],
+                                rating=float(self.ratings[kind][position]), percentile=float(self.percentiles[kind][position]),
+                                batting=float(self.ratings['batting'][position]), bowling=float(self.ratings['bowling'][position]),
+                                all_rounder=float(self.ratings['all_rounder'][position]))
+
+    def leaderboard(self, kind='all_rounder', limit=LEADERBOARD_SIZE, player_ids=None):
+        """Top ``limit`` players by ``kind`` (optionally among ``player_ids``); ties go to the lower player id."""
+        if kind not in RATING_KINDS: raise ValueError(f'Unknown rating: {kind}')
+        if player_ids is None: candidates = np.arange(len(self.ids))
+        else:
+            positions, found = self.positions(player_ids); candidates = positions[found]
+        if len(candidates) == 0: return []
+        scores = self.ratings[kind][candidates]
+        limit = max(1, min(int(limit), MAX_LEADERBOARD_SIZE, len(candidates)))
+        if limit < len(candidates): # Partition out the top `limit` first; only those get sorted
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            candidates, scores = candidates[top], scores[top]
+        order = np.lexsort((self.ids[candidates], -scores))[:limit]
+        return [self.entry(position, kind, rank) for rank, position in enumerate(candidates[order], start=1)]
+
+    def team_strength(self, assignments):
+        """[TeamStrength] per roster from (player_id, team_id) pairs, strongest first."""
+        rosters = get_team_rosters(self.league_id)
+        team_index = {roster.id: index for index, roster in enumerate(rosters)}
+        pairs = [(player_id, team_index[team_id]) for player_id, team_id in assignments if team_id in team_index]
+        positions, found = self.positions([player_id for player_id, _ in pairs])
+        positions, teams = positions[found], np.array([index for _, index in pairs], dtype=np.int64)[found]
+        totals = {kind: np.bincount(teams, weights=self.ratings[kind][positions], minlength=len(rosters)) for kind in RATING_KINDS}
+        strength = np.bincount(teams, weights=self.best[positions], minlength=len(rosters))
+        counts = np.bincount(teams, minlength=len(rosters))
+        result = [TeamStrength(team_id=roster.id, team_name=roster.team_name, players=int(counts[index]),
+                               batting=round(float(totals['batting'][index]), 1), bowling=round(float(totals['bowling'][index]), 1),
+                               all_rounder=round(float(totals['all_rounder'][index]), 1), strength=round(float(strength[index]), 1))
+                  for index, roster in enumerate(rosters)]
+        return sorted(result, key=lambda team: (-team.strength, team.team_name))
+
+
+@on_primary
+def load_player_ratings(stats_version=0, league_id=None):
+    """Loads the stats of every player of the league (default: the current league) with one query and rates them all."""
+    league_id = current_league_id() if league_id is None else league_id
+    rows = db.session.execute(
+        select(Player.id, Player.player_name, Player.bbi, *[getattr(Player, column) for column in STAT_COLUMNS])
+        .where(Player.league_id == league_id).order_by(Player.id)
+    ).all()
+    columns = list(zip(*rows)) or [()] * (3 + len(STAT_COLUMNS))
+    ids = np.asarray(columns[0], dtype=np.int64)
+    names = np.asarray(columns[1], dtype=object)
+    stats = {column: np.nan_to_num(np.asarray(values, dtype=float)) for column, values in zip(STAT_COLUMNS, columns[3:])}
+    return PlayerRatings(stats_version, ids, names, compute_ratings(stats, columns[2]), league_id)
+
+
+_ratings_cache = {} # league_id -> PlayerRatings
+_ratings_lock = Lock()
+
+
+def get_player_ratings():
+    """The current league's cached ratings; recomputed only when an import moved its ``stats_version`` on (here or in another worker)."""
+    league_id = current_league_id()
+    stats_version = auction_state.get_auction_state(league_id=league_id).stats_version
+    ratings = _ratings_cache.get(league_id)
+    if ratings is None or ratings.stats_version != stats_version:
+        with _ratings_lock:
+            ratings = _ratings_cache.get(league_id)
+            if ratings is None or ratings.stats_version != stats_version:
+                ratings = load_player_ratings(stats_version, league_id)
+                _ratings_cache[league_id] = ratings
+    return ratings
+
+
+def available_player_ids():
+    """Players of the current league still in the auction pool (not retained, not sold)."""
+    return db.session.execute(
+        select(Player.id).where(Player.league_id == current_league_id(), Player.is_retained == False, Player.status != 'Sold')
+    ).scalars().all()
+
+
+def get_team_strength():
+    """Rating totals per team of the current league over its current (retained and bought) players."""
+    assignments = db.session.execute(select(Player.id, Player.team_id).where(Player.league_id == current_league_id(), Player.team_id.isnot(None))).all()
+    return get_player_ratings().team_strength(assignments)
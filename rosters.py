@@ -0,0 +1,89 @@
+"""Team roster snapshots for the public teams page.
+
+Every roster is loaded with two set-based queries (teams, then all assigned
+players) and grouped in Python, instead of the per-team dynamic relationship
+queries the template used to run. The result is cached in-process per
+league until an auction route that changes a roster calls
+``invalidate_rosters()``.
+"""
+from dataclasses import dataclass, field
+from threading import Lock
+
+from sqlalchemy import select
+
+from models import db, Team, Player
+from leagues import current_league_id
+from db_engines import on_primary
+
+
+@dataclass
+class RosterPlayer:
+    player_name: str
+    sold_price: int
+
+
+@dataclass
+class TeamRoster:
+    id: int
+    team_name: str
+    captain_name: str
+    purse: int
+    purse_spent: int
+    players_taken_count: int
+    slots_remaining: int
+    retained: list = field(default_factory=list)
+    bought: list = field(default_factory=list)
+
+    @property
+    def has_players(self):
+        return bool(self.retained or self.bought)
+
+
+_roster_cache = {} # league_id -> rosters
+_roster_lock = Lock()
+
+
+@on_primary
+def load_team_rosters(league_id):
+    """Builds the roster of every team of the league (ordered by team name) from two queries."""
+    team_rows = db.session.execute(
+        select(Team.id, Team.team_name, Team.captain_name, Team.purse, Team.purse_spent,
+               Team.players_taken_count, Team.slots_remaining)
+        .where(Team.league_id == league_id).order_by(Team.team_name)
+    ).all()
+    rosters = [TeamRoster(**row._asdict()) for row in team_rows]
+    by_team = {roster.id: roster for roster in rosters}
+
+    player_rows = db.session.execute(
+        select(Player.team_id, Player.player_name, Player.sold_price, Player.is_retained)
+        .where(Player.league_id == league_id, Player.team_id.isnot(None))
+        .order_by(Player.player_name)
+    ).all()
+    for row in player_rows:
+        roster = by_team.get(row.team_id)
+        if roster is None: continue
+        entry = RosterPlayer(player_name=row.player_name, sold_price=row.sold_price or 0)
+        (roster.retained if row.is_retained else roster.bought).append(entry)
+
+    # Retained players stay in name order; auction buys are shown most expensive first.
+    for roster in rosters:
+        roster.bought.sort(key=lambda p: p.sold_price, reverse=True)
+    return rosters
+
+
+def get_team_rosters(league_id=None):
+    """Returns the league's cached rosters (default: the current league), rebuilding them after an invalidation."""
+    league_id = current_league_id() if league_id is None else league_id
+    rosters = _roster_cache.get(league_id)
+    if rosters is None:
+        with _roster_lock:
+            rosters = _roster_cache.get(league_id)
+            if rosters is None:
+                rosters = load_team_rosters(league_id)
+                _roster_cache[league_id] = rosters
+    return rosters
+
+
+def invalidate_rosters(league_id=None):
+    """Drops the league's cached rosters (default: the current league); call after any change to purses or team assignments."""
+    _roster_cache.pop(current_league_id() if league_id is None else league_id, None)
@@ -0,0 +1,73 @@
+"""Atomic sale and unsold writes for the auction routes.
+
+Each write is one conditional ``UPDATE`` whose ``WHERE`` clause re-checks the
+rule it enforces (the player is still in the current league's live pool; the
+team is in that league, can afford the price and has a free slot), so two admin consoles or gunicorn workers
+racing on the same lot or team cannot both pass the check: the loser's
+``UPDATE`` matches no row and ``SaleRejected`` is raised with the session
+rolled back. Purse and slot counts are decremented in SQL, never written back
+from values read earlier. Nothing is committed here; the route commits with
+its auction state transition.
+"""
+from dataclasses import dataclass
+
+from sqlalchemy import update
+
+from models import db, Team, Player
+from leagues import current_league_id
+
+LOT_CLOSED_MESSAGE = 'This player is not currently up for auction or action already taken.'
+
+
+class SaleRejected(Exception):
+    """The sale/unsold mark no longer applies (lot already closed, purse or slots exhausted)."""
+
+
+@dataclass(frozen=True)
+class Sale:
+    player_name: str
+    team_name: str
+    price: int
+    purse: int
+    slots_remaining: int
+
+
+def _close_lot(player_id, **values):
+    """Moves a live-pool player out of the pool; returns the player's name, or None if the lot was already closed."""
+    return db.session.execute(
+        update(Player).where(Player.id == player_id, Player.league_id == current_league_id(), Player.is_retained == False, Player.status == 'Unsold')
+        .values(**values).returning(Player.player_name).execution_options(synchronize_session=False)
+    ).scalar()
+
+
+def sell_player(player_id, team_id, price):
+    """Sells ``player_id`` to ``team_id`` for ``price`` points. Returns a ``Sale``; raises ``SaleRejected``."""
+    player_name = _close_lot(player_id, status='Sold', sold_price=price, team_id=team_id)
+    if player_name is None:
+        db.session.rollback(); raise SaleRejected(LOT_CLOSED_MESSAGE)
+    team = db.session.execute(
+        update(Team).where(Team.id == team_id, Team.league_id == current_league_id(), Team.purse >= price, Team.slots_remaining > 0)
+        .values(purse=Team.purse - price, purse_spent=Team.purse_spent + price,
+                players_taken_count=Team.players_taken_count + 1, slots_remaining=Team.slots_remaining - 1)
+        .returning(Team.team_name, Team.purse, Team.slots_remaining).execution_options(synchronize_session=False)
+    ).first()
+    if team is None:
+        db.session.rollback(); raise SaleRejected(_team_rejection(team_id))
+    db.session.expire_all() # Loaded Team/Player objects no longer match the rows
+    return Sale(player_name=player_name, team_name=team.team_name, price=price, purse=team.purse, slots_remaining=team.slots_remaining)
+
+
+def pass_player(player_id, auction_round):
+    """Marks ``player_id`` unsold for ``auction_round``. Returns the player's name; raises ``SaleRejected``."""
+    player_name = _close_lot(player_id, status='Passed', unsold_round=auction_round)
+    if player_name is None:
+        db.session.rollback(); raise SaleRejected(LOT_CLOSED_MESSAGE)
+    db.session.expire_all()
+    return player_name
+
+
+def _team_rejection(team_id):
+    team = db.session.get(Team, team_id)
+    if team is None or team.league_id != current_league_id(): return 'Invalid team or price.'
+    if team.slots_remaining <= 0: return f'{team.team_name} has no remaining slots!'
+    return f'{team.team_name} does not have enough purse (Remaining: {team.purse})!'
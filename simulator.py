@@ -0,0 +1,252 @@
+"""Monte Carlo outlook: how the rest of the pool is likely to split between the teams.
+
+Starting from the league's current state (players still in the pool, each
+team's purse, open slots and rating strength), each run auctions off the
+remaining players in a random order:
+
+- a player's price is drawn around what the league has paid so far for
+  players of that rating: ``log(price)`` is fitted to the best rating
+  (ratings.py) of every sold or retained player, and each draw adds the
+  fit's own scatter. Before there are enough prices, the league's money
+  per open slot, scaled by rating, stands in;
+- every team with an open slot that can still afford the minimum price
+  (``BID_INCREMENT``) on each of its other open slots is a bidder; the one
+  with the most money per open slot (times some random appetite) wins and
+  pays the price, capped at what it can spend;
+- a player nobody can afford goes unsold.
+
+Runs are vectorized with NumPy: each step of the loop auctions one lot in
+every run of a batch at once. Larger simulations are split into batches
+spread over a process pool (``SIMULATION_PROCESSES``, kept alive between
+calls). The outcome per team is its expected final strength (sum of each
+player's best rating, as on the leaderboard) with a 10-90% range, expected
+buys and purse left, the chance of finishing strongest and the purse
+exhaustion risk: the share of runs in which it ends with open slots but
+less than the minimum price left.
+
+Results are cached per league and auction state version (and the seed is
+derived from it), so every page view between two sales shares one run and
+every worker shows the same numbers.
+"""
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from threading import Lock
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+
+import auction_state
+from bidding import bid_increment
+from leagues import current_league_id
+from models import db, Player
+from ratings import get_player_ratings, get_team_strength
+from rosters import get_team_rosters
+
+DEFAULT_RUNS = 2000
+MAX_RUNS = 50000
+BATCH_RUNS = 2500 # Runs per process pool task; smaller simulations run in-process
+DEFAULT_SIMULATION_PROCESSES = min(4, os.cpu_count() or 1)
+MIN_PRICES_FOR_FIT = 5
+MIN_PRICE_SCATTER = 0.25 # log-price standard deviation used when the fit is too tight to trust
+APPETITE_SCATTER = 0.35 # Random variation in how hard each team bids for each lot
+
+
+@dataclass(frozen=True)
+class SimulationInputs:
+    """Everything a batch needs, as plain arrays (pickled to the pool processes)."""
+    purse: np.ndarray # Per team
+    slots: np.ndarray
+    strength: np.ndarray
+    player_best: np.ndarray # Per pool player
+    expected_price: np.ndarray
+    price_scatter: float
+    min_price: int
+
+
+@dataclass(frozen=True)
+class TeamOutlook:
+    team_id: int
+    team_name: str
+    purse: int
+    slots_remaining: int
+    strength_now: float
+    expected_strength: float
+    strength_low: float # 10th percentile
+    strength_high: float # 90th percentile
+    expected_players: float
+    expected_purse_left: float
+    top_chance: float # % of runs finishing strongest
+    exhaustion_risk: float # % of runs ending with open slots and less than the minimum price
+
+
+@dataclass(frozen=True)
+class SimulationResult:
+    version: int
+    runs: int
+    players_left: int
+    priced_players: int # Prices the price model was fitted on (0: money-per-slot fallback)
+    min_price: int
+    elapsed_ms: float
+    teams: list
+
+
+# --- Price model ---
+def price_model(pool_best, priced_best, prices, purse, slots, min_price):
+    """(expected price per pool player, log-price scatter) from past prices, else from money per open slot."""
+    if len(prices) >= MIN_PRICES_FOR_FIT and np.ptp(priced_best) > 0:
+        slope, intercept = np.polyfit(priced_best, np.log(prices), 1)
+        scatter = max(float(np.std(np.log(prices) - (intercept + slope * priced_best))), MIN_PRICE_SCATTER)
+        expected = np.exp(intercept + slope * pool_best)
+    else:
+        per_slot = purse.sum() / max(int(slots.sum()), 1)
+        expected = per_slot * (pool_best + 5.0) / (float(pool_best.mean()) + 5.0 if len(pool_best) else 5.0)
+        scatter = 2 * MIN_PRICE_SCATTER
+    return np.maximum(expected, min_price), scatter
+
+
+# --- Simulation kernel (no database; runs in the pool processes) ---
+def simulate_batch(inputs, runs, seed):
+    """Final (strength, purse, players bought, slots) per run and team, each shaped (runs, teams)."""
+    rng = np.random.default_rng(seed)
+    teams, players = len(inputs.purse), len(inputs.player_best)
+    purse = np.tile(inputs.purse.astype(float), (runs, 1))
+    slots = np.tile(inputs.slots.astype(np.int64), (runs, 1))
+    strength = np.tile(inputs.strength.astype(float), (runs, 1))
+    bought = np.zeros((runs, teams), dtype=np.int64)
+    order = rng.permuted(np.tile(np.arange(players), (runs, 1)), axis=1) # Each run auctions the pool in its own order
+    prices = inputs.expected_price * rng.lognormal(-inputs.price_scatter ** 2 / 2, inputs.price_scatter, (runs, players)) # Mean-preserving
+    rows, min_price = np.arange(runs), inputs.min_price
+    for step in range(players):
+        player = order[:, step]
+        capacity = purse - np.maximum(slots - 1, 0) * min_price # Keep the minimum for every other open slot
+        bidding = (slots > 0) & (capacity >= min_price)
+        appetite = np.where(bidding, capacity / np.maximum(slots, 1) * rng.lognormal(0, APPETITE_SCATTER, (runs, teams)), -np.inf)
+        winner = appetite.argmax(axis=1)
+        sold = bidding[rows, winner]
+        paid = np.minimum(np.maximum(prices[rows, player], min_price), capacity[rows, winner])
+        paid = np.maximum(np.floor(paid / min_price) * min_price, min_price) # Bids move in whole increments
+        sold_rows, sold_teams = rows[sold], winner[sold]
+        purse[sold_rows, sold_teams] -= paid[sold]
+        slots[sold_rows, sold_teams] -= 1
+        bought[sold_rows, sold_teams] += 1
+        strength[sold_rows, sold_teams] += inputs.player_best[player[sold]]
+    return strength, purse, bought, slots
+
+
+_pool = {'executor': None, 'processes': 0}
+_pool_lock = Lock()
+
+
+def _executor(processes):
+    """This process's simulation pool, started on first use and kept for the next sale."""
+    with _pool_lock:
+        if _pool['executor'] is None or _pool['processes'] != processes:
+            if _pool['executor'] is not None: _pool['executor'].shutdown(wait=False)
+            # Spawned, not forked: the caller is usually a threaded web worker
+            _pool['executor'] = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+            _pool['processes'] = processes
+        return _pool['executor']
+
+
+def run_simulation(inputs, runs, seed, processes=1):
+    """All runs, in-process or split into batches over the pool; same arrays as ``simulate_batch``."""
+    batches = [min(BATCH_RUNS, runs - start) for start in range(0, runs, BATCH_RUNS)]
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+    if processes <= 1 or len(batches) == 1:
+        results = [simulate_batch(inputs, size, batch_seed) for size, batch_seed in zip(batches, seeds)]
+    else:
+        results = list(_executor(processes).map(simulate_batch, [inputs] * len(batches), batches, seeds))
+    return tuple(np.concatenate(parts) for parts in zip(*results))
+
+
+# --- League state ---
+def load_inputs():
+    """(SimulationInputs, team rosters, pool size, priced players) for the current state of the current league."""
+    league_id = current_league_id()
+    ratings = get_player_ratings()
+    rosters = get_team_rosters(league_id)
+    strength_by_team = {team.team_id: team.strength for team in get_team_strength()}
+    pool_ids = db.session.execute(select(Player.id).where(
+        Player.league_id == league_id, Player.is_retained == False, Player.status != 'Sold').order_by(Player.id)).scalars().all()
+    priced = db.session.execute(select(Player.id, Player.sold_price).where(
+        Player.league_id == league_id, Player.team_id.isnot(None), Player.sold_price > 0)).all()
+    positions, found = ratings.positions(pool_ids)
+    pool_best = ratings.best[positions[found]] if len(pool_ids) else np.zeros(0)
+    priced_positions, priced_found = ratings.positions([player_id for player_id, _ in priced])
+    priced_best = ratings.best[priced_positions[priced_found]] if priced else np.zeros(0)
+    prices = np.array([price for _, price in priced], dtype=float)[priced_found] if priced else np.zeros(0)
+    purse = np.array([max(roster.purse or 0, 0) for roster in rosters], dtype=float)
+    slots = np.array([max(roster.slots_remaining or 0, 0) for roster in rosters], dtype=np.int64)
+    min_price = bid_increment()
+    expected_price, scatter = price_model(pool_best, priced_best, prices, purse, slots, min_price)
+    inputs = SimulationInputs(purse=purse, slots=slots, strength=np.array([strength_by_team.get(roster.id, 0.0) for roster in rosters]),
+                              player_best=np.asarray(pool_best, dtype=float), expected_price=expected_price, price_scatter=scatter, min_price=min_price)
+    return inputs, rosters, len(pool_best), len(prices)
+
+
+def simulate_league(runs=DEFAULT_RUNS, processes=None):
+    """Runs the simulation from the current league's state and summarizes it per team."""
+    league_id = current_league_id()
+    processes = processes or current_app.config.get('SIMULATION_PROCESSES') or DEFAULT_SIMULATION_PROCESSES
+    started = time.perf_counter()
+    state = auction_state.get_auction_state(league_id=league_id)
+    inputs, rosters, players_left, priced_players = load_inputs()
+    seed = int(hashlib.sha1(f'{league_id}:{state.version}:{state.stats_version}:{runs}'.encode()).hexdigest()[:12], 16)
+    strength, purse, bought, slots = run_simulation(inputs, runs, seed, processes)
+    exhausted = (slots > 0) & (purse < inputs.min_price)
+    strongest = np.bincount(strength.argmax(axis=1), minlength=len(rosters)) if len(rosters) else np.zeros(0)
+    low, high = np.percentile(strength, [10, 90], axis=0) if len(rosters) else (np.zeros(0), np.zeros(0))
+    teams = [TeamOutlook(team_id=roster.id, team_name=roster.team_name, purse=roster.purse, slots_remaining=roster.slots_remaining,
+                         strength_now=round(float(inputs.strength[index]), 1), expected_strength=round(float(strength[:, index].mean()), 1),
+                         strength_low=round(float(low[index]), 1), strength_high=round(float(high[index]), 1),
+                         expected_players=round(float(bought[:, index].mean()), 1), expected_purse_left=round(float(purse[:, index].mean())),
+                         top_chance=round(100.0 * strongest[index] / runs, 1), exhaustion_risk=round(100.0 * float(exhausted[:, index].mean()), 1))
+             for index, roster in enumerate(rosters)]
+    teams.sort(key=lambda team: (-team.expected_strength, team.team_name))
+    return SimulationResult(version=state.version, runs=runs, players_left=players_left, priced_players=priced_players,
+                            min_price=inputs.min_price, elapsed_ms=round(1000 * (time.perf_counter() - started), 1), teams=teams)
+
+
+_results = {} # league_id -> SimulationResult
+_results_lock = Lock()
+
+
+def get_simulation(runs=DEFAULT_RUNS):
+    """The current league's outlook, recomputed only when the auction state version (or the run count) moved on."""
+    league_id = current_league_id()
+    runs = max(1, min(int(runs), MAX_RUNS))
+    version = auction_state.get_auction_state(league_id=league_id).version
+    result = _results.get(league_id)
+    if result is None or result.version != version or result.runs != runs:
+        with _results_lock:
+            result = _results.get(league_id)
+            if result is None or result.version != version or result.runs != runs:
+                result = simulate_league(runs)
+                _results[league_id] = result
+    return result
+
+
+if __name__ == '__main__':
+    import argparse
+    from app import app
+    from leagues import league_by_slug, use_league
+    parser = argparse.ArgumentParser(description='Simulate the rest of the auction and print each team\'s outlook.')
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help=f'Randomized auction completions (default: {DEFAULT_RUNS}).')
+    parser.add_argument('--processes', type=int, help=f'Pool processes (default: {DEFAULT_SIMULATION_PROCESSES}).')
+    parser.add_argument('--league', metavar='SLUG', help='League to simulate (default: the default league).')
+    args = parser.parse_args()
+    with app.app_context():
+        league = league_by_slug(args.league) if args.league else None
+        if args.league and league is None: parser.error(f"No league '{args.league}'.")
+        if league: use_league(league.id)
+        result = simulate_league(max(1, min(args.runs, MAX_RUNS)), args.processes)
+        print(f"{result.runs:,} runs over {result.players_left} players left ({result.priced_players} past prices) in {result.elapsed_ms:,.0f} ms")
+        print(f"{'Team':<22}{'Now':>8}{'Expected':>10}{'10-90%':>16}{'Buys':>7}{'Purse left':>12}{'Top %':>8}{'Exhaust %':>11}")
+        for team in result.teams:
+            print(f"{team.team_name[:21]:<22}{team.strength_now:>8.1f}{team.expected_strength:>10.1f}{f'{team.strength_low:.0f}-{team.strength_high:.0f}':>16}"
+                  f"{team.expected_players:>7.1f}{team.expected_purse_left:>12,.0f}{team.top_chance:>8.1f}{team.exhaustion_risk:>11.1f}")
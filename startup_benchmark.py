@@ -0,0 +1,114 @@
+"""Worker startup benchmark.
+
+Starts the app in N fresh Python processes, one after another, the way
+gunicorn boots a new worker. For each process it reports how long
+``import app`` took, the latency of the first and second request
+(``GET /teams`` through the test client) and which heavy libraries
+(pandas, NumPy, openpyxl, Pillow) were loaded by the time the first
+request was answered. The scratch SQLite database is migrated once before
+the probes, as a deploy would do with ``flask --app app init-db``.
+
+    python startup_benchmark.py --runs 10
+    python startup_benchmark.py --runs 10 --baseline HEAD~1
+
+``--baseline`` extracts that commit with ``git archive`` into a temp
+directory and probes it the same way, so the two can be compared.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ('pandas', 'numpy', 'openpyxl', 'PIL')
+PROBE_PATH = '/teams'
+
+PROBE = r"""
+import json, sys, time
+started = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+client = app.test_client()
+first = time.perf_counter(); status = client.get(%(path)r).status_code; first = time.perf_counter() - first
+second = time.perf_counter(); client.get(%(path)r); second = time.perf_counter() - second
+print(json.dumps({'import_ms': 1000 * (imported - started), 'first_request_ms': 1000 * first, 'second_request_ms': 1000 * second,
+                  'status': status, 'heavy_modules': [name for name in %(heavy)r if name in sys.modules]}))
+"""
+
+
+def prepare_database(tree, database_url):
+    """Creates and migrates the scratch database with the tree's own migrations."""
+    subprocess.run([sys.executable, 'migrations.py'], cwd=tree, env=dict(os.environ, DATABASE_URL=database_url),
+                   check=True, stdout=subprocess.DEVNULL)
+
+
+def probe(tree, database_url):
+    result = subprocess.run([sys.executable, '-c', PROBE % {'path': PROBE_PATH, 'heavy': HEAVY_MODULES}], cwd=tree,
+                            env=dict(os.environ, DATABASE_URL=database_url), check=True, capture_output=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]) # The app may print while serving the first request
+
+
+def measure(tree, runs, scratch_dir, label):
+    database_url = f"sqlite:///{os.path.join(scratch_dir, label + '.db')}"
+    prepare_database(tree, database_url)
+    samples = [probe(tree, database_url) for _ in range(runs)]
+    statuses = {sample['status'] for sample in samples}
+    if statuses != {200}: sys.exit(f"{label}: {PROBE_PATH} answered {sorted(statuses)}")
+    return samples
+
+
+def summarize(samples):
+    summary = {}
+    for key in ('import_ms', 'first_request_ms', 'second_request_ms'):
+        values = [sample[key] for sample in samples]
+        summary[key] = {'median': statistics.median(values), 'min': min(values), 'max': max(values)}
+    summary['startup_ms'] = statistics.median([sample['import_ms'] + sample['first_request_ms'] for sample in samples])
+    summary['heavy_modules'] = samples[0]['heavy_modules']
+    return summary
+
+
+def print_summary(label, summary):
+    print(f"\n{label}")
+    for key, title in (('import_ms', 'import app'), ('first_request_ms', 'first request'), ('second_request_ms', 'second request')):
+        values = summary[key]
+        print(f"  {title:<16} median {values['median']:8.1f} ms   min {values['min']:8.1f}   max {values['max']:8.1f}")
+    print(f"  {'boot to served':<16} median {summary['startup_ms']:8.1f} ms")
+    print(f"  heavy modules    {', '.join(summary['heavy_modules']) or 'none'}")
+
+
+def extract(ref, target):
+    archive = subprocess.run(['git', 'archive', ref], cwd=BASE_DIR, check=True, capture_output=True).stdout
+    subprocess.run(['tar', '-x', '-C', target], input=archive, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure worker import time and first-request latency.')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh processes to start per tree.')
+    parser.add_argument('--baseline', metavar='GIT_REF', help='Also measure this commit and compare.')
+    parser.add_argument('--output', help='Write the raw samples and summaries to this JSON file.')
+    args = parser.parse_args()
+
+    scratch_dir = tempfile.mkdtemp(prefix='cpl-startup-')
+    try:
+        results = {'current': summarize(measure(BASE_DIR, args.runs, scratch_dir, 'current'))}
+        if args.baseline:
+            tree = os.path.join(scratch_dir, 'baseline'); os.makedirs(tree)
+            extract(args.baseline, tree)
+            results['baseline'] = summarize(measure(tree, args.runs, scratch_dir, 'baseline'))
+            print_summary(f"Baseline ({args.baseline})", results['baseline'])
+        print_summary('Working tree', results['current'])
+        if args.baseline:
+            before, after = results['baseline']['startup_ms'], results['current']['startup_ms']
+            print(f"\nBoot to first response: {before:.1f} ms -> {after:.1f} ms ({100 * (after - before) / before:+.1f}%)")
+        if args.output:
+            with open(args.output, 'w') as f: json.dump(results, f, indent=2)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
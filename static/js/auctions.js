@@ -0,0 +1,92 @@
+// Auction page: admin sold form, captain bid form and the live feed.
+// Page values come from the data-* attributes of this script's tag (templates/auctions.html).
+const auctionConfig = document.currentScript.dataset;
+
+// Admins: toggle the Sold form
+const soldBtnTrigger = document.getElementById('soldBtnTrigger');
+const soldForm = document.getElementById('soldForm');
+const cancelSoldBtn = document.getElementById('cancelSoldBtn');
+const unsoldForm = document.querySelector('.unsold-form');
+const auctionActionsBlock = document.getElementById('auctionActionsBlock'); // Get the container
+
+if (soldBtnTrigger && soldForm && cancelSoldBtn && unsoldForm && auctionActionsBlock) {
+    soldBtnTrigger.addEventListener('click', () => {
+        soldForm.style.display = 'flex';
+        auctionActionsBlock.classList.add('form-visible'); // Add class to hide initial buttons
+    });
+
+    cancelSoldBtn.addEventListener('click', () => {
+        soldForm.style.display = 'none';
+        auctionActionsBlock.classList.remove('form-visible'); // Remove class to show initial buttons
+    });
+}
+
+// Captains: the bid form posts to /bid and shows the answer without leaving the page
+const bidForm = document.getElementById('bidForm');
+const bidAmount = document.getElementById('bidAmount');
+const bidMessage = document.getElementById('bidMessage');
+if (bidForm) {
+    bidForm.addEventListener('submit', async (event) => {
+        event.preventDefault();
+        const response = await fetch(auctionConfig.bidUrl, {
+            method: 'POST', headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({player_id: parseInt(auctionConfig.playerId, 10), amount: parseInt(bidAmount.value, 10)})
+        });
+        const result = await response.json();
+        bidMessage.textContent = result.ok ? `Bid of ${result.amount} placed for ${result.team_name}.` : result.error;
+        bidMessage.classList.toggle('bid-rejected', !result.ok);
+        if (result.next_minimum) { bidAmount.min = result.next_minimum; if (parseInt(bidAmount.value, 10) < result.next_minimum) bidAmount.value = result.next_minimum; }
+    });
+}
+
+// Live feed: pushed events instead of reloading the page on a timer (admins only follow bids; they drive the rest themselves)
+if (window.EventSource) {
+    const feed = new EventSource(auctionConfig.streamUrl);
+    let reloadTimer = null;
+
+    // Captain bids update the leading bid (and the admin's "Sell to" button) in place
+    const setText = (id, text) => { const el = document.getElementById(id); if (el) el.textContent = text; };
+    feed.addEventListener('bid', (event) => {
+        const data = JSON.parse(event.data);
+        const panel = document.getElementById('bidPanel');
+        if (!panel || parseInt(panel.dataset.playerId, 10) !== data.player_id) return;
+        setText('highBidAmount', data.amount.toLocaleString('en-US')); setText('highBidTeam', data.team_name);
+        setText('closeLotAmount', data.amount); setText('closeLotTeam', data.team_name);
+        const closeLotForm = document.getElementById('closeLotForm');
+        if (closeLotForm) closeLotForm.style.display = '';
+        const amountInput = document.getElementById('bidAmount');
+        if (amountInput) { amountInput.min = data.next_minimum; if (parseInt(amountInput.value, 10) < data.next_minimum) amountInput.value = data.next_minimum; }
+    });
+    if (auctionConfig.followAll === '1') { // Spectators and captains: counts, purse bars and reloads
+        // Player card / round changes need the full card, so re-render once (sold + next player arrive together)
+        const scheduleReload = () => {
+            clearTimeout(reloadTimer);
+            reloadTimer = setTimeout(() => window.location.reload(), 400);
+        };
+        const bumpCount = (id, delta) => {
+            const el = document.getElementById(id);
+            if (el) el.textContent = parseInt(el.textContent, 10) + delta;
+        };
+
+        feed.addEventListener('sold', (event) => {
+            const data = JSON.parse(event.data);
+            bumpCount('soldCount', 1); bumpCount('availableCount', -1);
+            document.querySelectorAll(`.bar-item[data-teamid="${data.team_id}"]`).forEach(item => {
+                const purseBar = item.querySelector('.purse-bar');
+                const slotBar = item.querySelector('.slot-bar');
+                if (purseBar) {
+                    purseBar.style.width = `${(data.purse / auctionConfig.teamPurse) * 100}%`;
+                    purseBar.querySelector('span').textContent = data.purse.toLocaleString('en-US');
+                }
+                if (slotBar) {
+                    slotBar.style.width = `${(data.slots_remaining / auctionConfig.maxTeamSlots) * 100}%`;
+                    slotBar.querySelector('span').textContent = data.slots_remaining;
+                }
+            });
+        });
+        feed.addEventListener('unsold', () => { bumpCount('availableCount', -1); bumpCount('markedUnsoldCount', 1); });
+        ['player_up', 'round_complete', 'round_started', 'auction_complete', 'paused', 'resumed', 'reset', 'undo', 'rebuild'].forEach(kind => {
+            feed.addEventListener(kind, scheduleReload);
+        });
+    }
+}
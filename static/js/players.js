@@ -0,0 +1,44 @@
+// Filters, sorting and search are applied on the server; rows arrive a page at a time as the list scrolls
+const filterButtons = document.querySelectorAll('.filter-btn');
+const currentFilterInput = document.getElementById('current_filter'); // Export uses the same filter
+const sortSelect = document.getElementById('playerSort');
+const searchInput = document.getElementById('playerSearch');
+const sentinel = document.getElementById('playerListSentinel');
+const pageUrl = document.currentScript.dataset.pageUrl; // /players/page
+let loading = false, requestId = 0, searchTimer = null;
+
+const loadPage = async (reset) => {
+    const cursor = sentinel.dataset.nextCursor;
+    if (!reset && (loading || !cursor)) return;
+    const params = new URLSearchParams({filter: currentFilterInput.value, sort: sortSelect.value, q: searchInput.value.trim()});
+    if (!reset) params.set('after', cursor);
+    const thisRequest = ++requestId; loading = true;
+    try {
+        const response = await fetch(`${pageUrl}?${params}`);
+        if (!response.ok || thisRequest !== requestId) return; // A newer filter/sort/search replaced this request
+        const html = await response.text();
+        if (reset) document.querySelectorAll('.player-row').forEach(row => row.remove());
+        sentinel.insertAdjacentHTML('beforebegin', html);
+        sentinel.dataset.nextCursor = response.headers.get('X-Next-Cursor') || '';
+        sentinel.textContent = sentinel.dataset.nextCursor ? 'Loading more players...' : '';
+    } finally {
+        if (thisRequest === requestId) loading = false;
+    }
+    if (sentinel.dataset.nextCursor && sentinel.getBoundingClientRect().top < window.innerHeight) loadPage(false); // Page still not full
+};
+
+filterButtons.forEach(button => {
+    button.addEventListener('click', () => {
+        // Update active button style
+        document.querySelectorAll('.filter-btn').forEach(btn => btn.classList.remove('active'));
+        button.classList.add('active');
+        currentFilterInput.value = button.getAttribute('data-filter'); // 'all', 'sold', etc.
+        loadPage(true);
+    });
+});
+sortSelect.addEventListener('change', () => loadPage(true));
+searchInput.addEventListener('input', () => { clearTimeout(searchTimer); searchTimer = setTimeout(() => loadPage(true), 250); });
+
+if ('IntersectionObserver' in window) {
+    new IntersectionObserver(entries => { if (entries[0].isIntersecting) loadPage(false); }, {rootMargin: '400px'}).observe(sentinel);
+}
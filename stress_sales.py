@@ -0,0 +1,133 @@
+"""Concurrency stress check for the atomic sale writes in sales.py.
+
+Builds a scratch database (a SQLite file in a temp directory, or a throwaway
+database given with --database-url), then has several processes, standing in
+for gunicorn workers and admin consoles, race to sell the same players to
+the same few teams. Afterwards no purse or slot count may be negative, every
+team's purse/slots must match the players it actually holds, and every
+successful sale must correspond to exactly one sold player.
+
+    python stress_sales.py --workers 8 --players 300
+
+Never point --database-url at the live auction database: it is wiped.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from flask import Flask
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import OperationalError
+
+from models import db, Team, Player
+from sales import sell_player, SaleRejected
+
+STRESS_PURSE = 2000
+STRESS_SLOTS = 15
+
+
+def make_app(database_url):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if database_url.startswith('sqlite'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+    db.init_app(app)
+    return app
+
+
+def seed(app, team_count, player_count):
+    with app.app_context():
+        db.drop_all(); db.create_all()
+        db.session.execute(insert(Team), [
+            {'team_name': f'Team {n}', 'captain_name': f'Captain {n}', 'purse': STRESS_PURSE, 'purse_spent': 0,
+             'players_taken_count': 0, 'slots_remaining': STRESS_SLOTS} for n in range(1, team_count + 1)])
+        db.session.execute(insert(Player), [
+            {'player_name': f'Player {n}', 'status': 'Unsold', 'is_retained': False, 'sold_price': 0} for n in range(1, player_count + 1)])
+        db.session.commit()
+        return db.session.scalars(select(Team.id)).all(), db.session.scalars(select(Player.id)).all()
+
+
+def hammer(args):
+    """One worker: tries to sell every player (in its own random order) to a random team at a random price."""
+    database_url, worker, team_ids, player_ids, start_at = args
+    rng = random.Random(worker)
+    app = make_app(database_url)
+    counts = {'sold': 0, 'rejected': 0, 'busy': 0}
+    order = list(player_ids); rng.shuffle(order)
+    with app.app_context():
+        while time.time() < start_at: time.sleep(0.001) # Start every worker together
+        for player_id in order:
+            try:
+                sell_player(player_id, rng.choice(team_ids), rng.randint(50, 400))
+                db.session.commit(); counts['sold'] += 1
+            except SaleRejected:
+                counts['rejected'] += 1
+            except OperationalError: # e.g. SQLite "database is locked" past the busy timeout
+                db.session.rollback(); counts['busy'] += 1
+    return counts
+
+
+def verify(app, sold_total):
+    """Returns a list of invariant violations (empty when the run was clean)."""
+    problems = []
+    with app.app_context():
+        held = {team_id: (count, spent) for team_id, count, spent in db.session.execute(
+            select(Player.team_id, func.count(Player.id), func.coalesce(func.sum(Player.sold_price), 0))
+            .where(Player.status == 'Sold').group_by(Player.team_id)).all()}
+        for team in db.session.scalars(select(Team)).all():
+            count, spent = held.get(team.id, (0, 0))
+            if team.purse < 0 or team.slots_remaining < 0: problems.append(f'{team.team_name}: purse {team.purse}, slots {team.slots_remaining}')
+            if (team.purse_spent, team.purse, team.players_taken_count, team.slots_remaining) != (spent, STRESS_PURSE - spent, count, STRESS_SLOTS - count):
+                problems.append(f'{team.team_name}: books say spent {team.purse_spent}/{team.players_taken_count} players, roster holds {spent}/{count}')
+        sold_rows = sum(count for count, _ in held.values())
+        if sold_rows != sold_total: problems.append(f'{sold_total} successful sales but {sold_rows} sold players')
+        orphans = db.session.execute(select(func.count(Player.id)).where(Player.status == 'Sold', Player.team_id.is_(None))).scalar_one()
+        if orphans: problems.append(f'{orphans} sold players without a team')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Race concurrent sales against a scratch database and check that no purse is overspent.')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--teams', type=int, default=3)
+    parser.add_argument('--players', type=int, default=200)
+    parser.add_argument('--database-url', help='Scratch database to use (it is wiped). Default: a temporary SQLite file.')
+    args = parser.parse_args()
+
+    scratch_dir = None
+    database_url = args.database_url
+    if not database_url:
+        scratch_dir = tempfile.mkdtemp(prefix='cpl_stress_')
+        database_url = f"sqlite:///{os.path.join(scratch_dir, 'stress.db')}"
+    app = make_app(database_url)
+    team_ids, player_ids = seed(app, args.teams, args.players)
+
+    start_at = time.time() + 1.0
+    started = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool:
+        results = pool.map(hammer, [(database_url, worker, team_ids, player_ids, start_at) for worker in range(args.workers)])
+    elapsed = time.perf_counter() - started - 1.0
+    totals = {key: sum(result[key] for result in results) for key in ('sold', 'rejected', 'busy')}
+    attempts = sum(totals.values())
+    print(f"{args.workers} workers, {attempts} sale attempts in {elapsed:.2f}s: {totals['sold']} sold, {totals['rejected']} rejected, {totals['busy']} busy")
+
+    problems = verify(app, totals['sold'])
+    if scratch_dir:
+        with app.app_context(): db.engine.dispose()
+        for name in os.listdir(scratch_dir): os.remove(os.path.join(scratch_dir, name))
+        os.rmdir(scratch_dir)
+    if problems:
+        print("FAILED:")
+        for problem in problems: print(f"  {problem}")
+        return 1
+    print("OK: no overspent purse, no oversold team, no player sold twice.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
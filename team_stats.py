@@ -0,0 +1,43 @@
+"""Set-based team purse/slot bookkeeping shared by the importer and auction reset.
+
+Both run a constant number of statements regardless of how many players or
+teams exist, and touch one league at a time. Purse and squad size come from
+the league's rules (``League.team_purse``/``max_team_slots``). Neither
+function commits; callers commit them together with the rest of their
+transaction.
+"""
+from sqlalchemy import func, select, update
+
+from models import db, League, Team, Player
+from leagues import current_league_id
+
+TEAM_PURSE = 10000 # Defaults for new leagues
+MAX_TEAM_SLOTS = 15
+
+
+def reset_auction_players(league_id=None):
+    """Puts every non-retained player of the league back in the pool (one UPDATE)."""
+    league_id = current_league_id() if league_id is None else league_id
+    db.session.execute(
+        update(Player).where(Player.league_id == league_id, Player.is_retained == False)
+        .values(status='Unsold', unsold_round=None, sold_price=0, team_id=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def recalculate_team_stats(league_id=None):
+    """Recomputes purse, purse_spent, players_taken_count and slots_remaining for the league's teams (one UPDATE).
+
+    Every player assigned to a team counts: retained players and auction buys.
+    """
+    league_id = current_league_id() if league_id is None else league_id
+    taken = select(func.count(Player.id)).where(Player.team_id == Team.id).correlate(Team).scalar_subquery()
+    spent = select(func.coalesce(func.sum(Player.sold_price), 0)).where(Player.team_id == Team.id).correlate(Team).scalar_subquery()
+    purse = select(League.team_purse).where(League.id == Team.league_id).correlate(Team).scalar_subquery()
+    slots = select(League.max_team_slots).where(League.id == Team.league_id).correlate(Team).scalar_subquery()
+    db.session.execute(
+        update(Team).where(Team.league_id == league_id)
+        .values(players_taken_count=taken, purse_spent=spent, purse=purse - spent, slots_remaining=slots - taken)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.expire_all() # Loaded Team/Player objects no longer match the rows
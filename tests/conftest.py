@@ -0,0 +1,60 @@
+"""Shared fixtures: the app on a scratch SQLite database, migrated, seeded and loaded with players_data.csv once per session."""
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRATCH_DIR = tempfile.mkdtemp(prefix='cpl-tests-')
+sys.path.insert(0, BASE_DIR)
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(SCRATCH_DIR, 'test.db')}" # Read when app.py is imported
+os.environ['JINJA_BYTECODE_CACHE'] = ''
+
+SUPER_ADMIN = {'username': 'superadmin', 'password': 'admin123'}
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app as flask_app, init_db
+    from import_players import import_players_from_csv
+    flask_app.config.update(TESTING=True)
+    flask_app.instance_path = SCRATCH_DIR # Job files and the export cache stay out of the repo's instance folder
+    with flask_app.app_context(): init_db()
+    import_players_from_csv(os.path.join(BASE_DIR, 'players_data.csv'))
+    yield flask_app
+    shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def client(app):
+    """A test client logged in as the seeded super admin."""
+    client = app.test_client()
+    assert client.post('/login', data=SUPER_ADMIN).status_code == 302
+    return client
+
+
+@pytest.fixture
+def league(app):
+    """An app context in the default league."""
+    from leagues import use_league
+    from models import DEFAULT_LEAGUE_ID
+    with app.app_context():
+        use_league(DEFAULT_LEAGUE_ID)
+        yield DEFAULT_LEAGUE_ID
+
+
+@pytest.fixture
+def other_league(league):
+    """A second league with one team, OTHER XI."""
+    from leagues import create_league, league_by_slug
+    return league_by_slug('other') or create_league('other', 'Other League', [('OTHER XI', 'Someone')])
+
+
+@pytest.fixture
+def lot_open(client):
+    """Restarts the auction and puts the first player up; returns the client."""
+    client.post('/restart_auction', data={'password': SUPER_ADMIN['password']})
+    client.get('/next_player')
+    return client
@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+import auction_state
+from bidding import BidBook, BidRejected
+from leagues import use_league
+from rosters import get_team_rosters
+
+USER_ID = 1 # The seeded super admin; bids only record who placed them
+
+
+def bidding_teams(count):
+    teams = sorted((team for team in get_team_rosters() if team.slots_remaining > 0), key=lambda team: -team.purse)[:count]
+    assert len(teams) == count and teams[-1].purse >= 500
+    return [team.id for team in teams]
+
+
+def test_team_cannot_raise_its_own_lead_through_another_worker(lot_open, league):
+    stale = auction_state.get_auction_state(fresh=True)
+    player_id = stale.current_player_id
+    assert player_id is not None
+    team_id, = bidding_teams(1)
+    worker_a, worker_b = BidBook(), BidBook()
+    worker_a.place(stale, team_id, USER_ID, player_id, 100)
+    with pytest.raises(BidRejected, match='already holds'): # Worker B's ladder has not seen the bid; the UPDATE refuses it
+        worker_b.place(stale, team_id, USER_ID, player_id, 200)
+    state = auction_state.get_auction_state(fresh=True)
+    assert (state.high_bid, state.high_bid_team_id) == (100, team_id)
+
+
+def test_concurrent_equal_bids_accept_exactly_one(app, lot_open, league):
+    player_id = auction_state.get_auction_state(fresh=True).current_player_id
+    team_ids = bidding_teams(3)
+    barrier, outcomes = threading.Barrier(len(team_ids)), {}
+
+    def bid(team_id):
+        with app.app_context():
+            use_league(league)
+            state = auction_state.get_auction_state(fresh=True)
+            barrier.wait()
+            try: outcomes[team_id] = BidBook().place(state, team_id, USER_ID, player_id, 300).amount # One worker each
+            except BidRejected as e: outcomes[team_id] = str(e)
+
+    threads = [threading.Thread(target=bid, args=(team_id,)) for team_id in team_ids]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    winners = [team_id for team_id, outcome in outcomes.items() if outcome == 300]
+    assert len(winners) == 1, outcomes
+    assert all('Outbid' in outcome for team_id, outcome in outcomes.items() if team_id not in winners)
+    state = auction_state.get_auction_state(fresh=True)
+    assert (state.high_bid, state.high_bid_team_id) == (300, winners[0])
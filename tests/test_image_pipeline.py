@@ -0,0 +1,14 @@
+import os
+import re
+
+from conftest import BASE_DIR
+from image_pipeline import SIZES
+
+
+def test_every_built_size_is_used_by_a_template():
+    templates = os.path.join(BASE_DIR, 'templates')
+    used = set()
+    for name in os.listdir(templates):
+        with open(os.path.join(templates, name), encoding='utf-8') as f:
+            used |= set(re.findall(r"size=['\"](\w+)['\"]", f.read()))
+    assert set(SIZES) <= used
@@ -0,0 +1,37 @@
+import io
+import os
+import time
+
+from auction_stats import get_status_summary
+from conftest import BASE_DIR
+from rosters import get_team_rosters
+
+EXTRA_ROWS = ('JOB POOL PLAYER,,FALSE,,,,,20,300,10,110.5,45,18,20.1,15,22.4,7.5,2(14)\r\n'
+              'JOB RETAINED PLAYER,,TRUE,SPARK 11,400,SPARK 11,,30,600,12,125.0,70,27,25.3,20,21.0,7.1,3(18)\r\n')
+
+
+def run_job(client, url, **data):
+    job = client.post(url, data=data, query_string={'format': 'json'}, content_type='multipart/form-data').get_json()
+    for _ in range(200):
+        job = client.get(f"/jobs/{job['id']}").get_json()
+        if job['status'] in ('done', 'failed'): return job
+        time.sleep(0.05)
+    raise AssertionError(f"Job did not finish: {job}")
+
+
+def spark_roster():
+    return next(roster for roster in get_team_rosters() if roster.team_name == 'SPARK 11')
+
+
+def test_import_job_refreshes_this_workers_caches(client, league):
+    before, roster_before = get_status_summary(), spark_roster() # Warm this worker's caches
+    with open(os.path.join(BASE_DIR, 'players_data.csv'), 'rb') as f: csv = f.read().rstrip(b'\r\n') + b'\r\n' + EXTRA_ROWS.encode()
+    job = run_job(client, '/jobs/import', csv_file=(io.BytesIO(csv), 'players.csv'))
+    assert job['status'] == 'done' and job['message'].startswith('Added 2,'), job
+
+    summary = get_status_summary() # Same process as the job runner: no other worker's version bump to notice
+    assert summary.total_auction_players == before.total_auction_players + 1
+    assert summary.retained_count == before.retained_count + 1
+    roster = spark_roster()
+    assert [player.player_name for player in roster.retained] == [player.player_name for player in roster_before.retained] + ['JOB RETAINED PLAYER']
+    assert roster.purse == roster_before.purse - 400
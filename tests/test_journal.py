@@ -0,0 +1,42 @@
+import auction_state
+import journal
+from models import db, Player, Team
+
+
+def current_player():
+    db.session.rollback() # A fresh read after the client's requests
+    return auction_state.get_auction_state(fresh=True).current_player_id
+
+
+def team_totals(team_id):
+    team = db.session.get(Team, team_id)
+    return team.purse, team.purse_spent, team.players_taken_count, team.slots_remaining
+
+
+def test_undo_reopens_the_last_lot_and_matches_the_journal(lot_open, league):
+    client = lot_open
+    team_id = max(db.session.query(Team).filter(Team.league_id == league, Team.slots_remaining > 0), key=lambda team: team.purse).id
+    before = team_totals(team_id)
+    sold_id = current_player()
+    client.post(f'/sold/{sold_id}', data={'team_id': team_id, 'sold_price': 400}); client.get('/next_player')
+    unsold_id = current_player()
+    client.post(f'/unsold/{unsold_id}'); client.get('/next_player')
+    assert journal.verify() == []
+
+    client.post('/undo_auction') # Reopens the unsold lot
+    assert journal.verify() == []
+    assert current_player() == unsold_id
+
+    client.post('/undo_auction', data={'count': 1}) # Back past player_up: the sold lot is next
+    client.post('/undo_auction') # Reopens the sale
+    assert journal.verify() == []
+    assert current_player() == sold_id
+    player = db.session.get(Player, sold_id)
+    assert (player.status, player.team_id, player.sold_price) == ('Unsold', None, 0)
+    assert team_totals(team_id) == before
+
+
+def test_rebuild_is_a_no_op_on_a_consistent_journal(league):
+    assert journal.verify() == []
+    journal.rebuild()
+    assert journal.verify() == []
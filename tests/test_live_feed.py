@@ -0,0 +1,35 @@
+import queue
+
+from sqlalchemy import func, select
+
+from live_feed import LiveFeed
+from models import db, AuctionEvent
+
+
+def add_event(league, event_id, kind):
+    db.session.add(AuctionEvent(id=event_id, league_id=league, kind=kind, payload='{}')); db.session.commit()
+
+
+def received(subscriber):
+    events = []
+    while True:
+        try: events.append(subscriber.get_nowait()[:2])
+        except queue.Empty: return events
+
+
+def test_late_commit_of_a_lower_id_is_still_delivered(app, league):
+    feed = LiveFeed(poll_seconds=3600) # The test polls by hand
+    feed.init_app(app)
+    subscriber = feed.subscribe(league)
+    first = (db.session.execute(select(func.max(AuctionEvent.id))).scalar() or 0) + 1
+    # Ids first and first + 1 were handed out in that order, but first + 1 commits first
+    add_event(league, first + 1, 'bid')
+    feed.poll()
+    assert received(subscriber) == [(first + 1, 'bid')]
+    add_event(league, first, 'sold')
+    feed.poll()
+    assert received(subscriber) == [(first, 'sold')]
+    add_event(league, first + 2, 'player_up')
+    feed.poll(); feed.poll()
+    assert received(subscriber) == [(first + 2, 'player_up')] # Each event once
+    feed.unsubscribe(league, subscriber)
@@ -0,0 +1,54 @@
+from sqlalchemy import update
+
+import auction_state
+import page_cache
+from models import db, AuctionState
+
+
+def etag_of(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return response.headers['ETag'], response.get_data(as_text=True)
+
+
+def revalidate(client, url, etag):
+    return client.get(url, headers={'If-None-Match': etag}).status_code
+
+
+def test_unchanged_page_revalidates_with_304(app):
+    client = app.test_client()
+    etag, _ = etag_of(client, '/teams')
+    assert revalidate(client, '/teams', etag) == 304
+
+
+def test_etag_moves_with_the_auction_data_version(app, league):
+    client = app.test_client()
+    etag, _ = etag_of(client, '/teams')
+    auction_state.touch(auction_state.get_auction_state(fresh=True))
+    new_etag, _ = etag_of(client, '/teams')
+    assert new_etag != etag
+    assert revalidate(client, '/teams', etag) == 200
+
+
+def test_etag_moves_with_the_asset_manifest(app, monkeypatch):
+    client = app.test_client()
+    etag, _ = etag_of(client, '/teams')
+    monkeypatch.setattr(page_cache, 'manifest_token', lambda: 'rebuilt-assets')
+    assert etag_of(client, '/teams')[0] != etag
+    assert revalidate(client, '/teams', etag) == 200
+
+
+def test_leagues_never_share_a_page(app, league, other_league):
+    # Same version number in both leagues, so only the league itself tells the pages apart
+    version = auction_state.get_auction_state(fresh=True).version
+    db.session.execute(update(AuctionState).where(AuctionState.id == other_league.id).values(version=version)); db.session.commit()
+    auction_state.get_auction_state(fresh=True, league_id=other_league.id)
+    default_client, other_client = app.test_client(), app.test_client()
+    default_etag, default_page = etag_of(default_client, '/teams')
+    other_etag, other_page = etag_of(other_client, f'/teams?league={other_league.slug}')
+    assert other_etag != default_etag
+    assert 'OTHER XI' in other_page and 'OTHER XI' not in default_page and 'SPARK 11' not in other_page
+    # The other league's visitor holding the default league's ETag gets its own page, not a 304 or the cached copy
+    response = other_client.get('/teams', headers={'If-None-Match': default_etag})
+    assert response.status_code == 200 and 'OTHER XI' in response.get_data(as_text=True)
+    assert etag_of(default_client, '/teams')[1] == default_page
@@ -0,0 +1,51 @@
+from sqlalchemy import func, select
+
+from models import db, Player
+from player_listing import encode_cursor
+
+
+def player_count(league):
+    """Players of the league: the 93 seeded rows, plus any a test imported."""
+    return db.session.execute(select(func.count(Player.id)).where(Player.league_id == league)).scalar_one()
+
+
+def walk_pages(client, **params):
+    """Every player across all pages of /players/page?format=json, in page order."""
+    players, after = [], None
+    while True:
+        response = client.get('/players/page', query_string=dict(params, format='json', **({'after': after} if after else {})))
+        assert response.status_code == 200, response.get_data(as_text=True)
+        body = response.get_json()
+        players += body['players']; after = body['next_cursor']
+        if not after: return players
+
+
+def test_default_sort_pages_cover_every_player_once(client, league):
+    ids = [player['id'] for player in walk_pages(client)]
+    assert len(ids) == player_count(league) >= 93
+    assert len(set(ids)) == len(ids)
+
+
+def test_default_sort_puts_retained_players_first(client):
+    retained = [player['is_retained'] for player in walk_pages(client, limit=20)]
+    assert any(retained) and not all(retained)
+    assert retained == sorted(retained, reverse=True)
+
+
+def test_other_sorts_page_through_every_player_once(client, league):
+    for params in ({'sort': 'overall_runs'}, {'sort': 'name', 'order': 'desc'}, {'sort': 'default', 'order': 'desc', 'limit': 7}):
+        ids = [player['id'] for player in walk_pages(client, **params)]
+        assert len(ids) == len(set(ids)) == player_count(league), params
+
+
+def test_malformed_cursor_is_rejected(client):
+    assert client.get('/players/page', query_string={'after': 'not-a-cursor', 'format': 'json'}).status_code == 400
+
+
+def test_cursor_values_of_the_wrong_type_are_rejected(client):
+    for sort, values in (('default', [{'a': 1}, 'HARI', 49]), ('default', [False, ['HARI'], 49]), ('default', [False, 'HARI', '49']),
+                         ('default', [0, 'HARI', 49]), ('overall_runs', ['many', 49]), ('overall_runs', [True, 49]), ('name', ['HARI', None])):
+        response = client.get('/players/page', query_string={'sort': sort, 'after': encode_cursor(values), 'format': 'json'})
+        assert response.status_code == 400, (sort, values)
+    valid = client.get('/players/page', query_string={'sort': 'overall_sr', 'after': encode_cursor([101, 49]), 'format': 'json'})
+    assert valid.status_code == 200 # Whole numbers are fine for float columns
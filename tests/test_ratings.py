@@ -0,0 +1,35 @@
+import numpy as np
+from sqlalchemy import select
+
+from models import db, Player
+
+
+def test_retained_players_with_career_stats_are_rated(league):
+    from ratings import get_player_ratings
+    ratings = get_player_ratings()
+    retained = db.session.execute(select(Player.id, Player.player_name, Player.batting_inn).where(
+        Player.league_id == league, Player.is_retained == True, Player.overall_runs > 0)).all()
+    assert retained and any(not innings for _, _, innings in retained) # Career totals only, innings blank
+    positions, found = ratings.positions([player_id for player_id, _, _ in retained])
+    assert found.all()
+    best = dict(zip([name for _, name, _ in retained], ratings.best[positions]))
+    assert best['SILAMBARASAN'] > 0 # 109 matches, 1908 runs, 147 wickets; innings blank
+    assert np.mean([value > 0 for value in best.values()]) > 0.9 # Only figures below the 5th percentile on every stat score 0
+
+
+def test_team_strength_reflects_retained_players(league):
+    from ratings import get_team_strength
+    strength = {team.team_name: team.strength for team in get_team_strength() if team.players}
+    assert strength and all(value > 0 for value in strength.values())
+    assert len(set(strength.values())) > 1
+
+
+def test_innings_fall_back_to_matches():
+    from ratings import compute_ratings, STAT_COLUMNS
+    stats = {column: np.zeros(3) for column in STAT_COLUMNS}
+    stats.update(overall_matches=np.array([20.0, 20.0, 0.0]), overall_runs=np.array([400.0, 400.0, 0.0]),
+                 overall_sr=np.array([120.0, 120.0, 0.0]), overall_hs=np.array([60.0, 60.0, 0.0]),
+                 batting_inn=np.array([20.0, 0.0, 0.0]), batting_avg=np.array([20.0, 0.0, 0.0]))
+    batting = compute_ratings(stats, ['', '', ''])['batting']
+    assert batting[0] > 0 and batting[1] > 0 # Same career, innings column blank for the second
+    assert batting[2] == 0
@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+from sqlalchemy import select
+
+import auction_state
+from leagues import use_league
+from models import db, Player, Team
+from sales import SaleRejected, pass_player, sell_player
+
+
+def team_snapshot(team_id):
+    db.session.rollback() # A fresh read after the other sessions' commits
+    team = db.session.get(Team, team_id)
+    return team.purse, team.purse_spent, team.players_taken_count, team.slots_remaining
+
+
+def richest_teams(league, count):
+    teams = db.session.execute(select(Team.id).where(Team.league_id == league, Team.slots_remaining > 0).order_by(Team.purse.desc())).scalars().all()
+    assert len(teams) >= count
+    return teams[:count]
+
+
+def test_concurrent_sales_of_one_player_accept_exactly_one(app, lot_open, league):
+    player_id = auction_state.get_auction_state(fresh=True).current_player_id
+    team_ids = richest_teams(league, 3)
+    before = {team_id: team_snapshot(team_id) for team_id in team_ids}
+    barrier, outcomes = threading.Barrier(len(team_ids)), {}
+
+    def sell(team_id):
+        with app.app_context(): # One admin console/worker each
+            use_league(league)
+            barrier.wait()
+            try: sell_player(player_id, team_id, 100); db.session.commit(); outcomes[team_id] = 'sold'
+            except SaleRejected as e: outcomes[team_id] = str(e)
+
+    threads = [threading.Thread(target=sell, args=(team_id,)) for team_id in team_ids]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    winners = [team_id for team_id, outcome in outcomes.items() if outcome == 'sold']
+    assert len(winners) == 1, outcomes
+    player = db.session.get(Player, player_id)
+    assert (player.status, player.team_id, player.sold_price) == ('Sold', winners[0], 100)
+    for team_id in team_ids:
+        purse, spent, taken, slots = before[team_id]
+        expected = (purse - 100, spent + 100, taken + 1, slots - 1) if team_id == winners[0] else before[team_id]
+        assert team_snapshot(team_id) == expected
+    with pytest.raises(SaleRejected): pass_player(player_id, 1) # The lot is closed for an unsold mark too
+
+
+def test_sale_beyond_the_purse_is_refused(league):
+    team_id, = richest_teams(league, 1)
+    before = team_snapshot(team_id)
+    player_id = db.session.execute(select(Player.id).where(
+        Player.league_id == league, Player.is_retained == False, Player.status == 'Unsold')).scalars().first()
+    with pytest.raises(SaleRejected, match='does not have enough purse'):
+        sell_player(player_id, team_id, before[0] + 50)
+    assert team_snapshot(team_id) == before
+    assert db.session.get(Player, player_id).status == 'Unsold'
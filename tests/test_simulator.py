@@ -0,0 +1,17 @@
+from team_stats import MAX_TEAM_SLOTS
+
+
+def test_outlook_starts_from_the_current_rosters(client):
+    body = client.get('/simulation', query_string={'format': 'json', 'runs': 500}).get_json()
+    assert body['ok'] and body['runs'] == 500 and body['priced_players'] > 0
+    teams = body['teams']
+    now = [team['strength_now'] for team in teams if team['slots_remaining'] < MAX_TEAM_SLOTS] # Teams holding players
+    assert now and all(value > 0 for value in now) and len(set(now)) > 1
+    for team in teams:
+        assert team['strength_low'] <= team['expected_strength'] <= team['strength_high']
+        assert team['strength_now'] <= team['strength_low']
+
+
+def test_outlook_is_cached_until_the_state_moves_on(league):
+    from simulator import get_simulation
+    assert get_simulation(300) is get_simulation(300)
@@ -0,0 +1,33 @@
+import pytest
+
+from models import db, Team, User
+
+
+@pytest.fixture
+def other_team(other_league):
+    return db.session.execute(db.select(Team).where(Team.league_id == other_league.id)).scalar_one()
+
+
+def captain(username):
+    db.session.rollback() # A fresh read after the client's requests
+    return User.query.filter_by(username=username).first()
+
+
+def test_create_user_only_offers_and_accepts_this_leagues_teams(client, league, other_team):
+    assert other_team.team_name not in client.get('/create_user').get_data(as_text=True)
+    own_team = Team.query.filter_by(league_id=league).first()
+    form = {'full_name': 'Cross League', 'username': 'cross_league', 'password': 'secret', 'role': 'Captain'}
+    client.post('/create_user', data=dict(form, team_id=other_team.id))
+    assert captain('cross_league') is None
+    client.post('/create_user', data=dict(form, team_id=own_team.id))
+    assert captain('cross_league').team_id == own_team.id
+
+
+def test_edit_user_rejects_another_leagues_team(client, league, other_team):
+    own_team = Team.query.filter_by(league_id=league).first()
+    user = User(full_name='Edited Captain', username='edited_captain', role='Captain', team_id=own_team.id)
+    user.set_password('secret'); db.session.add(user); db.session.commit()
+    form = {'full_name': user.full_name, 'username': user.username, 'role': 'Captain', 'password': ''}
+    page = client.post(f'/edit_user/{user.id}', data=dict(form, team_id=other_team.id)).get_data(as_text=True)
+    assert other_team.team_name not in page
+    assert captain('edited_captain').team_id == own_team.id